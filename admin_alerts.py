@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Background admin alert dispatcher for MiraiBot
+Deduplicates, batches and rate-limits emergency/crisis alerts to ADMIN_CHAT_ID,
+keeping undelivered alerts on disk so none are lost. Alerts Telegram refuses
+for good (blocked bot, bad chat id) go to a dead-letter file instead of
+being retried forever.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+ALERT_TITLES = {
+    "emergency": "🚨 EMERGENCY ALERT",
+    "crisis": "⚠️ CRISIS ALERT",
+}
+
+
+class AdminAlertDispatcher:
+    """Queues alerts from handlers and delivers them in the background"""
+
+    def __init__(
+        self,
+        chat_id: str,
+        spool_path: str = "admin_alerts_spool.jsonl",
+        dedup_window: float = 300.0,
+        digest_threshold: int = 3,
+        min_interval: float = 3.0,
+        save_delay: float = 1.0,
+    ):
+        self.chat_id = chat_id
+        self.spool_path = spool_path
+        self.dedup_window = dedup_window
+        self.digest_threshold = digest_threshold
+        self.min_interval = min_interval
+        self.save_delay = save_delay
+        self.dead_letter_path = f"{spool_path}.dead"
+        self.pending: List[dict] = []
+        # (kind, user_id) -> time the last alert for it was delivered, oldest first
+        self.last_delivered: Dict[Tuple[str, int], float] = {}
+        self.stats = {"queued": 0, "merged": 0, "suppressed": 0, "sent_messages": 0, "failed_attempts": 0, "dropped": 0}
+        self._in_flight: List[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._bot = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_now: Optional[asyncio.Event] = None
+        self._dirty = False
+
+    def submit(self, kind: str, user_id: int, username: str, message: str):
+        """
+        Queue an alert without waiting for delivery
+
+        Args:
+            kind: "emergency" or "crisis"
+            user_id: Telegram user ID the alert is about
+            username: Display name of the user
+            message: The user's message (truncated in the alert)
+        """
+        now = time.time()
+        key = (kind, user_id)
+
+        for alert in self.pending:
+            if (alert["kind"], alert["user_id"]) == key and not any(alert is a for a in self._in_flight):
+                # Same user still waiting for delivery - fold the repeat into it
+                alert["count"] += 1
+                alert["message"] = message[:200]
+                alert["last_time"] = now
+                self.stats["merged"] += 1
+                self._schedule_save()
+                return
+
+        self._forget_deliveries_before(now - self.dedup_window)
+        if key in self.last_delivered:
+            self.stats["suppressed"] += 1
+            logger.info(f"🔕 Suppressed repeated {kind} alert for user {user_id}")
+            return
+
+        alert = {
+            "kind": kind,
+            "user_id": user_id,
+            "username": username,
+            "message": message[:200],
+            "first_time": now,
+            "last_time": now,
+            "count": 1,
+        }
+        self.pending.append(alert)
+        self.stats["queued"] += 1
+        self._schedule_save()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _forget_deliveries_before(self, cutoff: float):
+        """Drop delivery times that no longer suppress anything"""
+        while self.last_delivered:
+            key, delivered = next(iter(self.last_delivered.items()))
+            if delivered >= cutoff:
+                break
+            del self.last_delivered[key]
+
+    def _schedule_save(self):
+        """Rewrite the spool soon; changes made meanwhile share one write off the event loop"""
+        self._dirty = True
+        if self._task is None:
+            self._persist()  # Not started (no delivery loop yet): write now
+        elif self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save())
+
+    async def _save(self):
+        try:
+            await asyncio.wait_for(self._save_now.wait(), self.save_delay)
+        except asyncio.TimeoutError:
+            pass
+        while self._dirty:
+            self._dirty = False
+            lines = [json.dumps(alert) for alert in self.pending]
+            await asyncio.to_thread(self._write_spool, lines)
+
+    def _persist(self):
+        """Rewrite the spool file with the alerts that are still pending"""
+        self._dirty = False
+        self._write_spool([json.dumps(alert) for alert in self.pending])
+
+    def _write_spool(self, lines: List[str]):
+        tmp_path = f"{self.spool_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+        os.replace(tmp_path, self.spool_path)
+
+    def _dead_letter(self, alerts: List[dict], error: Exception):
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for alert in alerts:
+                f.write(json.dumps(dict(alert, error=str(error))) + "\n")
+
+    def _load_spool(self):
+        if not os.path.exists(self.spool_path):
+            return
+        merged: Dict[Tuple[str, int], dict] = {}
+        with open(self.spool_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    alert = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                # Keep the latest copy if an alert was written more than once
+                merged[(alert["kind"], alert["user_id"])] = alert
+        # Alerts submitted before start() are already in the spool as well
+        for alert in self.pending:
+            merged.pop((alert["kind"], alert["user_id"]), None)
+        self.pending = list(merged.values()) + self.pending
+        if self.pending:
+            logger.info(f"📬 Recovered {len(self.pending)} undelivered admin alerts")
+        self._persist()
+
+    @staticmethod
+    def format_alert(alert: dict) -> str:
+        lines = [
+            ALERT_TITLES.get(alert["kind"], "ALERT"),
+            "",
+            f"User: {alert['username']} (ID: {alert['user_id']})",
+            f"Time: {datetime.fromtimestamp(alert['first_time']).strftime('%Y-%m-%d %H:%M:%S')}",
+        ]
+        if alert["count"] > 1:
+            lines.append(f"Repeated: {alert['count']} times (last {datetime.fromtimestamp(alert['last_time']).strftime('%H:%M:%S')})")
+        lines.append(f"Message: {alert['message']}")
+        return "\n".join(lines)
+
+    def format_digest(self, alerts: List[dict]) -> str:
+        counts = {}
+        for alert in alerts:
+            counts[alert["kind"]] = counts.get(alert["kind"], 0) + 1
+        summary = ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items()))
+        parts = [f"📋 ALERT DIGEST ({summary})"]
+        # Emergencies first
+        for alert in sorted(alerts, key=lambda a: (a["kind"] != "emergency", a["first_time"])):
+            repeats = f" ×{alert['count']}" if alert["count"] > 1 else ""
+            parts.append(
+                f"\n{ALERT_TITLES.get(alert['kind'], 'ALERT')}{repeats}\n"
+                f"{alert['username']} (ID: {alert['user_id']}) at "
+                f"{datetime.fromtimestamp(alert['first_time']).strftime('%H:%M:%S')}\n"
+                f"{alert['message']}"
+            )
+        return "\n".join(parts)
+
+    def _next_batch(self) -> List[dict]:
+        """Alerts for the next message: one alert, or a digest that fits one message"""
+        if len(self.pending) < self.digest_threshold:
+            return self.pending[:1]
+        batch = []
+        for alert in self.pending:
+            if len(self.format_digest(batch + [alert])) > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(alert)
+        return batch or self.pending[:1]
+
+    async def _send(self, text: str):
+        """Send one message, waiting out flood limits and retrying network errors"""
+        attempt = 0
+        while True:
+            try:
+                await self._bot.send_message(chat_id=self.chat_id, text=text[:MAX_MESSAGE_LENGTH])
+                self.stats["sent_messages"] += 1
+                return
+            except RetryAfter as e:
+                self.stats["failed_attempts"] += 1
+                delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                logger.warning(f"⏳ Admin alert rate limited, retrying in {delay}s")
+                await asyncio.sleep(delay)
+            except BadRequest:
+                raise
+            except NetworkError as e:
+                self.stats["failed_attempts"] += 1
+                delay = min(60, 2 ** attempt)
+                attempt += 1
+                logger.warning(f"Admin alert delivery failed ({e}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _run(self):
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            batch = self._next_batch()
+            text = self.format_alert(batch[0]) if len(batch) == 1 else self.format_digest(batch)
+            self._in_flight = batch
+            try:
+                await self._send(text)
+            except TelegramError as e:
+                # Not retryable (blocked bot, bad chat id): retrying would fail the same way forever
+                logger.error(f"❌ Dropping {len(batch)} admin alert(s) to {self.dead_letter_path}: {e}")
+                await asyncio.to_thread(self._dead_letter, batch, e)
+                self.stats["dropped"] += len(batch)
+                for alert in batch:
+                    self.pending.remove(alert)
+                self._schedule_save()
+                continue
+            finally:
+                self._in_flight = []
+
+            now = time.time()
+            for alert in batch:
+                self.pending.remove(alert)
+                key = (alert["kind"], alert["user_id"])
+                self.last_delivered.pop(key, None)  # Re-insert at the end to keep times in order
+                self.last_delivered[key] = now
+            self._schedule_save()
+            await asyncio.sleep(self.min_interval)
+
+    async def start(self, bot):
+        """Load spooled alerts and start delivering in the background"""
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._save_now = asyncio.Event()
+        self._load_spool()
+        if self.pending:
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._save_task is not None:
+            # Let a pending write finish now rather than race it with the final one
+            self._save_now.set()
+            await self._save_task
+            self._save_task = None
+        if self._dirty:
+            self._persist()
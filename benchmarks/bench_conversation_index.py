@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Conversation index benchmark for MiraiBot
+Writes a synthetic conversation log, mirrors it into the SQLite/FTS5 index
+and times typical investigation queries.
+
+Usage:
+    python benchmarks/bench_conversation_index.py [--rows 1000000] [--keep DIR]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from conversation_index import ConversationIndex  # noqa: E402
+from conversation_log import ConversationLog  # noqa: E402
+
+TOPIC_CORPUS = os.path.join(REPO_DIR, "benchmarks", "data", "topic_messages.jsonl")
+REPLIES = [
+    "That sounds really heavy. I'm here with you.",
+    "It makes sense that you feel this way. Want to tell me more?",
+    "Try a slow breath with me: in for four, hold, out for six.",
+    "You don't have to go through this alone.",
+]
+
+
+def write_log(directory: str, rows: int, users: int, seed: int = 3) -> float:
+    """Synthetic log spread over the last 90 days; returns seconds taken"""
+    with open(TOPIC_CORPUS, encoding="utf-8") as f:
+        messages = [json.loads(line)["text"] for line in f if line.strip()]
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    log = ConversationLog(directory, batch_size=5000, flush_interval=0.2, max_segment_bytes=16 * 1024 * 1024)
+    now = time.time()
+    for i in range(rows):
+        user = rng.randrange(users)
+        log.append(f"user{user}", f"98{user:08d}" if user % 3 == 0 else None, rng.choice(messages), rng.choice(REPLIES))
+        log._buffer[-1]["ts"] = now - 90 * 86400 + i * (90 * 86400 / rows)
+        if len(log._buffer) > 50000:
+            time.sleep(0.01)
+    log.close()
+    return time.perf_counter() - started
+
+
+def time_query(index: ConversationIndex, repeat: int, **filters) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = index.search(**filters)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conversation index sync and search")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", help="Use/keep this directory instead of a temporary one")
+    args = parser.parse_args()
+
+    directory = args.keep or tempfile.mkdtemp(prefix="conversation-index-")
+    log_dir = os.path.join(directory, "logs")
+    try:
+        if not os.path.isdir(log_dir):
+            seconds = write_log(log_dir, args.rows, args.users)
+            print(f"📝 Wrote {args.rows:,} log records in {seconds:.1f}s")
+
+        index = ConversationIndex(os.path.join(directory, "index.sqlite3"))
+        started = time.perf_counter()
+        added = index.sync(log_dir)
+        seconds = time.perf_counter() - started
+        print(f"🔎 Initial sync: {added:,} rows in {seconds:.1f}s ({added / max(seconds, 1e-9):,.0f} rows/s)")
+        started = time.perf_counter()
+        index.sync(log_dir)
+        print(f"   Repeat sync with nothing new: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        recent = time.time() - 7 * 86400
+        queries = {
+            "text (common word)": {"text": "alone"},
+            "text (two words)": {"text": "panic bus"},
+            "text (phrase, raw)": {"text": '"mind keeps racing"', "raw": True},
+            "text (no match)": {"text": "pasta"},
+            "username": {"username": "user42"},
+            "phone": {"phone_number": "9800000042"},
+            "text + username": {"text": "alone", "username": "user42"},
+            "text + last 7 days": {"text": "anxious", "since": recent},
+        }
+        print(f"   {'query':<24} {'ms':>8} {'rows':>6}   ({index.count():,} indexed)")
+        for name, filters in queries.items():
+            ms, count = time_query(index, args.repeat, **filters)
+            print(f"   {name:<24} {ms:>8.2f} {count:>6}")
+        index.close()
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for MiraiBot's per-message hot paths
+Times the safety/topic checks, phone extraction, fallback replies, Groq
+payload construction and conversation-memory operations over short, medium
+and long message corpora, writes the results as JSON and compares them with
+a stored baseline.
+
+Timings are also expressed relative to a fixed pure-Python calibration loop
+measured around each benchmark, so a baseline recorded on one machine is
+still a useful gate on another. Each timing is the median of several samples,
+and benchmarks that come out slower are re-measured before the gate fails.
+
+Usage:
+    python benchmarks/bench_hot_paths.py                      # run and compare with baseline
+    python benchmarks/bench_hot_paths.py --update-baseline    # record a new baseline
+    python benchmarks/bench_hot_paths.py --only detect_crisis --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+os.environ.setdefault("CONVERSATION_LOG_DIR", "")
+os.environ.setdefault("MEMORY_COLD_PATH", "")
+
+import telegram_bot  # noqa: E402
+from tiered_memory import TieredMemory  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+TOPIC_CORPUS = os.path.join(BENCH_DIR, "data", "topic_messages.jsonl")
+# Shortest timed sample; shorter ones are dominated by timer and scheduler noise
+MIN_SAMPLE_SECONDS = 0.02
+
+SHORT_MESSAGES = [
+    "hi", "hello", "thanks", "ok", "i'm sad", "can't sleep", "help me", "i feel empty",
+    "hey there", "not good", "so tired", "why me", "2+2", "what's up", "i miss her", "call me 9876543210",
+]
+
+
+def load_corpora(seed: int = 7) -> dict:
+    """
+    Short, medium and long message corpora
+
+    Medium messages are the labeled topic corpus; long ones join several
+    medium messages the way handle_message() joins buffered messages.
+    """
+    with open(TOPIC_CORPUS, encoding="utf-8") as f:
+        medium = [json.loads(line)["text"] for line in f if line.strip()]
+    medium += [
+        "I'm in danger, someone is following me home",
+        "I don't want to live anymore",
+        "my number is +91 98765 43210, please call me",
+    ]
+    rng = random.Random(seed)
+    long = [" ".join(rng.sample(medium, 8)) for _ in range(40)]
+    return {"short": SHORT_MESSAGES, "medium": medium, "long": long}
+
+
+def _calibration_loop(loops: int):
+    total = 0
+    for i in range(loops):
+        total += i % 7
+
+
+def calibrate(loops: int = 200000, repeat: int = 15) -> float:
+    """Nanoseconds for a fixed pure-Python workload (machine speed reference)"""
+    return measure(_calibration_loop, [loops], 0, repeat) / loops
+
+
+def measure(function, items, min_time: float, repeat: int) -> float:
+    """
+    Median nanoseconds per call over `repeat` timed samples
+
+    Each sample runs for at least min_time / repeat (and MIN_SAMPLE_SECONDS);
+    the median is steadier across runs than the minimum, which a single lucky
+    sample can pull down.
+    """
+    sample_time = max(min_time / repeat, MIN_SAMPLE_SECONDS)
+    passes = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(passes):
+            for item in items:
+                function(item)
+        if time.perf_counter() - started >= sample_time:
+            break
+        passes *= 2
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for _ in range(passes):
+            for item in items:
+                function(item)
+        samples.append((time.perf_counter_ns() - started) / (passes * len(items)))
+    return statistics.median(samples)
+
+
+def memory_benchmarks(corpora: dict) -> dict:
+    """Conversation-memory operations as generate_ai_response() performs them"""
+    memory = TieredMemory(max_hot=100000)
+    telegram_bot.default_bot.conversation_memory = memory
+    users = list(range(1000))
+    for user_id in users:
+        for i in range(telegram_bot.MAX_MEMORY_LENGTH):
+            memory[user_id].append({"role": "user" if i % 2 == 0 else "assistant", "content": corpora["medium"][i]})
+
+    def append_and_trim(user_id):
+        history = memory[user_id]
+        history.append({"role": "user", "content": "I feel anxious again"})
+        if len(history) > telegram_bot.MAX_MEMORY_LENGTH:
+            memory[user_id] = history[-telegram_bot.MAX_MEMORY_LENGTH:]
+
+    warm_memory = TieredMemory(hot_idle=0, max_hot=0)
+    for user_id in users:
+        warm_memory[user_id] = list(memory[user_id])
+    warm_memory.sweep()
+
+    def promote_from_warm(user_id):
+        warm_memory[user_id]
+        warm_memory._demote_hot(user_id)
+
+    return {
+        "memory_append_trim": (append_and_trim, users),
+        "build_chat_payload": (telegram_bot.build_chat_payload, users),
+        "memory_promote_warm": (promote_from_warm, users),
+    }
+
+
+def collect_benchmarks(corpora: dict) -> dict:
+    cases = {}
+    for name, function in (
+        ("detect_crisis", telegram_bot.detect_crisis),
+        ("detect_emergency", telegram_bot.detect_emergency),
+        ("is_mental_health_related", telegram_bot.is_mental_health_related),
+        ("extract_phone_number", telegram_bot.extract_phone_number),
+        ("get_fallback_response", telegram_bot.get_fallback_response),
+    ):
+        for size, messages in corpora.items():
+            cases[f"{name}[{size}]"] = (function, messages)
+    cases.update(memory_benchmarks(corpora))
+    return cases
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ns: float = 0.0) -> list:
+    """
+    Benchmarks whose calibrated time grew by more than `tolerance`
+
+    A slowdown must also exceed min_delta_ns (in this run's nanoseconds), so
+    sub-microsecond cases don't fail on a few nanoseconds of jitter.
+    """
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            continue
+        ratio = result["relative"] / previous["relative"]
+        delta_ns = (result["relative"] - previous["relative"]) * results["calibration_ns"]
+        if ratio > 1 + tolerance and delta_ns > min_delta_ns:
+            regressions.append((name, previous["ns_per_op"], result["ns_per_op"], ratio))
+    return regressions
+
+
+def run_case(function, items, min_time: float, repeat: int) -> dict:
+    """Time one benchmark, calibrated right before and after it so machine speed drifting during the run cancels out"""
+    before = calibrate(repeat=5)
+    ns = measure(function, items, min_time, repeat)
+    calibration = (before + calibrate(repeat=5)) / 2
+    return {"ns_per_op": round(ns, 1), "ops_per_sec": round(1e9 / ns), "relative": round(ns / calibration, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot-path functions")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results JSON")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ns", type=float, default=200.0,
+                        help="Ignore slowdowns smaller than this many ns/op, whatever the ratio")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds per benchmark")
+    parser.add_argument("--repeat", type=int, default=15, help="Timed samples per benchmark (the median is used)")
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="Re-measure slower benchmarks this many times; fail only if every run is slower")
+    parser.add_argument("--only", action="append", help="Run benchmarks whose name starts with this")
+    args = parser.parse_args()
+
+    corpora = load_corpora()
+    cases = collect_benchmarks(corpora)
+    if args.only:
+        cases = {name: case for name, case in cases.items() if any(name.startswith(prefix) for prefix in args.only)}
+
+    calibration = calibrate()
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration_ns": round(calibration, 3),
+        "corpus_sizes": {size: len(messages) for size, messages in corpora.items()},
+        "benchmarks": {},
+    }
+    print(f"⏱️  Calibration loop: {calibration:.2f} ns/iteration")
+    for name, (function, items) in cases.items():
+        results["benchmarks"][name] = run_case(function, items, args.min_time, args.repeat)
+        print(f"   {name:<40} {results['benchmarks'][name]['ns_per_op'] / 1000:>9.2f} µs/op")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"✅ Baseline written to {args.baseline}")
+        return 0
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ns)
+        for _ in range(args.confirm):
+            if not regressions:
+                break
+            # A noisy neighbour can slow one benchmark down; a real regression shows up every time
+            print(f"🔁 Re-measuring {len(regressions)} slower benchmark(s)")
+            for name, *_ in regressions:
+                function, items = cases[name]
+                result = run_case(function, items, args.min_time, args.repeat)
+                if result["relative"] < results["benchmarks"][name]["relative"]:
+                    results["benchmarks"][name] = result
+            regressions = compare(results, baseline, args.tolerance, args.min_delta_ns)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ No baseline found; run with --update-baseline to create one")
+        return 0
+    for name, before, after, ratio in regressions:
+        print(f"❌ {name}: {before / 1000:.2f} -> {after / 1000:.2f} µs/op ({(ratio - 1) * 100:.0f}% slower after calibration)")
+    if regressions:
+        return 1
+    print(f"✅ No regressions beyond {args.tolerance * 100:.0f}% against {os.path.basename(args.baseline)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
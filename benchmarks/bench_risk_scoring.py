@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Multi-turn risk scoring benchmark for MiraiBot
+Shows that the incremental risk update costs the same per message however
+long a user's history is, compared with rescanning the whole history with
+the same signals on every turn.
+
+Usage:
+    python benchmarks/bench_risk_scoring.py [--lengths 10 100 1000 10000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+os.environ.setdefault("CONVERSATION_LOG_DIR", "")
+os.environ.setdefault("MEMORY_COLD_PATH", "")
+
+import telegram_bot  # noqa: E402
+from risk_scoring import RiskScorer  # noqa: E402
+
+TOPIC_CORPUS = os.path.join(REPO_DIR, "benchmarks", "data", "topic_messages.jsonl")
+
+
+def load_messages() -> list:
+    with open(TOPIC_CORPUS, encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def per_message_ns(function, messages, repeat: int) -> float:
+    """Best nanoseconds per message over `repeat` passes"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for message in messages:
+            function(message)
+        best = min(best, (time.perf_counter_ns() - started) / len(messages))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental risk scoring against history rescans")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000, 10000], help="History lengths (messages)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_messages()
+    probe = corpus[:20]
+    scorer = telegram_bot.default_bot.risk_scorer or RiskScorer()
+    print(f"{'history':>10} {'incremental µs/msg':>20} {'full rescan µs/msg':>20}")
+    for length in args.lengths:
+        history = [corpus[i % len(corpus)] for i in range(length)]
+        user_id = length
+        clock = [0.0]
+
+        # Build the user's state from the history, one message a minute
+        for message in history:
+            clock[0] += 60
+            scorer.update(user_id, message, now=clock[0])
+
+        def incremental(message):
+            clock[0] += 60
+            scorer.update(user_id, message, now=clock[0])
+
+        def rescan(message):
+            # What a stateless multi-turn check would have to do every turn
+            total = 0.0
+            for old in history:
+                total += scorer.weigh(old)
+            return total + scorer.weigh(message)
+
+        incremental_ns = per_message_ns(incremental, probe, args.repeat)
+        rescan_ns = per_message_ns(rescan, probe[:2], 1 if length >= 1000 else args.repeat)
+        print(f"{length:>10,} {incremental_ns / 1000:>20.2f} {rescan_ns / 1000:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
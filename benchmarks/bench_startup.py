@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for MiraiBot
+Measures cold import of telegram_bot and time-to-first-reply in fresh
+processes. Telegram and Groq are replaced by local fakes so only the bot's
+own startup cost is measured (fallback replies, no network).
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter; prints one JSON line with the timings
+PROBE = r"""
+import asyncio, json, time
+started = time.perf_counter()
+
+import telegram_bot
+imported = time.perf_counter()
+
+
+class FakeChat:
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.chat = FakeChat()
+        self.replied_at = None
+
+    async def reply_text(self, text, **kwargs):
+        self.replied_at = time.perf_counter()
+
+
+class FakeUser:
+    id = 1
+    username = "bench"
+    first_name = "Bench"
+
+
+class FakeUpdate:
+    def __init__(self, text):
+        self.message = FakeMessage(text)
+        self.effective_user = FakeUser()
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+    bot_data = {}
+
+
+class FakeApplication:
+    bot = FakeBot()
+    bot_data = {}
+
+
+async def first_reply():
+    telegram_bot.MESSAGE_WAIT_TIME = 0
+    telegram_bot.api_ready = False
+    await telegram_bot.on_startup(FakeApplication())
+    update = FakeUpdate("I have been feeling anxious and stressed lately")
+    await telegram_bot.handle_message(update, FakeContext())
+    return update.message.replied_at
+
+replied = asyncio.run(first_reply())
+print(json.dumps({"import": imported - started, "first_reply": replied - started}))
+"""
+
+
+def run_probe() -> dict:
+    env = dict(os.environ, TELEGRAM_BOT_TOKEN="", ADMIN_CHAT_ID="", CONVERSATION_LOG_DIR="")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot startup")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start")
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    results = {}
+    for name in ("import", "first_reply"):
+        values = [sample[name] * 1000 for sample in samples]
+        results[name] = {"median_ms": round(statistics.median(values), 1), "max_ms": round(max(values), 1)}
+
+    print(f"🚀 Startup over {args.runs} cold runs")
+    print(f"   Cold import:         {results['import']['median_ms']:.1f} ms (max {results['import']['max_ms']:.1f})")
+    print(f"   Time to first reply: {results['first_reply']['median_ms']:.1f} ms (max {results['first_reply']['max_ms']:.1f})")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Topic classifier benchmark for MiraiBot
+Measures scoring latency and batch throughput, and how many off-topic
+messages the learned filter stops before they reach the Groq API compared
+with the keyword rules alone.
+
+Without --model, a model is trained on half of the labeled corpus and
+evaluated on the other half.
+
+Usage:
+    python benchmarks/bench_topic_classifier.py [--data labeled.jsonl] [--model path.npz]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import numpy as np  # noqa: E402
+
+import telegram_bot  # noqa: E402
+from topic_classifier import TopicClassifier, read_labeled  # noqa: E402
+
+DEFAULT_DATA = os.path.join(REPO_DIR, "benchmarks", "data", "topic_messages.jsonl")
+
+
+def time_per_call(function, items, repeat: int) -> float:
+    """Mean seconds per item over `repeat` passes"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - started) / (repeat * len(items))
+
+
+def allowed(texts, classifier) -> np.ndarray:
+    """Which messages is_mental_health_related() lets through to the model"""
+    telegram_bot.topic_classifier = classifier
+    if classifier is not None:
+        telegram_bot.TOPIC_THRESHOLD = classifier.threshold
+    return np.array([telegram_bot.is_mental_health_related(text) for text in texts])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the topic classifier")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="Labeled JSONL/CSV corpus")
+    parser.add_argument("--model", help="Trained model (default: train on half of --data)")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes for the latency measurements")
+    args = parser.parse_args()
+
+    texts, labels = read_labeled(args.data)
+    labels = np.array(labels)
+    if args.model:
+        classifier = TopicClassifier.load(args.model)
+        eval_texts, eval_labels = texts, labels
+    else:
+        train_rows = np.arange(0, len(texts), 2)
+        eval_rows = np.arange(1, len(texts), 2)
+        classifier = TopicClassifier.train([texts[i] for i in train_rows], labels[train_rows], epochs=100)
+        eval_texts, eval_labels = [texts[i] for i in eval_rows], labels[eval_rows]
+
+    single = time_per_call(classifier.score, eval_texts, args.repeat)
+    batch = eval_texts * max(1, 10000 // len(eval_texts))
+    started = time.perf_counter()
+    classifier.score_batch(batch)
+    batch_rate = len(batch) / (time.perf_counter() - started)
+    rules = time_per_call(lambda text: allowed([text], None), eval_texts, max(1, args.repeat // 10))
+
+    rules_only = allowed(eval_texts, None)
+    with_model = allowed(eval_texts, classifier)
+    off_topic = eval_labels == 0
+    print(f"🧪 Topic classifier on {len(eval_texts)} held-out messages")
+    print(f"   Single score:        {single * 1e6:.1f} µs/message (keyword rules: {rules * 1e6:.1f} µs)")
+    print(f"   Batch score:         {batch_rate:,.0f} messages/s ({len(batch)} messages)")
+    print(f"   Off-topic sent to Groq, rules only:   {int(rules_only[off_topic].sum())}/{int(off_topic.sum())}")
+    print(f"   Off-topic sent to Groq, rules + model: {int(with_model[off_topic].sum())}/{int(off_topic.sum())}")
+    print(f"   API calls avoided:   {int(rules_only[off_topic].sum() - with_model[off_topic].sum())}")
+    print(f"   On-topic rejected:   rules {int((~rules_only[~off_topic]).sum())}, rules + model {int((~with_model[~off_topic]).sum())} of {int((~off_topic).sum())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Multi-tenant support for MiraiBot
+Several branded bots (one Telegram token each) can run in one process. Each
+bot gets a BotState with its own conversation state, admin alerts and
+storage; the Groq client, turn limiter, speech-to-text pool, topic model and
+Telegram connection pool are shared.
+
+Bot configurations are a JSON list, e.g.:
+    [
+        {"name": "mirai", "token_env": "TELEGRAM_BOT_TOKEN"},
+        {"name": "calm", "token_env": "CALM_BOT_TOKEN", "system_prompt_file": "prompts/calm.txt",
+         "admin_chat_id": "-1001234", "sheet_id": "1AbC...", "conversation_log_dir": "logs/calm"}
+    ]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from google_sheets_storage import init_sheets_storage_in_background
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FIELDS = ("name", "token", "system_prompt", "prompt_version", "admin_chat_id", "sheet_id", "conversation_log_dir")
+
+
+def load_bot_configs(path: str) -> List[dict]:
+    """
+    Read and validate bot configurations
+
+    Args:
+        path: JSON file with a list of bot entries. Each needs a name and a
+            token (or token_env naming the variable holding it); optional:
+            system_prompt / system_prompt_file, prompt_version, admin_chat_id,
+            sheet_id, conversation_log_dir.
+
+    Returns:
+        One dict per bot with the keys in CONFIG_FIELDS (missing ones are None)
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path}: expected a non-empty list of bot configurations")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    configs = []
+    for entry in entries:
+        name = entry.get("name")
+        if not name or not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+            raise ValueError(f"{path}: every bot needs a name made of letters, digits, '-' or '_' (got {name!r})")
+        if any(config["name"] == name for config in configs):
+            raise ValueError(f"{path}: duplicate bot name {name!r}")
+
+        token = entry.get("token") or (os.getenv(entry["token_env"]) if entry.get("token_env") else None)
+        if not token:
+            raise ValueError(f"{path}: bot {name!r} has no token (set token or token_env)")
+
+        system_prompt = entry.get("system_prompt")
+        if entry.get("system_prompt_file"):
+            with open(os.path.join(base_dir, entry["system_prompt_file"]), encoding="utf-8") as f:
+                system_prompt = f.read().strip()
+
+        config = {field: entry.get(field) for field in CONFIG_FIELDS}
+        config.update(name=name, token=token, system_prompt=system_prompt)
+        configs.append(config)
+    return configs
+
+
+class BotState:
+    """
+    Everything one bot keeps per user, so bots sharing a process stay isolated
+
+    Args:
+        name: Short name used in logs, metrics and file names
+        token: Telegram bot token
+        system_prompt: System prompt for this bot's chat requests
+        prompt_version: Label of the system prompt in usage accounting
+        conversation_memory: user_id -> chat history
+        outbound_limiter: Telegram send scheduler (flood limits are per token)
+        semantic_memory: Recall index of earlier exchanges (optional)
+        risk_scorer: Multi-turn crisis risk (optional)
+        speculative: Replies generated while messages are still buffered (optional)
+        response_cache: Replies reused for paraphrased first messages (optional)
+        admin_chat_id: Chat allowed to use admin commands and receiving alerts (optional)
+        alert_dispatcher: Admin alerts for this bot's admin chat (optional)
+        conversation_log: Local conversation log (optional)
+        sheet_id: Google Sheet for this bot's conversations (None: the default sheet)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        token: Optional[str],
+        system_prompt: str,
+        prompt_version: str,
+        conversation_memory,
+        outbound_limiter,
+        semantic_memory=None,
+        risk_scorer=None,
+        speculative=None,
+        response_cache=None,
+        admin_chat_id: Optional[str] = None,
+        alert_dispatcher=None,
+        conversation_log=None,
+        sheet_id: Optional[str] = None,
+    ):
+        self.name = name
+        self.token = token
+        self.system_prompt = system_prompt
+        self.prompt_version = prompt_version
+        self.conversation_memory = conversation_memory
+        self.outbound_limiter = outbound_limiter
+        self.semantic_memory = semantic_memory
+        self.risk_scorer = risk_scorer
+        self.speculative = speculative
+        self.response_cache = response_cache
+        self.admin_chat_id = admin_chat_id
+        self.alert_dispatcher = alert_dispatcher
+        self.conversation_log = conversation_log
+        self.sheet_id = sheet_id
+
+        # Message buffering to combine rapid messages
+        self.user_message_buffer: Dict[int, List[str]] = defaultdict(list)
+        self.last_message_time: Dict[int, float] = defaultdict(float)
+        # Album photos waiting for the rest of their media group
+        self.media_group_buffer: Dict[str, dict] = {}
+        # user_id -> handlers still working on the user's turn
+        self.active_turns: Dict[int, int] = defaultdict(int)
+
+        # Google Sheets is connected by start_sheets() so creating a bot stays cheap
+        self.sheets_storage = None
+        self.sheets_init_thread = None
+
+    def is_admin_chat(self, chat_id) -> bool:
+        return bool(self.admin_chat_id) and str(chat_id) == str(self.admin_chat_id)
+
+    def start_sheets(self):
+        """Connect to this bot's Google Sheet in the background (once)"""
+        if self.sheets_init_thread is None:
+            self.sheets_init_thread = init_sheets_storage_in_background(self.sheet_id, on_ready=self._sheets_ready)
+
+    def _sheets_ready(self, storage):
+        self.sheets_storage = storage
+
+    def sheets_status(self) -> str:
+        """"connected", "connecting" or "disabled" """
+        if self.sheets_storage is not None:
+            return "connected" if self.sheets_storage.enabled else "disabled"
+        if self.sheets_init_thread is not None and self.sheets_init_thread.is_alive():
+            return "connecting"
+        return "disabled" if self.sheets_init_thread is not None else "not started"
+
+    @contextmanager
+    def user_turn(self, user_id: int):
+        """Mark a handler as working on a user's turn until the block exits"""
+        self.active_turns[user_id] += 1
+        try:
+            yield
+        finally:
+            self.active_turns[user_id] -= 1
+            if not self.active_turns[user_id]:
+                del self.active_turns[user_id]
+
+    async def wait_until_idle(self, user_id: int, timeout: float) -> bool:
+        """
+        Wait for the user's buffered or deferred turn to be answered
+
+        Args:
+            user_id: Telegram user ID
+            timeout: Seconds to wait at most
+
+        Returns:
+            True if no handler is working on the user's turn any more
+        """
+        deadline = time.monotonic() + timeout
+        while self.active_turns.get(user_id):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    def export_user(self, user_id: int) -> dict:
+        """
+        Remove and return a user's state so another worker can take them over.
+        Text still buffered goes along; a handler still waiting on it finds its
+        turn taken over and returns without answering.
+        """
+        self.last_message_time.pop(user_id, None)
+        return {
+            "conversation_memory": self.conversation_memory.pop(user_id, []),
+            "semantic_memory": self.semantic_memory.export_user(user_id) if self.semantic_memory else [],
+            "risk": self.risk_scorer.export_user(user_id) if self.risk_scorer else None,
+            "buffered_messages": self.user_message_buffer.pop(user_id, []),
+        }
+
+    def import_user(self, user_id: int, state: dict):
+        """Restore a user's state exported by another worker"""
+        if state.get("buffered_messages"):
+            # Joins the user's next message on this worker
+            self.user_message_buffer[user_id] = state["buffered_messages"] + self.user_message_buffer[user_id]
+        if state.get("conversation_memory"):
+            self.conversation_memory[user_id] = state["conversation_memory"] + self.conversation_memory.get(user_id, [])
+        if self.semantic_memory and state.get("semantic_memory"):
+            self.semantic_memory.import_user(user_id, state["semantic_memory"])
+        if self.risk_scorer and state.get("risk"):
+            self.risk_scorer.import_user(user_id, state["risk"])
+
+    async def start(self, bot):
+        """Start background services that deliver through this bot"""
+        self.start_sheets()
+        if self.alert_dispatcher:
+            await self.alert_dispatcher.start(bot)
+
+    async def stop(self):
+        if self.alert_dispatcher:
+            await self.alert_dispatcher.stop()
+        if self.conversation_log:
+            self.conversation_log.close()
+        self.conversation_memory.close()
+
+    def snapshot(self) -> dict:
+        """Runtime counters for the /metrics endpoint"""
+        log = self.conversation_log
+        alerts = self.alert_dispatcher
+        return {
+            "outbound": self.outbound_limiter.snapshot(),
+            "conversation_log": dict(log.stats, buffered=len(log._buffer)) if log else None,
+            "admin_alerts": dict(alerts.stats, pending=len(alerts.pending), recent_deliveries=len(alerts.last_delivered)) if alerts else None,
+            "google_sheets": self.sheets_status(),
+            "memory": self.conversation_memory.snapshot(),
+            "semantic_memory": self.semantic_memory.snapshot() if self.semantic_memory else None,
+            "risk": self.risk_scorer.snapshot() if self.risk_scorer else None,
+            "speculative": self.speculative.snapshot() if self.speculative else None,
+            "response_cache": self.response_cache.snapshot() if self.response_cache else None,
+        }
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Searchable local mirror of the conversation log for MiraiBot
+Incrementally copies new records from the conversation log (see
+conversation_log.py) into SQLite, with an FTS5 full-text index over the
+messages and replies and indexes on username, phone number and time, so
+investigating a user report takes milliseconds instead of scrolling the
+Google Sheet.
+
+Closed segments are read once; only the segment still being written is
+re-read on each sync (from the start, skipping what is already indexed).
+
+Usage:
+    python conversation_index.py sync conversation_logs/ --db conversation_index.sqlite3
+    python conversation_index.py sync conversation_logs/ --watch 60
+    python conversation_index.py search "panic attack" --username alice --since 2026-01-01
+    python conversation_index.py search --phone 9876543210 --limit 50 --json
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from conversation_log import OPEN_SUFFIX, SEGMENT_ORDER_PATTERN, iter_segment, list_segments
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT,
+    username TEXT,
+    phone_number TEXT,
+    question TEXT,
+    answer TEXT
+);
+CREATE INDEX IF NOT EXISTS conversations_username ON conversations (username, ts);
+CREATE INDEX IF NOT EXISTS conversations_phone ON conversations (phone_number, ts);
+CREATE INDEX IF NOT EXISTS conversations_ts ON conversations (ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5 (
+    question, answer, content='conversations', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS conversations_fts_insert AFTER INSERT ON conversations BEGIN
+    INSERT INTO conversations_fts (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+END;
+CREATE TABLE IF NOT EXISTS synced_segments (
+    name TEXT PRIMARY KEY,
+    records INTEGER NOT NULL,
+    complete INTEGER NOT NULL
+);
+"""
+
+COLUMNS = ("id", "ts", "source", "username", "phone_number", "question", "answer")
+
+
+def fts_query(text: str) -> str:
+    """Match all words of free text (quoted, so user input can't break FTS5 syntax)"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"' for word in words)
+
+
+def segment_source(name: str) -> str:
+    """Writer that produced a segment (its name prefix, e.g. "conversations-main")"""
+    match = SEGMENT_ORDER_PATTERN.search(name)
+    return name[:match.start()] if match else name
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Unix time from an ISO date/datetime or a number"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class ConversationIndex:
+    """SQLite mirror of the conversation log with full-text search"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self.db.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(f"SQLite was built without FTS5: {e}") from e
+
+    def sync(self, log_dir: str, batch_size: int = 10000) -> int:
+        """
+        Copy records that are not indexed yet
+
+        Args:
+            log_dir: Conversation log directory
+            batch_size: Records per transaction
+
+        Returns:
+            Number of records added
+        """
+        progress = {
+            row["name"]: (row["records"], row["complete"])
+            for row in self.db.execute("SELECT name, records, complete FROM synced_segments")
+        }
+        added = 0
+        for path in list_segments(log_dir, include_open=True):
+            name = os.path.basename(path)
+            is_open = name.endswith(OPEN_SUFFIX)
+            if is_open:
+                name = name[:-len(OPEN_SUFFIX)]
+            done, complete = progress.get(name, (0, 0))
+            if complete:
+                continue
+            added += self._sync_segment(path, name, done, not is_open, batch_size)
+        return added
+
+    def _sync_segment(self, path: str, name: str, skip: int, complete: bool, batch_size: int) -> int:
+        source = segment_source(name)
+        position = 0
+        batch = []
+
+        def commit():
+            with self.db:
+                self.db.executemany(
+                    "INSERT INTO conversations (ts, source, username, phone_number, question, answer) VALUES (?, ?, ?, ?, ?, ?)",
+                    batch,
+                )
+                self._save_progress(name, position, False)
+            batch.clear()
+
+        for record in iter_segment(path):
+            position += 1
+            if position <= skip:
+                continue
+            batch.append((
+                record.get("ts"),
+                source,
+                record.get("username"),
+                record.get("phone_number"),
+                record.get("question"),
+                record.get("answer"),
+            ))
+            if len(batch) >= batch_size:
+                commit()
+        if batch:
+            commit()
+        if complete:
+            with self.db:
+                self._save_progress(name, max(position, skip), True)
+        return max(0, position - skip)
+
+    def _save_progress(self, name: str, records: int, complete: bool):
+        self.db.execute(
+            "INSERT OR REPLACE INTO synced_segments (name, records, complete) VALUES (?, ?, ?)",
+            (name, records, int(complete)),
+        )
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        username: Optional[str] = None,
+        phone_number: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        source: Optional[str] = None,
+        limit: int = 20,
+        raw: bool = False,
+    ) -> List[dict]:
+        """
+        Newest conversations matching all given filters
+
+        Args:
+            text: Words that must all appear in the message or reply
+            username: Exact username
+            phone_number: Phone number (formatting is ignored)
+            since: Only turns at or after this unix time
+            until: Only turns before this unix time
+            source: Only turns from this log writer (segment name prefix)
+            limit: Most rows to return
+            raw: Pass `text` to FTS5 as-is (phrases, OR, prefix*, column filters)
+
+        Returns:
+            Rows as dicts, newest first
+        """
+        conditions, params = [], []
+        if username:
+            conditions.append("c.username = ?")
+            params.append(username)
+        if phone_number:
+            conditions.append("c.phone_number = ?")
+            params.append(re.sub(r"[-.\s()]", "", phone_number))
+        if since is not None:
+            conditions.append("c.ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("c.ts < ?")
+            params.append(until)
+        if source:
+            conditions.append("c.source = ?")
+            params.append(source)
+
+        query = text if raw else fts_query(text or "")
+        if query and not (username or phone_number):
+            # Walk the full-text matches newest first
+            sql = "SELECT c.* FROM conversations_fts f JOIN conversations c ON c.id = f.rowid WHERE conversations_fts MATCH ?"
+            params.insert(0, query)
+            order = "f.rowid DESC"
+        else:
+            # One person's turns are few: walk their index and check each row against the text
+            sql = "SELECT c.* FROM conversations c WHERE 1"
+            order = "c.ts DESC"
+            if query:
+                conditions.append("EXISTS (SELECT 1 FROM conversations_fts WHERE conversations_fts MATCH ? AND rowid = c.id)")
+                params.append(query)
+        for condition in conditions:
+            sql += f" AND {condition}"
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def format_row(row: dict, width: int = 160) -> str:
+    """One search result as a short text block"""
+    when = datetime.fromtimestamp(row["ts"]).strftime("%Y-%m-%d %H:%M")
+    who = row["username"] or "Unknown"
+    if row["phone_number"]:
+        who += f" ({row['phone_number']})"
+    question = (row["question"] or "").replace("\n", " ")
+    answer = (row["answer"] or "").replace("\n", " ")
+    return f"{when} {who}\n  Q: {question[:width]}\n  A: {answer[:width]}"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Index and search logged MiraiBot conversations")
+    parser.add_argument("--db", default=os.getenv("CONVERSATION_INDEX_PATH", "conversation_index.sqlite3"), help="Index database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = commands.add_parser("sync", help="Copy new log records into the index")
+    sync_parser.add_argument("log_dir", help="Conversation log directory")
+    sync_parser.add_argument("--watch", type=float, help="Keep syncing every this many seconds")
+
+    search_parser = commands.add_parser("search", help="Search the index")
+    search_parser.add_argument("text", nargs="?", help="Words to find in messages or replies")
+    search_parser.add_argument("--username")
+    search_parser.add_argument("--phone")
+    search_parser.add_argument("--since", help="ISO date/time or unix time")
+    search_parser.add_argument("--until", help="ISO date/time or unix time")
+    search_parser.add_argument("--source", help="Log writer, e.g. conversations-main")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--raw", action="store_true", help="Use TEXT as an FTS5 query")
+    search_parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    index = ConversationIndex(args.db)
+    try:
+        if args.command == "sync":
+            while True:
+                started = time.perf_counter()
+                added = index.sync(args.log_dir)
+                logger.info(f"🔎 Indexed {added:,} new conversations in {time.perf_counter() - started:.2f}s ({index.count():,} total)")
+                if not args.watch:
+                    break
+                time.sleep(args.watch)
+            return 0
+
+        started = time.perf_counter()
+        rows = index.search(
+            args.text,
+            username=args.username,
+            phone_number=args.phone,
+            since=parse_time(args.since),
+            until=parse_time(args.until),
+            source=args.source,
+            limit=args.limit,
+            raw=args.raw,
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False) if args.json else format_row(row))
+        logger.info(f"{len(rows)} result(s) in {elapsed:.1f} ms")
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Append-only local conversation log for MiraiBot
+Keeps the full, untruncated text in compressed, rotating JSONL segments
+(zstd if the zstandard package is installed, gzip otherwise) and offers
+a bulk reader for analytics
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Columns every record has (extra keyword fields are kept as well)
+COLUMNS = ["ts", "username", "phone_number", "question", "answer"]
+
+# Segment being written; renamed to its final name on rotation
+OPEN_SUFFIX = ".open"
+
+SEGMENT_ORDER_PATTERN = re.compile(r"-(\d{8}T\d{6})-(\d+)\.jsonl")
+
+
+def _codec_extension(codec: str) -> str:
+    return ".jsonl.zst" if codec == "zstd" else ".jsonl.gz"
+
+
+class ConversationLog:
+    """
+    Buffered writer; append() is cheap and a background thread does the I/O
+
+    Failed writes are retried on the next flush. While writing keeps failing
+    (disk full, read-only mount) at most max_buffered records are kept and
+    the oldest are dropped, counted in stats["dropped"].
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        batch_size: int = 256,
+        flush_interval: float = 5.0,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age: float = 3600.0,
+        codec: Optional[str] = None,
+        name_prefix: str = "conversations",
+        max_buffered: int = 100_000,
+    ):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.codec = codec or ("zstd" if zstandard else "gzip")
+        if self.codec == "zstd" and zstandard is None:
+            raise ValueError("zstd codec requires: pip install zstandard")
+        self.name_prefix = name_prefix
+        self.max_buffered = max_buffered
+        self.stats = {"appended": 0, "written": 0, "batches": 0, "segments": 0, "write_errors": 0, "dropped": 0}
+
+        self._buffer = deque()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._segment_path: Optional[str] = None
+        self._segment_file = None
+        self._segment_started = 0.0
+        self._compressor = zstandard.ZstdCompressor(level=3) if self.codec == "zstd" else None
+
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+        self._thread.start()
+
+    def append(self, username: str, phone_number: Optional[str], question: str, answer: str, **extra):
+        """
+        Queue one conversation turn (hot path: no I/O, no serialization)
+
+        Args:
+            username: Telegram username
+            phone_number: User's phone number (if known)
+            question: Full user message
+            answer: Full bot reply
+        """
+        record = {
+            "ts": time.time(),
+            "username": username,
+            "phone_number": phone_number,
+            "question": question,
+            "answer": answer,
+        }
+        if extra:
+            record.update(extra)
+        if len(self._buffer) >= self.max_buffered:
+            self._drop_oldest(len(self._buffer) - self.max_buffered + 1)
+        self._buffer.append(record)
+        self.stats["appended"] += 1
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush()
+            if self._segment_file and time.time() - self._segment_started >= self.max_segment_age:
+                self._rotate()
+        self._flush()
+        self._close_segment()
+
+    def _compress(self, data: bytes) -> bytes:
+        """Each batch becomes one self-contained frame; concatenated frames stay readable"""
+        if self._compressor is not None:
+            return self._compressor.compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _open_segment(self):
+        self._segment_started = time.time()
+        stamp = datetime.fromtimestamp(self._segment_started).strftime("%Y%m%dT%H%M%S")
+        sequence = self.stats["segments"]
+        while True:
+            name = f"{self.name_prefix}-{stamp}-{sequence:04d}{_codec_extension(self.codec)}"
+            self._segment_path = os.path.join(self.directory, name)
+            # A writer restarted within the same second must not replace an earlier segment
+            if not os.path.exists(self._segment_path) and not os.path.exists(self._segment_path + OPEN_SUFFIX):
+                break
+            sequence += 1
+        self._segment_file = open(self._segment_path + OPEN_SUFFIX, "ab")
+        self.stats["segments"] += 1
+
+    def _close_segment(self):
+        if self._segment_file is None:
+            return
+        self._segment_file.close()
+        os.replace(self._segment_path + OPEN_SUFFIX, self._segment_path)
+        self._segment_file = None
+
+    def _rotate(self):
+        self._close_segment()
+        logger.info(f"🗂️ Rotated conversation log segment {os.path.basename(self._segment_path)}")
+
+    def _flush(self):
+        try:
+            while self._buffer:
+                self._write_batch()
+        except OSError:
+            pass
+
+    def _write_batch(self):
+        records = []
+        while self._buffer and len(records) < self.batch_size:
+            records.append(self._buffer.popleft())
+        try:
+            payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+            if self._segment_file is None:
+                self._open_segment()
+            self._segment_file.write(self._compress(payload))
+            self._segment_file.flush()
+            self.stats["written"] += len(records)
+            self.stats["batches"] += 1
+            if self._segment_file.tell() >= self.max_segment_bytes:
+                self._rotate()
+        except OSError as e:
+            self.stats["write_errors"] += 1
+            # Put the batch back so it is retried on the next flush
+            self._buffer.extendleft(reversed(records))
+            self._drop_oldest(len(self._buffer) - self.max_buffered)
+            logger.error(
+                f"❌ Failed to write conversation log: {e} "
+                f"({len(self._buffer)} records waiting, {self.stats['dropped']} dropped so far)"
+            )
+            raise
+
+    def _drop_oldest(self, count: int):
+        dropped = 0
+        try:
+            while dropped < count:
+                self._buffer.popleft()
+                dropped += 1
+        except IndexError:  # The writer thread took the rest
+            pass
+        self.stats["dropped"] += dropped
+
+    def flush(self):
+        """Ask the writer thread to write everything buffered so far"""
+        self._wakeup.set()
+
+    def close(self):
+        """Write remaining records and finish the current segment"""
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=30)
+
+
+def list_segments(directory: str, include_open: bool = False) -> List[str]:
+    """Segment paths in write order (oldest first)"""
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for name in os.listdir(directory):
+        if name.endswith((".jsonl.gz", ".jsonl.zst")):
+            names.append(name)
+        elif include_open and name.endswith(OPEN_SUFFIX):
+            names.append(name)
+
+    def order(name):
+        match = SEGMENT_ORDER_PATTERN.search(name)
+        return (match.group(1), int(match.group(2))) if match else ("", 0)
+
+    names.sort(key=order)
+    return [os.path.join(directory, name) for name in names]
+
+
+def _open_segment_for_read(path: str):
+    if ".jsonl.zst" in path:
+        if zstandard is None:
+            raise RuntimeError("Reading zstd segments requires: pip install zstandard")
+        raw = open(path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True), encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def iter_records(
+    directory: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    include_open: bool = False,
+) -> Iterator[dict]:
+    """
+    Stream records from all segments
+
+    Args:
+        directory: Log directory
+        since: Only records with ts >= since (unix time)
+        until: Only records with ts < until
+        include_open: Also read the segment currently being written
+                      (its last batch may be incomplete and is skipped)
+    """
+    for path in list_segments(directory, include_open):
+        for record in iter_segment(path):
+            if since is not None and record["ts"] < since:
+                continue
+            if until is not None and record["ts"] >= until:
+                continue
+            yield record
+
+
+def iter_segment(path: str) -> Iterator[dict]:
+    """Records of one segment in write order (stops at the truncated tail of an open segment)"""
+    try:
+        with _open_segment_for_read(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+    except (EOFError, OSError) as e:
+        # Truncated tail of an open segment, or it was renamed while we read it
+        logger.debug(f"Stopped reading {path}: {e}")
+
+
+def iter_batches(directory: str, batch_size: int = 10000, columns: Optional[List[str]] = None, **filters) -> Iterator[Dict[str, list]]:
+    """
+    Stream records as column batches ({"question": [...], "answer": [...], ...})
+
+    Each batch converts directly into a DataFrame or Arrow table.
+    """
+    columns = columns or COLUMNS
+    batch = {column: [] for column in columns}
+    count = 0
+    for record in iter_records(directory, **filters):
+        for column in columns:
+            batch[column].append(record.get(column))
+        count += 1
+        if count >= batch_size:
+            yield batch
+            batch = {column: [] for column in columns}
+            count = 0
+    if count:
+        yield batch
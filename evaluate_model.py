@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""
+Evaluation runner for MiraiBot's emotion model
+Scores every evaluation text against each emotion label in batches, caches
+the predictions on disk, computes the metrics with NumPy and redraws the
+charts in Output/ from the cached predictions.
+
+The model classifies by likelihood: each label is scored as the
+log-probability of " <label>" after the training prompt and the reply
+opening "I sense you're feeling" (dataset_builder.py's fallback reply).
+Rows (text x label) are sorted by length and cut into batches under a token
+budget, so little compute goes to padding; only the label positions go
+through the output layer.
+
+Requires: pip install -r requirements-training.txt
+
+Usage:
+    python evaluate_model.py --model emotion_model_merged --limit 2000
+    python evaluate_model.py --model tiny-random --eval-file fixtures/eval.jsonl   # CPU check for CI
+    python evaluate_model.py --charts-only eval_cache/predictions-<key>.jsonl --trainer-state trainer_state.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dataset_builder import BUILDER_VERSION, PROMPT_TEMPLATE
+from sequence_packing import PaddingStats
+
+logger = logging.getLogger(__name__)
+
+CLASSIFY_PREFIX = "I sense you're feeling"
+
+# File names of the charts in Output/
+CONFUSION_CHART = "confusion mat.png"
+ROC_CHART = "ROC.png"
+TRAINING_CHART = "training perf analysis.png"
+
+
+def classification_prompt(text: str) -> str:
+    """Training prompt for a text, up to the start of the label"""
+    return PROMPT_TEMPLATE.split("{response}")[0].format(text=text) + CLASSIFY_PREFIX
+
+
+def token_budget_batches(lengths: Sequence[int], max_tokens: int, max_batch_size: int = 256) -> List[List[int]]:
+    """
+    Batches of similar-length rows whose padded size stays under a token budget
+
+    Rows are taken longest first, so each batch pads to its first row.
+
+    Args:
+        lengths: Token count of each row
+        max_tokens: Most rows x padded length per batch (a longer row gets a batch of its own)
+        max_batch_size: Most rows per batch
+
+    Returns:
+        Row indices per batch
+    """
+    batches, batch, width = [], [], 0
+    for index in sorted(range(len(lengths)), key=lambda i: (-lengths[i], i)):
+        width = width or lengths[index]
+        if batch and (len(batch) + 1) * width > max_tokens or len(batch) == max_batch_size:
+            batches.append(batch)
+            batch, width = [], lengths[index]
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmotionModel:
+    """
+    Causal language model scored on emotion labels
+
+    Args:
+        model: transformers causal LM
+        tokenizer: Its tokenizer
+        name: Identifies the model in the prediction cache
+        device: Torch device
+        revision: Hub commit the weights were loaded from (None for local or in-memory models)
+    """
+
+    def __init__(self, model, tokenizer, name: str, device: str = "cpu", revision: Optional[str] = None):
+        self.model = model.to(device).eval()
+        self.tokenizer = tokenizer
+        self.name = name
+        self.device = device
+        self.revision = revision
+        config = model.config
+        self.max_length = getattr(config, "max_position_embeddings", None) or getattr(config, "n_positions", 2048)
+        self.stats = PaddingStats()
+
+    @classmethod
+    def from_pretrained(cls, path: str, device: str = "cpu", revision: Optional[str] = None) -> "EmotionModel":
+        """
+        Load a local model directory or a Hub model
+
+        Args:
+            path: Model directory or Hub id
+            device: Torch device
+            revision: Hub branch, tag or commit (default: the latest). It is
+                resolved to a commit first and the weights are loaded from that
+                commit, so cached predictions never outlive a re-pushed model.
+        """
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        if not os.path.isdir(path):
+            revision = resolve_model_revision(path, revision)
+        tokenizer = AutoTokenizer.from_pretrained(path, revision=revision)
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        return cls(AutoModelForCausalLM.from_pretrained(path, revision=revision), tokenizer, path, device, revision)
+
+    @classmethod
+    def tiny_random(cls, seed: int = 0) -> "EmotionModel":
+        """Two-layer GPT-2 with random weights and a byte tokenizer: runs offline on CPU in seconds"""
+        import torch
+        from transformers import ByT5Tokenizer, GPT2Config, GPT2LMHeadModel
+
+        torch.manual_seed(seed)
+        tokenizer = ByT5Tokenizer()
+        config = GPT2Config(
+            vocab_size=len(tokenizer), n_positions=1024, n_embd=64, n_layer=2, n_head=2,
+            bos_token_id=tokenizer.eos_token_id, eos_token_id=tokenizer.eos_token_id,
+        )
+        return cls(GPT2LMHeadModel(config), tokenizer, f"tiny-random-{seed}")
+
+    def version(self) -> str:
+        """Identifies the weights (file sizes and times for a local model, else the Hub commit)"""
+        if os.path.isdir(self.name):
+            files = sorted(os.listdir(self.name))
+            return ";".join(f"{name}:{os.stat(os.path.join(self.name, name)).st_size}:"
+                            f"{os.stat(os.path.join(self.name, name)).st_mtime_ns}" for name in files)
+        return self.revision or self.name
+
+    def score_labels(self, texts: Sequence[str], labels: Sequence[str], max_tokens: int = 16384) -> np.ndarray:
+        """
+        Log-probability of each label after each text's prompt
+
+        Args:
+            texts: Texts to classify
+            labels: Emotion labels
+            max_tokens: Token budget per batch
+
+        Returns:
+            (len(texts), len(labels)) float array
+        """
+        import torch
+
+        prompts = self.tokenizer([classification_prompt(text) for text in texts], add_special_tokens=False)["input_ids"]
+        endings = self.tokenizer([f" {label}" for label in labels], add_special_tokens=False)["input_ids"]
+        rows = []
+        for prompt in prompts:
+            for ending in endings:
+                rows.append((prompt[-(self.max_length - len(ending)):], ending))  # Keep the prompt's end
+        lengths = [len(prompt) + len(ending) for prompt, ending in rows]
+        scores = np.zeros(len(rows))
+        backbone, head = self.model.base_model, self.model.get_output_embeddings()
+        pad = self.tokenizer.pad_token_id
+
+        with torch.inference_mode():
+            for batch in token_budget_batches(lengths, max_tokens):
+                width = max(lengths[i] for i in batch)
+                input_ids = np.full((len(batch), width), pad, dtype=np.int64)
+                attention_mask = np.zeros((len(batch), width), dtype=np.int64)
+                row_of, position, target = [], [], []
+                for r, i in enumerate(batch):
+                    prompt, ending = rows[i]
+                    input_ids[r, :lengths[i]] = prompt + ending
+                    attention_mask[r, :lengths[i]] = 1
+                    # The token at p is predicted from position p - 1
+                    row_of.extend([r] * len(ending))
+                    position.extend(range(len(prompt) - 1, lengths[i] - 1))
+                    target.extend(ending)
+                hidden = backbone(
+                    input_ids=torch.from_numpy(input_ids).to(self.device),
+                    attention_mask=torch.from_numpy(attention_mask).to(self.device),
+                ).last_hidden_state
+                logits = head(hidden[torch.tensor(row_of, device=self.device), torch.tensor(position, device=self.device)])
+                token_scores = torch.log_softmax(logits.float(), dim=-1)[
+                    torch.arange(len(target), device=self.device), torch.tensor(target, device=self.device)
+                ]
+                scores[batch] = np.bincount(row_of, weights=token_scores.cpu().numpy(), minlength=len(batch))
+                self.stats.add(int(attention_mask.sum()), input_ids.size, len(batch))
+        return scores.reshape(len(texts), len(labels))
+
+    def generate(self, texts: Sequence[str], max_new_tokens: int = 128, max_tokens: int = 16384) -> List[str]:
+        """Greedy replies to texts, generated in left-padded batches of similar length"""
+        import torch
+
+        prompts = [PROMPT_TEMPLATE.split("{response}")[0].format(text=text) for text in texts]
+        lengths = [len(ids) for ids in self.tokenizer(prompts, add_special_tokens=False)["input_ids"]]
+        replies = [""] * len(texts)
+        self.tokenizer.padding_side = "left"
+        try:
+            with torch.inference_mode():
+                for batch in token_budget_batches([n + max_new_tokens for n in lengths], max_tokens):
+                    encoded = self.tokenizer(
+                        [prompts[i] for i in batch], add_special_tokens=False, padding=True, return_tensors="pt"
+                    ).to(self.device)
+                    output = self.model.generate(
+                        **encoded, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=self.tokenizer.pad_token_id
+                    )
+                    for r, i in enumerate(batch):
+                        replies[i] = self.tokenizer.decode(output[r, encoded["input_ids"].shape[1]:], skip_special_tokens=True)
+        finally:
+            self.tokenizer.padding_side = "right"
+        return replies
+
+
+def resolve_model_revision(path: str, revision: Optional[str] = None) -> Optional[str]:
+    """Commit sha of a Hub model at a branch/tag (default: the latest), or the revision as given if offline"""
+    try:
+        from huggingface_hub import HfApi
+
+        return HfApi().model_info(path, revision=revision).sha
+    except Exception as e:
+        logger.warning(
+            f"⚠️ Could not resolve the current commit of {path} ({e}); "
+            f"cached predictions are keyed by {revision or 'the name only'} (pass --revision to pin a commit)"
+        )
+        return revision
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class PredictionCache:
+    """
+    Label scores per text in a JSONL file, for one model and label set
+
+    The first line describes the model, labels and prompt; further lines
+    hold a text's key, true label and scores, or a "run" record listing the
+    texts (keys and true labels, in order) one evaluation used. Batches are
+    appended as they finish, so an interrupted run resumes where it stopped,
+    and --charts-only redraws exactly the population of a recorded run.
+
+    Args:
+        path: JSONL file
+        meta: Run description (written when the file is created)
+    """
+
+    def __init__(self, path: str, meta: Optional[dict] = None):
+        self.path = path
+        self.meta = meta
+        self.rows: Dict[str, dict] = {}
+        self.runs: List[dict] = []
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            self.meta = lines[0]["meta"] if lines else meta
+            for line in lines[1:]:
+                if "run" in line:
+                    self.runs.append(line["run"])
+                else:
+                    self.rows[line["key"]] = line
+
+    def _append(self, lines: List[dict]):
+        new = not os.path.exists(self.path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if new:
+                f.write(json.dumps({"meta": self.meta}) + "\n")
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+
+    def add(self, texts: Sequence[str], labels: Sequence[str], scores: np.ndarray):
+        rows = [
+            {"key": text_key(text), "label": label, "scores": [round(float(s), 5) for s in row_scores]}
+            for text, label, row_scores in zip(texts, labels, scores)
+        ]
+        self.rows.update((row["key"], row) for row in rows)
+        self._append(rows)
+
+    def add_run(self, texts: Sequence[str], labels: Sequence[str]):
+        """Record which texts (in order, with their true labels) one evaluation used"""
+        run = {"time": round(time.time(), 3), "keys": [text_key(text) for text in texts], "labels": list(labels)}
+        self.runs.append(run)
+        self._append([{"run": run}])
+
+
+def predict(
+    model: EmotionModel,
+    texts: Sequence[str],
+    true_labels: Sequence[str],
+    labels: Sequence[str],
+    cache_dir: str = "eval_cache",
+    max_tokens: int = 16384,
+    chunk: int = 256,
+) -> Tuple[np.ndarray, str]:
+    """
+    Label scores for texts, computed only for texts not in the prediction cache
+
+    Args:
+        model: Model to score with
+        texts: Evaluation texts
+        true_labels: Their labels (stored with the predictions for the charts)
+        labels: Label set to score
+        cache_dir: Directory of prediction files
+        max_tokens: Token budget per batch
+        chunk: Texts scored between cache writes
+
+    Returns:
+        ((len(texts), len(labels)) scores, path of the prediction file)
+    """
+    meta = {"model": model.name, "version": model.version(), "labels": list(labels), "prompt": CLASSIFY_PREFIX,
+            "builder": BUILDER_VERSION}
+    key = hashlib.sha256(json.dumps(meta, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    cache = PredictionCache(os.path.join(cache_dir, f"predictions-{key}.jsonl"), meta)
+    # One row per distinct text not yet scored
+    missing = list({text_key(text): i for i, text in enumerate(texts) if text_key(text) not in cache.rows}.values())
+    if missing:
+        started = time.perf_counter()
+        for start in range(0, len(missing), chunk):
+            part = missing[start:start + chunk]
+            scores = model.score_labels([texts[i] for i in part], labels, max_tokens)
+            cache.add([texts[i] for i in part], [true_labels[i] for i in part], scores)
+        elapsed = time.perf_counter() - started
+        stats = model.stats.as_dict()
+        logger.info(
+            f"✅ Scored {len(missing):,} texts x {len(labels)} labels in {elapsed:.1f}s "
+            f"({len(missing) / elapsed:.1f} texts/s, {stats['padding_ratio'] * 100:.1f}% padding)"
+        )
+    logger.info(f"✅ {len(texts) - len(missing):,} of {len(texts):,} predictions from {cache.path}")
+    cache.add_run(texts, true_labels)
+    return np.array([cache.rows[text_key(text)]["scores"] for text in texts]), cache.path
+
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    shifted = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+def confusion_matrix(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> np.ndarray:
+    """Counts with true classes as rows and predicted classes as columns"""
+    return np.bincount(y_true * n_classes + y_pred, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def roc_curve(positive: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One-vs-rest ROC curve
+
+    Tied scores move the curve diagonally, as one threshold.
+
+    Returns:
+        (false positive rates, true positive rates), both starting at 0
+    """
+    order = np.argsort(-scores, kind="stable")
+    scores, positive = scores[order], positive[order]
+    last_of_tie = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    true_positives = np.cumsum(positive)[last_of_tie]
+    false_positives = (last_of_tie + 1) - true_positives
+    tpr = np.r_[0, true_positives] / max(positive.sum(), 1)
+    fpr = np.r_[0, false_positives] / max(len(positive) - positive.sum(), 1)
+    return fpr, tpr
+
+
+def auc(fpr: np.ndarray, tpr: np.ndarray) -> float:
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def compute_metrics(true_labels: Sequence[str], scores: np.ndarray, labels: Sequence[str]) -> dict:
+    """
+    Classification metrics from label scores
+
+    Args:
+        true_labels: True label per text
+        scores: (texts, labels) log-probabilities
+        labels: Label names (columns of scores)
+
+    Returns:
+        Accuracy, macro/weighted F1, per-class precision/recall/F1/support/AUC,
+        the confusion matrix and the ROC curves
+    """
+    index = {label: i for i, label in enumerate(labels)}
+    y_true = np.array([index[label] for label in true_labels], dtype=np.int64)
+    y_pred = scores.argmax(axis=1)
+    probabilities = softmax(scores)
+    matrix = confusion_matrix(y_true, y_pred, len(labels))
+
+    true_positives = np.diag(matrix).astype(float)
+    support = matrix.sum(axis=1)
+    precision = np.divide(true_positives, matrix.sum(axis=0), out=np.zeros(len(labels)), where=matrix.sum(axis=0) > 0)
+    recall = np.divide(true_positives, support, out=np.zeros(len(labels)), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(labels)), where=precision + recall > 0)
+
+    curves, areas = {}, []
+    for k, label in enumerate(labels):
+        fpr, tpr = roc_curve(y_true == k, probabilities[:, k])
+        curves[label] = {"fpr": fpr.round(5).tolist(), "tpr": tpr.round(5).tolist()}
+        areas.append(auc(fpr, tpr) if 0 < support[k] < len(y_true) else float("nan"))
+
+    return {
+        "samples": len(y_true),
+        "accuracy": float((y_pred == y_true).mean()) if len(y_true) else 0.0,
+        "macro_f1": float(f1.mean()),
+        "weighted_f1": float((f1 * support).sum() / max(support.sum(), 1)),
+        "per_class": {
+            label: {"precision": float(precision[k]), "recall": float(recall[k]), "f1": float(f1[k]),
+                    "support": int(support[k]), "auc": areas[k]}
+            for k, label in enumerate(labels)
+        },
+        "labels": list(labels),
+        "confusion_matrix": matrix.tolist(),
+        "roc": curves,
+    }
+
+
+def _pyplot():
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.rcdefaults()
+    return plt
+
+
+def _save(plt, figure, path: str):
+    # No software/version metadata, so the same predictions give byte-identical images
+    figure.savefig(path, dpi=150, bbox_inches="tight", metadata={"Software": None})
+    plt.close(figure)
+
+
+def plot_confusion(metrics: dict, path: str):
+    """Confusion matrix as counts and row-normalized proportions"""
+    plt = _pyplot()
+    labels, matrix = metrics["labels"], np.array(metrics["confusion_matrix"])
+    normalized = matrix / np.maximum(matrix.sum(axis=1, keepdims=True), 1)
+    figure, axes = plt.subplots(1, 2, figsize=(18, 7))
+    figure.suptitle(f"Classification Performance ({metrics['samples']:,} samples, accuracy {metrics['accuracy']:.1%})",
+                    fontsize=16, fontweight="bold")
+    for axis, values, title, fmt, cmap in (
+        (axes[0], matrix, "Confusion Matrix (Counts)", "d", "Blues"),
+        (axes[1], normalized, "Confusion Matrix (Normalized)", ".2f", "RdYlGn"),
+    ):
+        image = axis.imshow(values, cmap=cmap, vmin=0, vmax=1 if fmt != "d" else None)
+        figure.colorbar(image, ax=axis)
+        axis.set_xticks(range(len(labels)), labels, rotation=45, ha="right")
+        axis.set_yticks(range(len(labels)), labels)
+        threshold = values.max() / 2 if values.size else 0
+        for i in range(len(labels)):
+            for j in range(len(labels)):
+                axis.text(j, i, format(values[i, j], fmt), ha="center", va="center", fontsize=9,
+                          color="white" if values[i, j] > threshold and cmap == "Blues" else "black")
+        axis.set_xlabel("Predicted Emotion", fontsize=12, fontweight="bold")
+        axis.set_ylabel("True Emotion", fontsize=12, fontweight="bold")
+        axis.set_title(title, fontsize=14, fontweight="bold")
+    _save(plt, figure, path)
+
+
+def plot_roc(metrics: dict, path: str):
+    """One-vs-rest ROC curves, per-class precision/recall/F1 and class support"""
+    plt = _pyplot()
+    labels, per_class = metrics["labels"], metrics["per_class"]
+    figure, axes = plt.subplots(1, 3, figsize=(22, 7))
+    figure.suptitle("ROC Curves & Performance Metrics", fontsize=16, fontweight="bold")
+
+    colors = plt.cm.tab10(np.linspace(0, 1, max(len(labels), 1)))
+    for label, color in zip(labels, colors):
+        curve = metrics["roc"][label]
+        axes[0].plot(curve["fpr"], curve["tpr"], color=color, lw=2, label=f"{label} (AUC = {per_class[label]['auc']:.2f})")
+    axes[0].plot([0, 1], [0, 1], "k--", lw=1, label="Random Classifier")
+    axes[0].set_xlabel("False Positive Rate", fontsize=11, fontweight="bold")
+    axes[0].set_ylabel("True Positive Rate", fontsize=11, fontweight="bold")
+    axes[0].set_title("ROC Curves (One-vs-Rest)", fontsize=13, fontweight="bold")
+    axes[0].legend(loc="lower right", fontsize=9)
+
+    x, width = np.arange(len(labels)), 0.27
+    for offset, (name, color) in zip((-width, 0, width), (("precision", "#3498db"), ("recall", "#e74c3c"), ("f1", "#2ecc71"))):
+        axes[1].bar(x + offset, [per_class[label][name] for label in labels], width, label=name.title(), color=color, alpha=0.8)
+    axes[1].set_xticks(x, labels, rotation=45, ha="right")
+    axes[1].set_ylim(0, 1)
+    axes[1].set_ylabel("Score", fontsize=11, fontweight="bold")
+    axes[1].set_title(f"Precision, Recall & F1 (macro F1 {metrics['macro_f1']:.2f})", fontsize=13, fontweight="bold")
+    axes[1].legend()
+
+    axes[2].barh(labels, [per_class[label]["support"] for label in labels], color="#9b59b6", alpha=0.8)
+    axes[2].invert_yaxis()
+    axes[2].set_xlabel("Number of Samples", fontsize=11, fontweight="bold")
+    axes[2].set_title("Class Distribution (Support)", fontsize=13, fontweight="bold")
+    _save(plt, figure, path)
+
+
+def plot_training(log_history: List[dict], path: str):
+    """Training and validation loss and the learning rate from a trainer_state.json log"""
+    plt = _pyplot()
+    train = [(entry["step"], entry["loss"]) for entry in log_history if "loss" in entry]
+    evaluation = [(entry["step"], entry["eval_loss"]) for entry in log_history if "eval_loss" in entry]
+    rates = [(entry["step"], entry["learning_rate"]) for entry in log_history if "learning_rate" in entry]
+    figure, axes = plt.subplots(2, 2, figsize=(16, 12))
+    figure.suptitle("Training Performance Analysis", fontsize=16, fontweight="bold")
+
+    if train:
+        steps, losses = np.array(train).T
+        axes[0, 0].plot(steps, losses, "b-", lw=2, alpha=0.7, label="Training Loss")
+        window = min(10, len(losses))
+        axes[0, 0].plot(steps[window - 1:], np.convolve(losses, np.ones(window) / window, "valid"), "r--", lw=2,
+                        label=f"Moving Average ({window} logs)")
+        axes[1, 0].plot(steps, losses, "b-", lw=2, alpha=0.7, label="Training Loss")
+    if evaluation:
+        steps, losses = np.array(evaluation).T
+        best = int(np.argmin(losses))
+        axes[0, 1].plot(steps, losses, "ro-", lw=2, label="Validation Loss")
+        axes[0, 1].axhline(losses[best], color="g", linestyle="--", alpha=0.6, label=f"Best: {losses[best]:.4f}")
+        axes[1, 0].plot(steps, losses, "ro-", lw=2, label="Validation Loss")
+    if rates:
+        steps, values = np.array(rates).T
+        axes[1, 1].plot(steps, values, "g-", lw=2)
+        axes[1, 1].ticklabel_format(style="scientific", axis="y", scilimits=(0, 0))
+    for axis, title, ylabel in (
+        (axes[0, 0], "Training Loss Progression", "Loss"),
+        (axes[0, 1], "Validation Loss Progression", "Loss"),
+        (axes[1, 0], "Training vs Validation Loss", "Loss"),
+        (axes[1, 1], "Learning Rate Schedule", "Learning Rate"),
+    ):
+        axis.set_xlabel("Training Steps", fontsize=12, fontweight="bold")
+        axis.set_ylabel(ylabel, fontsize=12, fontweight="bold")
+        axis.set_title(title, fontsize=14, fontweight="bold")
+        axis.grid(alpha=0.3)
+        if axis.get_legend_handles_labels()[0]:
+            axis.legend()
+    _save(plt, figure, path)
+
+
+def write_report(metrics: dict, output_dir: str, trainer_state: Optional[str] = None) -> List[str]:
+    """
+    Write metrics.json and the charts
+
+    Returns:
+        Paths written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, "metrics.json"), os.path.join(output_dir, CONFUSION_CHART), os.path.join(output_dir, ROC_CHART)]
+    with open(paths[0], "w", encoding="utf-8") as f:
+        json.dump({name: value for name, value in metrics.items() if name != "roc"}, f, indent=2)
+    plot_confusion(metrics, paths[1])
+    plot_roc(metrics, paths[2])
+    if trainer_state:
+        with open(trainer_state, encoding="utf-8") as f:
+            log_history = json.load(f)["log_history"]
+        paths.append(os.path.join(output_dir, TRAINING_CHART))
+        plot_training(log_history, paths[-1])
+    logger.info(f"📊 Wrote {', '.join(os.path.basename(path) for path in paths)} to {output_dir}")
+    return paths
+
+
+def load_eval_rows(eval_file: Optional[str] = None, cache_dir: str = "data_cache") -> List[dict]:
+    """Rows with "text" and "emotion": a JSONL file, or the test split of the dataset_builder.py build"""
+    if eval_file:
+        with open(eval_file, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    from dataset_builder import build_datasets
+
+    return list(build_datasets(cache_dir=cache_dir)["test"].select_columns(["text", "emotion"]))
+
+
+def select_rows(rows: List[dict], labels: Optional[List[str]], top_labels: int, limit: Optional[int]) -> Tuple[List[dict], List[str]]:
+    """
+    Single-label evaluation rows (the first emotion of each row)
+
+    Args:
+        rows: Rows with "text" and "emotion" ("joy, excitement" counts as joy)
+        labels: Label set (default: the most frequent ones)
+        top_labels: How many labels to keep by default
+        limit: Most rows
+
+    Returns:
+        (rows whose label is in the label set, with "label" added; label set)
+    """
+    for row in rows:
+        row["label"] = row["emotion"].split(",")[0].strip()
+    labels = labels or [label for label, _ in Counter(row["label"] for row in rows).most_common(top_labels)]
+    selected = [row for row in rows if row["label"] in labels]
+    return selected[:limit] if limit else selected, labels
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Evaluate the emotion model and redraw the Output/ charts")
+    parser.add_argument("--model", help='Model path or Hub id ("tiny-random": random 2-layer model for CPU checks)')
+    parser.add_argument("--eval-file", help="JSONL rows with text and emotion (default: the dataset_builder.py test split)")
+    parser.add_argument("--cache-dir", default="data_cache", help="dataset_builder.py cache directory")
+    parser.add_argument("--predictions-dir", default="eval_cache")
+    parser.add_argument("--output", default="Output")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--labels", help="Comma-separated label set (default: the most frequent labels)")
+    parser.add_argument("--top-labels", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=16384, help="Token budget per batch")
+    parser.add_argument("--revision", help="Hub branch, tag or commit of --model (default: the latest commit)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--samples", type=int, default=0, help="Also print generated replies to this many texts")
+    parser.add_argument("--trainer-state", help="trainer_state.json for the training chart")
+    parser.add_argument("--charts-only", metavar="PREDICTIONS", help="Redraw the charts of the last run recorded in a prediction file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    if args.charts_only:
+        cache = PredictionCache(args.charts_only)
+        if not cache.runs:
+            parser.error(f"{args.charts_only} has no recorded evaluation run")
+        # The file collects every text ever scored with this model; redraw only the last run's
+        run = cache.runs[-1]
+        scores = np.array([cache.rows[key]["scores"] for key in run["keys"]])
+        metrics = compute_metrics(run["labels"], scores, cache.meta["labels"])
+    else:
+        if not args.model:
+            parser.error("--model is required unless --charts-only is given")
+        rows, labels = select_rows(
+            load_eval_rows(args.eval_file, args.cache_dir), args.labels.split(",") if args.labels else None,
+            args.top_labels, args.limit,
+        )
+        if args.model == "tiny-random":
+            model = EmotionModel.tiny_random()
+        else:
+            model = EmotionModel.from_pretrained(args.model, args.device, args.revision)
+        texts, true_labels = [row["text"] for row in rows], [row["label"] for row in rows]
+        scores, _ = predict(model, texts, true_labels, labels, args.predictions_dir, args.max_tokens)
+        metrics = compute_metrics(true_labels, scores, labels)
+        if args.samples:
+            for text, reply in zip(texts, model.generate(texts[:args.samples], max_tokens=args.max_tokens)):
+                print(f"User: {text}\nBot: {reply}\n")
+
+    write_report(metrics, args.output, args.trainer_state)
+    print(f"accuracy {metrics['accuracy']:.3f}  macro F1 {metrics['macro_f1']:.3f}  ({metrics['samples']:,} samples)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
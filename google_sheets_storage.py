@@ -4,13 +4,12 @@ Simple Google Sheets storage for MiraiBot conversations
 Stores: Username, User Question, Bot Answer
 """
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import logging
 import os
 import base64
 import json
 import tempfile
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -54,7 +53,8 @@ def get_credentials_file():
 class GoogleSheetsStorage:
     """Simple Google Sheets storage"""
     
-    def __init__(self):
+    def __init__(self, sheet_id: str = SHEET_ID):
+        self.sheet_id = sheet_id
         self.sheet = None
         self.enabled = False
         self.temp_creds_file = None
@@ -68,6 +68,10 @@ class GoogleSheetsStorage:
             
             self.temp_creds_file = creds_file if creds_file != 'google_credentials.json' else None
             
+            # Imported here: gspread and oauth2client are slow to import and optional
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+            
             # Setup credentials
             scope = [
                 'https://spreadsheets.google.com/feeds',
@@ -77,15 +81,17 @@ class GoogleSheetsStorage:
             client = gspread.authorize(creds)
             
             # Open your specific sheet
-            self.sheet = client.open_by_key(SHEET_ID).sheet1
+            self.sheet = client.open_by_key(sheet_id).sheet1
             self.enabled = True
-            logger.info(f"✅ Connected to Google Sheet: {SHEET_ID}")
+            logger.info(f"✅ Connected to Google Sheet: {sheet_id}")
             
             # Add headers if sheet is empty
             if self.sheet.row_count == 0 or not self.sheet.cell(1, 1).value:
                 self.sheet.append_row(["Username", "Phone Number", "User Question", "Bot Answer"])
                 logger.info("📋 Added headers to sheet")
             
+        except ImportError:
+            logger.warning("⚠️ Google Sheets storage not available. Install: pip install gspread oauth2client")
         except Exception as e:
             logger.error(f"❌ Failed to connect to Google Sheets: {e}")
             logger.error("Make sure the sheet is shared with your service account email")
@@ -137,6 +143,32 @@ def init_sheets_storage():
     sheets_storage = GoogleSheetsStorage()
     return sheets_storage
 
+def init_sheets_storage_in_background(sheet_id: str = None, on_ready=None):
+    """
+    Connect to Google Sheets in a daemon thread
+    
+    The bot keeps serving while this runs; save_conversation() returns False
+    until the connection is ready.
+    
+    Args:
+        sheet_id: Sheet to connect to (None: the default sheet, stored as the global instance)
+        on_ready: Called with the GoogleSheetsStorage once it is created
+    
+    Returns:
+        threading.Thread: The initialization thread
+    """
+    def run():
+        try:
+            storage = GoogleSheetsStorage(sheet_id) if sheet_id else init_sheets_storage()
+            if on_ready:
+                on_ready(storage)
+        except Exception as e:
+            logger.warning(f"Google Sheets initialization failed: {e}")
+    
+    thread = threading.Thread(target=run, name="sheets-init", daemon=True)
+    thread.start()
+    return thread
+
 def save_conversation(username: str, phone_number: str, question: str, answer: str):
     """Convenience function to save conversation"""
     if sheets_storage and sheets_storage.enabled:
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Groq chat-completions client for MiraiBot
+Rotates API keys, retries with jittered backoff inside a latency budget,
+and can hedge slow requests onto a second key
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Rate limits and transient server errors are worth another attempt
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GroqError(Exception):
+    """Raised when a chat completion could not be obtained"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DeadlineExceeded(GroqError):
+    """Raised when the latency budget for a turn runs out"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value
+
+    Args:
+        value: Header value (delay in seconds or an HTTP date)
+
+    Returns:
+        Delay in seconds, or None if missing/invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """Rolling window of successful request latencies"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the given percentile, or None if there are too few samples"""
+        if len(self.samples) < 20:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class GroqClient:
+    """Async Groq client shared by all user turns"""
+
+    def __init__(
+        self,
+        api_keys: List[str],
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 4.0,
+        hedge: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_default_delay: float = 3.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_keys = list(api_keys)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.latency = LatencyTracker()
+        self.current_key_index = 0
+        # Monotonic time before which each key should not be used (Retry-After)
+        self.key_available_at: Dict[int, float] = {}
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(transport=self._transport)
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def rotate_key(self) -> bool:
+        """Switch to the next API key. Returns False if there is no backup key."""
+        if len(self.api_keys) <= 1:
+            return False
+        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
+        logger.info(f"🔄 Switched to backup API key #{self.current_key_index + 1}")
+        return True
+
+    def _pick_key(self, exclude: Optional[int] = None) -> Optional[int]:
+        """Return the first key, starting at the current one, that is not cooling down"""
+        now = time.monotonic()
+        for offset in range(len(self.api_keys)):
+            index = (self.current_key_index + offset) % len(self.api_keys)
+            if index == exclude:
+                continue
+            if self.key_available_at.get(index, 0) <= now:
+                return index
+        return None
+
+    def _hedge_delay(self) -> float:
+        p95 = self.latency.percentile(95)
+        if p95 is None:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, p95)
+
+    async def _post(self, key_index: int, payload: dict, timeout: float) -> dict:
+        """Single HTTP attempt with one key"""
+        started = time.monotonic()
+        try:
+            response = await self._get_http().post(
+                GROQ_API_URL,
+                headers={
+                    "Authorization": f"Bearer {self.api_keys[key_index]}",
+                    "Content-Type": "application/json",
+                },
+                json=payload,
+                timeout=timeout,
+            )
+        except httpx.TimeoutException as e:
+            raise GroqError(f"Request timed out after {timeout:.1f}s") from e
+        except httpx.HTTPError as e:
+            raise GroqError(f"Request failed: {e}") from e
+
+        if response.status_code >= 400:
+            retry_after = parse_retry_after(response.headers.get("retry-after"))
+            if retry_after is not None:
+                self.key_available_at[key_index] = time.monotonic() + retry_after
+            logger.error(f"Groq API key #{key_index + 1} returned {response.status_code}: {response.text[:500]}")
+            raise GroqError(f"HTTP {response.status_code}", status_code=response.status_code)
+
+        self.latency.record(time.monotonic() - started)
+        data = response.json()
+        data["key_index"] = key_index  # For usage accounting per key
+        return data
+
+    async def _attempt(self, key_index: int, payload: dict, timeout: float, hedge: bool) -> dict:
+        """One attempt, optionally racing a hedged request on another key"""
+        primary = asyncio.create_task(self._post(key_index, payload, timeout))
+        tasks = [primary]
+        try:
+            if not hedge:
+                return await primary
+
+            delay = min(self._hedge_delay(), timeout)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            hedge_index = self._pick_key(exclude=key_index)
+            if hedge_index is None:
+                return await primary
+
+            logger.info(f"⏱️ Hedging slow request onto API key #{hedge_index + 1} after {delay:.2f}s")
+            tasks.append(asyncio.create_task(self._post(hedge_index, payload, timeout - delay)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel the losing (or abandoned) request so it releases its connection
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def chat_completion(self, payload: dict, budget: float, timeout: Optional[float] = None) -> dict:
+        """
+        Request a chat completion within a latency budget
+
+        Args:
+            payload: Chat completions request body
+            budget: Seconds available for the whole turn, retries included
+            timeout: Per-attempt timeout (defaults to the client timeout)
+
+        Returns:
+            Parsed JSON response, plus "key_index": the API key that answered
+
+        Raises:
+            GroqError: If every attempt failed or the budget ran out
+        """
+        if not self.api_keys:
+            raise GroqError("No Groq API keys configured")
+
+        deadline = time.monotonic() + budget
+        attempt_timeout = timeout or self.timeout
+        last_error: Optional[GroqError] = None
+
+        for attempt in range(self.max_retries + 1):
+            key_index = self._pick_key()
+            if key_index is None:
+                # Every key is cooling down - wait for the earliest one if the budget allows
+                wait = min(self.key_available_at.values()) - time.monotonic()
+                if time.monotonic() + wait >= deadline:
+                    break
+                await asyncio.sleep(max(0.0, wait))
+                key_index = self._pick_key()
+                if key_index is None:
+                    break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0.1:
+                break
+
+            hedge = self.hedge and len(self.api_keys) > 1
+            try:
+                return await self._attempt(key_index, payload, min(attempt_timeout, remaining), hedge)
+            except GroqError as e:
+                last_error = e
+                if e.status_code is not None and e.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+                if e.status_code == 429:
+                    self.rotate_key()
+
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            if time.monotonic() + delay >= deadline:
+                break
+            await asyncio.sleep(delay)
+
+        if last_error is not None:
+            raise last_error
+        raise DeadlineExceeded(f"Latency budget of {budget:.1f}s exhausted")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+On-demand profiling for MiraiBot
+Samples the stacks of every thread for a few seconds (sys._current_frames,
+no tracing hooks) and optionally snapshots allocations with tracemalloc.
+Nothing runs until a profile is requested, so there is no cost when off.
+
+Each profile writes:
+    profile-<time>.collapsed   flamegraph.pl / speedscope compatible stacks
+    profile-<time>-alloc.txt   top allocation sites (when memory is profiled)
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_SECONDS = 120.0
+
+# Only one profile at a time: samplers would see each other and tracemalloc is process-wide
+_profile_lock = threading.Lock()
+
+
+class ProfileBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+
+def collapse_stack(frame, thread_name: str) -> str:
+    """One thread's stack as "thread;outer (file:line);...;inner (file:line)" """
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+class StackSampler:
+    """
+    Collects collapsed stacks of all threads at a fixed interval
+
+    Args:
+        interval: Seconds between samples
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[collapse_stack(frame, names.get(thread_id, f"thread-{thread_id}"))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def top_functions(self, n: int = 10) -> List[tuple]:
+        """(innermost frame, share of samples) for the busiest frames, idle waits included"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(leaf, count / total) for leaf, count in leaves.most_common(n)]
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, n: int = 25) -> List[dict]:
+    """Allocation sites holding the most memory"""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    return [
+        {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "bytes": stat.size, "blocks": stat.count}
+        for stat in snapshot.statistics("lineno")[:n]
+    ]
+
+
+def run_profile(seconds: float, output_dir: str, memory: bool = True, interval: float = 0.005) -> Dict:
+    """
+    Profile the process for a while (blocks the calling thread)
+
+    Args:
+        seconds: How long to sample (at most MAX_SECONDS)
+        output_dir: Directory for the collapsed stacks and allocation report
+        memory: Also trace allocations (slows allocations while it runs)
+        interval: Seconds between stack samples
+
+    Returns:
+        Summary with the output paths, sample count, busiest frames and
+        top allocation sites
+
+    Raises:
+        ProfileBusy: If another profile is running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfileBusy("A profile is already running")
+    try:
+        seconds = max(0.1, min(float(seconds), MAX_SECONDS))
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}")
+        started_tracing = memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        sampler = StackSampler(interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            sampler.stop()
+            snapshot = tracemalloc.take_snapshot() if memory else None
+            if started_tracing:
+                tracemalloc.stop()
+        elapsed = time.perf_counter() - started
+
+        report = {
+            "seconds": round(elapsed, 2),
+            "samples": sampler.samples,
+            "collapsed_path": f"{base}.collapsed",
+            "top_functions": [(leaf, round(share, 3)) for leaf, share in sampler.top_functions()],
+            "alloc_path": None,
+            "top_allocations": [],
+        }
+        sampler.write_collapsed(report["collapsed_path"])
+        if snapshot is not None:
+            allocations = top_allocations(snapshot)
+            report["alloc_path"] = f"{base}-alloc.txt"
+            with open(report["alloc_path"], "w", encoding="utf-8") as f:
+                f.write(f"Top allocation sites after {elapsed:.1f}s (new allocations since tracing started)\n")
+                for allocation in allocations:
+                    f.write(f"{allocation['bytes'] / 1024:>10.1f} KiB {allocation['blocks']:>8} blocks  {allocation['site']}\n")
+            report["top_allocations"] = allocations[:10]
+        logger.info(f"🔬 Profiled {elapsed:.1f}s ({sampler.samples} samples) -> {report['collapsed_path']}")
+        return report
+    finally:
+        _profile_lock.release()
+
+
+def format_report(report: Dict, lines: int = 8) -> str:
+    """Short text summary of a profile"""
+    text = [f"🔬 Profiled {report['seconds']}s, {report['samples']} samples", "", "Busiest frames (share of thread samples):"]
+    text.extend(f"{share * 100:5.1f}%  {leaf}" for leaf, share in report["top_functions"][:lines])
+    if report["top_allocations"]:
+        text.extend(["", "Top allocation sites:"])
+        text.extend(
+            f"{allocation['bytes'] / 1024:8.1f} KiB  {os.path.basename(allocation['site'])}"
+            for allocation in report["top_allocations"][:lines]
+        )
+    return "\n".join(text)
+
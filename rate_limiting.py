@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Rate limiting for MiraiBot
+Token buckets and the outbound Telegram send scheduler that keeps the bot
+under Telegram's global and per-chat flood limits
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, Optional, Set, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Chat actions ("typing...") only count towards the global limit
+CHAT_ACTION_ENDPOINT = "sendChatAction"
+
+# Only requests that post into a chat count towards its per-chat limit (getChat, getFile, ... do not)
+CHAT_MESSAGE_PREFIXES = ("send", "edit", "copy", "forward")
+
+# A chat action is shown for ~5 seconds, so re-sending it sooner is redundant
+CHAT_ACTION_DURATION = 4.5
+
+
+class TokenBucket:
+    """Classic token bucket; reserve() hands out send slots in FIFO order"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        """Take a token if one is available right now"""
+        self._refill(now if now is not None else time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """Take a token, going into debt if needed; returns seconds to wait before using it"""
+        self._refill(now if now is not None else time.monotonic())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def time_until_available(self, now: Optional[float] = None) -> float:
+        """Seconds until a token could be taken"""
+        self._refill(now if now is not None else time.monotonic())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self, now: float) -> bool:
+        """True once the bucket has refilled completely"""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class TurnLimiter:
+    """
+    Limits how often AI turns are generated, per user and overall
+
+    check() never blocks: it either admits the turn or says how long to wait,
+    so callers can defer the turn on the event loop (and merge messages that
+    arrive meanwhile) instead of sleeping.
+    """
+
+    def __init__(self, user_rate: float, user_burst: float, global_rate: float, global_burst: float):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self._global = TokenBucket(global_rate, global_burst)
+        self._users: Dict[int, TokenBucket] = {}
+        self.stats = {"admitted": 0, "throttled_user": 0, "throttled_global": 0, "deferred": 0, "merged": 0}
+
+    def check(self, user_id: int) -> float:
+        """
+        Try to admit a turn
+
+        Args:
+            user_id: Telegram user ID
+
+        Returns:
+            0 if the turn was admitted, otherwise seconds to wait before retrying
+        """
+        now = time.monotonic()
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            if len(self._users) > 10000:
+                for idle_user in [u for u, b in self._users.items() if b.idle(now)]:
+                    del self._users[idle_user]
+                self._users[user_id] = bucket
+
+        user_wait = bucket.time_until_available(now)
+        global_wait = self._global.time_until_available(now)
+        if user_wait > 0 or global_wait > 0:
+            self.stats["throttled_user" if user_wait >= global_wait else "throttled_global"] += 1
+            return max(user_wait, global_wait)
+
+        bucket.try_acquire(now)
+        self._global.try_acquire(now)
+        self.stats["admitted"] += 1
+        return 0.0
+
+    def record_deferred(self):
+        """Count a turn the caller put off after check() refused it"""
+        self.stats["deferred"] += 1
+
+    def record_merged(self):
+        """Count a deferred turn folded into a newer one"""
+        self.stats["merged"] += 1
+
+    def would_admit(self, user_id: int) -> bool:
+        """Whether check() would admit a turn now (without using up a token)"""
+        now = time.monotonic()
+        bucket = self._users.get(user_id)
+        user_wait = bucket.time_until_available(now) if bucket is not None else 0.0
+        return user_wait <= 0 and self._global.time_until_available(now) <= 0
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, tracked_users=len(self._users))
+
+
+class OutboundRateLimiter(BaseRateLimiter[int]):
+    """
+    Schedules every outgoing Bot API request
+
+    A global bucket keeps the bot under ~30 requests/s, per-chat buckets under
+    1 message/s in private chats and 20/minute in groups. Redundant typing
+    actions are dropped and RetryAfter pauses all sending before retrying.
+    """
+
+    def __init__(
+        self,
+        overall_rate: float = 30.0,
+        private_chat_rate: float = 1.0,
+        group_chat_rate: float = 20 / 60,
+        max_retries: int = 3,
+    ):
+        self.overall_rate = overall_rate
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.max_retries = max_retries
+        self._global = TokenBucket(overall_rate, max(1.0, overall_rate))
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._actions_in_flight: Set[Tuple[Any, str]] = set()
+        # chat_id -> {action: time it was last sent}
+        self._last_action: Dict[Any, Dict[str, float]] = {}
+        self._paused_until = 0.0
+        self.queue_depth = 0
+        self.stats = {"sent": 0, "delayed": 0, "coalesced_actions": 0, "retry_after": 0}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+        self._last_action.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Group and channel ids are negative
+            is_group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            rate = self.group_chat_rate if is_group else self.private_chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, 1.0)
+            if len(self._chats) > 10000:
+                self._prune()
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        for chat_id in [c for c, bucket in self._chats.items() if bucket.idle(now)]:
+            del self._chats[chat_id]
+        for chat_id in [c for c, actions in self._last_action.items() if now - max(actions.values()) > CHAT_ACTION_DURATION]:
+            del self._last_action[chat_id]
+
+    def set_overall_rate(self, rate: float):
+        """Change the global send rate, e.g. when workers sharing the token come or go"""
+        self.overall_rate = rate
+        self._global.rate = rate
+        self._global.capacity = max(1.0, rate)
+        self._global.tokens = min(self._global.tokens, self._global.capacity)
+
+    def snapshot(self) -> dict:
+        """Counters for the metrics endpoint"""
+        return dict(self.stats, queue_depth=self.queue_depth, tracked_chats=len(self._chats))
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ):
+        chat_id = data.get("chat_id")
+        action_key = None
+        posts_to_chat = chat_id is not None and endpoint.startswith(CHAT_MESSAGE_PREFIXES)
+
+        if endpoint == CHAT_ACTION_ENDPOINT:
+            action_key = (chat_id, data.get("action"))
+            last_sent = self._last_action.get(chat_id, {}).get(action_key[1], 0)
+            if action_key in self._actions_in_flight or time.monotonic() - last_sent < CHAT_ACTION_DURATION:
+                self.stats["coalesced_actions"] += 1
+                return True
+            self._actions_in_flight.add(action_key)
+
+        try:
+            now = time.monotonic()
+            wait = max(self._global.reserve(now), self._paused_until - now)
+            if posts_to_chat and action_key is None:
+                wait = max(wait, self._chat_bucket(chat_id).reserve(now))
+            if wait > 0:
+                self.stats["delayed"] += 1
+                self.queue_depth += 1
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self.queue_depth -= 1
+
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await callback(*args, **kwargs)
+                    self.stats["sent"] += 1
+                    if action_key is not None:
+                        self._last_action.setdefault(chat_id, {})[action_key[1]] = time.monotonic()
+                    elif posts_to_chat:
+                        # A new message ends the chat action, so the next one must go out
+                        self._last_action.pop(chat_id, None)
+                    return result
+                except RetryAfter as e:
+                    self.stats["retry_after"] += 1
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                    # Telegram applies the flood wait to the whole bot, so pause everything
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    logger.warning(f"⏳ Flood limit hit on {endpoint}, pausing sends for {delay}s")
+                    self.queue_depth += 1
+                    try:
+                        await asyncio.sleep(delay)
+                    finally:
+                        self.queue_depth -= 1
+        finally:
+            if action_key is not None:
+                self._actions_in_flight.discard(action_key)
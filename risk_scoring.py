@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Incremental multi-turn risk scoring for MiraiBot
+detect_crisis() looks at one (combined) message at a time, so distress that
+builds up over several milder messages never trips it. Each user here has a
+single decaying score: every message adds the weights of the warning signs
+it contains, and the score halves every `half_life` seconds. Updating it
+costs the same whether a user has sent 5 messages or 5000.
+"""
+
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (name, pattern, weight); a category counts at most once per message.
+# Explicit crisis language is added by the bot with weight >= threshold.
+DEFAULT_SIGNALS = [
+    ("hopelessness", r"\b(hopeless|no hope|pointless|no point|nothing matters|can'?t go on|giv(e|ing) up|no future)\b", 0.35),
+    ("worthlessness", r"\b(worthless|useless|a burden|hate myself|nobody cares|no one cares|better without me|my fault)\b", 0.4),
+    ("farewell", r"\b(goodbye|say bye|last time|give away my|wrote a note|final message|won'?t be around)\b", 0.5),
+    ("means", r"\b(pills|overdose|rope|bridge|jump off|razor|blade)\b", 0.5),
+    ("isolation", r"\b(alone|lonely|isolated|nobody|no one)\b", 0.15),
+    ("exhaustion", r"\b(so tired|exhausted|can'?t sleep|can'?t take (it|this)|too much)\b", 0.15),
+]
+
+
+class RiskScorer:
+    """
+    Per-user decaying risk score with threshold crossing detection
+
+    Args:
+        signals: (name, regex, weight) warning signs
+        threshold: Score at which the crisis path is taken
+        half_life: Seconds for a score to decay to half
+        rearm_ratio: After triggering, the score must decay below
+            threshold * rearm_ratio before it can trigger again
+        max_users: Users tracked (least recently active are forgotten first)
+    """
+
+    def __init__(
+        self,
+        signals: Optional[List[Tuple[str, str, float]]] = None,
+        threshold: float = 1.0,
+        half_life: float = 6 * 3600.0,
+        rearm_ratio: float = 0.5,
+        max_users: int = 10000,
+    ):
+        self.signals = [
+            (name, re.compile(pattern, re.IGNORECASE), weight)
+            for name, pattern, weight in (DEFAULT_SIGNALS if signals is None else signals)
+        ]
+        self.threshold = threshold
+        self.rearm_level = threshold * rearm_ratio
+        self._decay_rate = math.log(2) / half_life
+        self.max_users = max_users
+        # user_id -> [score, time of last update, triggered]
+        self._state: "OrderedDict[int, list]" = OrderedDict()
+        self.stats = {"updates": 0, "signals": 0, "triggered": 0, "evicted_users": 0}
+
+    def weigh(self, message: str) -> float:
+        """Total weight of the warning signs in one message"""
+        total = 0.0
+        for _, pattern, weight in self.signals:
+            if pattern.search(message):
+                total += weight
+        return total
+
+    def _decayed(self, state: list, now: float) -> float:
+        return state[0] * math.exp(-self._decay_rate * max(0.0, now - state[1]))
+
+    def update(self, user_id: int, message: str, now: Optional[float] = None) -> bool:
+        """
+        Add one message to a user's score
+
+        Args:
+            user_id: Telegram user ID
+            message: The user's (combined) message
+            now: Timestamp (default: time.time())
+
+        Returns:
+            True if this message took the score over the threshold
+        """
+        now = time.time() if now is None else now
+        self.stats["updates"] += 1
+        weight = self.weigh(message)
+        state = self._state.get(user_id)
+        if state is None:
+            if not weight:
+                return False
+            state = self._state[user_id] = [0.0, now, False]
+            while len(self._state) > self.max_users:
+                self._state.popitem(last=False)
+                self.stats["evicted_users"] += 1
+        else:
+            self._state.move_to_end(user_id)
+
+        decayed = self._decayed(state, now)
+        if state[2] and decayed < self.rearm_level:
+            state[2] = False
+        score = decayed + weight
+        state[0], state[1] = score, now
+        if weight:
+            self.stats["signals"] += 1
+        if score >= self.threshold and not state[2]:
+            state[2] = True
+            self.stats["triggered"] += 1
+            return True
+        return False
+
+    def score(self, user_id: int, now: Optional[float] = None) -> float:
+        """Current (decayed) score of a user"""
+        state = self._state.get(user_id)
+        if state is None:
+            return 0.0
+        return self._decayed(state, time.time() if now is None else now)
+
+    def export_user(self, user_id: int) -> Optional[list]:
+        """Remove and return a user's state (for moving them to another worker)"""
+        return self._state.pop(user_id, None)
+
+    def import_user(self, user_id: int, state: list):
+        self._state[user_id] = list(state)
+
+    def snapshot(self) -> Dict[str, object]:
+        now = time.time()
+        elevated = sum(1 for state in self._state.values() if self._decayed(state, now) >= self.rearm_level)
+        return dict(self.stats, users=len(self._state), elevated_users=elevated, threshold=self.threshold)
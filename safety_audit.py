@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Bulk safety audit for MiraiBot
+Re-runs detect_emergency, detect_crisis and is_mental_health_related over
+logged conversations and reports every row whose verdict would change with
+the current patterns (and topic model, if one is configured).
+
+Inputs are streamed, so memory stays bounded regardless of size:
+    - CSV exported from the Google Sheet ("User Question", "Bot Answer", ...)
+    - JSONL with question/answer (or text) fields
+    - A conversation log directory (see conversation_log.py)
+
+Only served turns are logged, so a row's recorded verdict is "served"
+unless the row has a "verdict" column or a --baseline snapshot is given.
+
+Usage:
+    python safety_audit.py conversations.csv --report changes.jsonl
+    python safety_audit.py conversation_logs/ --snapshot verdicts.jsonl
+    python safety_audit.py conversation_logs/ --baseline verdicts.jsonl --report changes.jsonl
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VERDICTS = ("emergency", "crisis", "off_topic", "served")
+
+QUESTION_FIELDS = ("question", "User Question", "text", "message")
+USERNAME_FIELDS = ("username", "Username")
+
+# Image turns are described, not typed; the text detectors never saw them
+IMAGE_PREFIX = "[Image"
+
+# Loaded once per worker process
+_bot = None
+
+_MISSING = object()
+
+
+def _first(row: dict, fields) -> Optional[str]:
+    for field in fields:
+        if row.get(field) is not None:
+            return row[field]
+    return None
+
+
+def iter_rows(path: str) -> Iterator[dict]:
+    """Stream {"username", "question", "verdict"} dicts from any supported input"""
+    if os.path.isdir(path):
+        from conversation_log import iter_records
+        yield from (_normalize(row) for row in iter_records(path))
+        return
+
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f) if path.endswith(".csv") else (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield _normalize(row)
+
+
+def _normalize(row: dict) -> dict:
+    return {
+        "username": _first(row, USERNAME_FIELDS),
+        "question": _first(row, QUESTION_FIELDS) or "",
+        "verdict": row.get("verdict"),
+    }
+
+
+def iter_baseline(path: str) -> Iterator[str]:
+    """Verdicts from a previous --snapshot, in row order"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)["verdict"]
+
+
+def with_old_verdicts(rows: Iterator[dict], baseline_path: Optional[str], counts: Counter) -> Iterator[dict]:
+    """
+    Set each row's "old" verdict: from the baseline snapshot if given, else the recorded one
+
+    Rows past the end of a shorter baseline fall back to their recorded verdict
+    and are counted as "baseline_missing"; baseline lines past the last row are
+    counted as "baseline_extra".
+    """
+    if not baseline_path:
+        for row in rows:
+            row["old"] = row["verdict"] or "served"
+            yield row
+        return
+    for row, old in itertools.zip_longest(rows, iter_baseline(baseline_path), fillvalue=_MISSING):
+        if row is _MISSING:
+            counts["baseline_extra"] += 1
+            continue
+        if old is _MISSING:
+            counts["baseline_missing"] += 1
+            old = row["verdict"] or "served"
+        row["old"] = old
+        yield row
+
+
+def _init_worker():
+    global _bot
+    # Workers only classify; they must not open their own conversation log
+    os.environ["CONVERSATION_LOG_DIR"] = ""
+    logging.getLogger().setLevel(logging.WARNING)
+    import telegram_bot
+    _bot = telegram_bot
+
+
+def classify(message: str) -> str:
+    """Verdict in the same order handle_message() applies the checks"""
+    if not _bot.is_mental_health_related(message):
+        return "off_topic"
+    if _bot.detect_emergency(message):
+        return "emergency"
+    if _bot.detect_crisis(message):
+        return "crisis"
+    return "served"
+
+
+def classify_chunk(questions: List[str]) -> List[Optional[str]]:
+    """Worker task: verdicts for one chunk (None for image turns)"""
+    return [None if question.startswith(IMAGE_PREFIX) else classify(question) for question in questions]
+
+
+def chunked(iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_audit(
+    path: str,
+    report_path: Optional[str] = None,
+    snapshot_path: Optional[str] = None,
+    baseline_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 2000,
+) -> dict:
+    """
+    Classify every row and write changed verdicts to the report
+
+    Args:
+        path: Input file or conversation log directory
+        report_path: JSONL file for rows whose verdict changed
+        snapshot_path: JSONL file for every row's new verdict (a future baseline)
+        baseline_path: Snapshot to compare against instead of the recorded verdicts
+        workers: Worker processes (default: CPU count)
+        chunk_size: Rows per task
+
+    Returns:
+        Summary with row counts, verdict transitions and rows/second
+    """
+    workers = workers or os.cpu_count() or 1
+    counts = Counter()
+    rows = with_old_verdicts(iter_rows(path), baseline_path, counts)
+    report = open(report_path, "w", encoding="utf-8") if report_path else None
+    snapshot = open(snapshot_path, "w", encoding="utf-8") if snapshot_path else None
+
+    transitions = Counter()
+    started = time.perf_counter()
+    row_number = 0
+
+    def finish(chunk: List[dict], verdicts: List[Optional[str]]):
+        nonlocal row_number
+        for row, verdict in zip(chunk, verdicts):
+            if verdict is None:
+                counts["skipped_images"] += 1
+            else:
+                old = row["old"]
+                counts["rows"] += 1
+                counts[verdict] += 1
+                if verdict != old:
+                    counts["changed"] += 1
+                    transitions[f"{old} -> {verdict}"] += 1
+                    if report:
+                        report.write(json.dumps({
+                            "row": row_number,
+                            "username": row["username"],
+                            "question": row["question"][:500],
+                            "old": old,
+                            "new": verdict,
+                        }, ensure_ascii=False) + "\n")
+            if snapshot:
+                snapshot.write(json.dumps({"row": row_number, "verdict": verdict}) + "\n")
+            row_number += 1
+
+    # At most `window` chunks are held at once; results are written in input
+    # order so snapshots line up row by row with the input
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        in_flight: Dict = {}
+        done_chunks: Dict[int, Tuple[list, list]] = {}
+        next_to_write = 0
+
+        def collect(return_when):
+            nonlocal next_to_write
+            finished, _ = wait(in_flight, return_when=return_when)
+            for future in finished:
+                done_index, done_chunk = in_flight.pop(future)
+                done_chunks[done_index] = (done_chunk, future.result())
+            while next_to_write in done_chunks:
+                finish(*done_chunks.pop(next_to_write))
+                next_to_write += 1
+
+        for index, chunk in enumerate(chunked(rows, chunk_size)):
+            in_flight[pool.submit(classify_chunk, [row["question"] for row in chunk])] = (index, chunk)
+            while len(in_flight) + len(done_chunks) >= window:
+                collect(FIRST_COMPLETED)
+        while in_flight:
+            collect(ALL_COMPLETED)
+
+    for handle in (report, snapshot):
+        if handle:
+            handle.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": counts["rows"],
+        "changed": counts["changed"],
+        "skipped_images": counts["skipped_images"],
+        "verdicts": {verdict: counts[verdict] for verdict in VERDICTS},
+        "transitions": dict(transitions.most_common()),
+        # Rows without a baseline verdict / baseline verdicts without a row
+        "baseline_mismatch": {"missing": counts["baseline_missing"], "extra": counts["baseline_extra"]} if baseline_path else None,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(counts["rows"] / elapsed) if elapsed > 0 else 0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Re-run MiraiBot safety checks over logged conversations")
+    parser.add_argument("input", help="CSV, JSONL or conversation log directory")
+    parser.add_argument("--report", help="Write rows whose verdict changed (JSONL)")
+    parser.add_argument("--snapshot", help="Write every row's verdict (JSONL), usable as --baseline later")
+    parser.add_argument("--baseline", help="Compare against a previous snapshot")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Rows per task")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    summary = run_audit(args.input, args.report, args.snapshot, args.baseline, args.workers, args.chunk_size)
+    logger.info(f"🔍 Audited {summary['rows']:,} rows in {summary['seconds']}s ({summary['rows_per_second']:,} rows/s)")
+    logger.info(f"   Verdicts would change for {summary['changed']:,} rows")
+    mismatch = summary["baseline_mismatch"]
+    if mismatch and (mismatch["missing"] or mismatch["extra"]):
+        logger.warning(
+            f"⚠️ Baseline does not line up with the input: {mismatch['missing']:,} rows past its end "
+            f"(compared with their recorded verdict), {mismatch['extra']:,} baseline lines left over"
+        )
+    for transition, count in summary["transitions"].items():
+        logger.info(f"   {transition}: {count:,}")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Per-user semantic memory for MiraiBot
+Every finished exchange (user message + reply) is embedded locally on CPU
+and added to a small NumPy index per user, so prompts can include the
+earlier turns most relevant to the new message instead of only the last
+few.
+"""
+
+import logging
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Too common to say anything about what a message is about
+STOPWORDS = frozenset(
+    "i me my im i'm you your it its it's the a an and or but so to of in on at for with is am are was were be been "
+    "do does did have has had this that just what how when why can can't don't not no yes ok okay really very".split()
+)
+
+
+# Words that flip a message's meaning; kept when embedding for the response cache
+NEGATIONS = frozenset("not no can't don't cannot never".split())
+
+# Common endings folded away so "feeling"/"feel" or "nights"/"night" share features
+SUFFIXES = (("ing", 5), ("ed", 4), ("ly", 4), ("es", 4), ("s", 3))
+
+
+def light_stem(token: str) -> str:
+    """Strip one common English ending from a token (crude, but stable)"""
+    for suffix, min_length in SUFFIXES:
+        if len(token) > min_length and token.endswith(suffix) and not token.endswith("ss"):
+            return token[:-len(suffix)]
+    return token
+
+
+class HashedEmbedder:
+    """
+    Signed feature hashing of word unigrams and bigrams into a dense vector
+
+    No model download and ~10 µs per message; similar messages share words,
+    which is what matters for recalling earlier turns of one conversation.
+
+    Args:
+        dim: Vector size (power of two)
+        stopwords: Words left out of the features
+        stem: Fold common word endings (see light_stem) before hashing
+    """
+
+    def __init__(self, dim: int = 256, stopwords: frozenset = STOPWORDS, stem: bool = False):
+        self.dim = dim
+        self.stopwords = stopwords
+        self.stem = stem
+        self._mask = dim - 1
+
+    def embed(self, text: str):
+        # Imported on first use so creating the memory does not load NumPy at startup
+        import numpy as np
+
+        from text_features import tokenize
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = [token for token in tokenize(text) if token not in self.stopwords]
+        if self.stem:
+            tokens = [light_stem(token) for token in tokens]
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h & self._mask] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class UserIndex:
+    """Embeddings and texts of one user's past exchanges, oldest first"""
+
+    def __init__(self, dim: int, max_exchanges: int):
+        import numpy as np
+
+        self.max_exchanges = max_exchanges
+        self.vectors = np.zeros((min(8, max_exchanges), dim), dtype=np.float16)
+        self.exchanges: List[Tuple[str, str]] = []
+
+    def add(self, vector, exchange: Tuple[str, str]):
+        import numpy as np
+
+        count = len(self.exchanges)
+        if count == self.max_exchanges:
+            # Forget the oldest exchange
+            self.vectors[:-1] = self.vectors[1:]
+            self.exchanges.pop(0)
+            count -= 1
+        elif count == len(self.vectors):
+            grown = np.zeros((min(2 * count, self.max_exchanges), self.vectors.shape[1]), dtype=np.float16)
+            grown[:count] = self.vectors
+            self.vectors = grown
+        self.vectors[count] = vector
+        self.exchanges.append(exchange)
+
+    def search(self, query, k: int, exclude_last: int, min_similarity: float) -> List[int]:
+        """Positions of the k most similar exchanges, skipping the newest `exclude_last`"""
+        import numpy as np
+
+        searchable = len(self.exchanges) - exclude_last
+        if searchable <= 0 or k <= 0:
+            return []
+        scores = self.vectors[:searchable].astype(np.float32) @ query
+        if searchable > k:
+            candidates = np.argpartition(-scores, k)[:k]
+        else:
+            candidates = np.arange(searchable)
+        return sorted(int(i) for i in candidates if scores[i] >= min_similarity)
+
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + sum(len(u) + len(a) for u, a in self.exchanges)
+
+
+class SemanticMemory:
+    """
+    user_id -> index of past exchanges, bounded per user and in total
+
+    Args:
+        max_exchanges: Exchanges kept per user (oldest are forgotten)
+        max_users: Users kept; the least recently active index is dropped first
+        dim: Embedding size (power of two)
+        min_similarity: Cosine similarity below which a turn is not recalled
+    """
+
+    def __init__(self, max_exchanges: int = 100, max_users: int = 2000, dim: int = 256, min_similarity: float = 0.15):
+        self.max_exchanges = max_exchanges
+        self.max_users = max_users
+        self.min_similarity = min_similarity
+        self.embedder = HashedEmbedder(dim)
+        self._users: "OrderedDict[int, UserIndex]" = OrderedDict()
+        self.stats = {"added": 0, "searches": 0, "recalled": 0, "evicted_users": 0}
+
+    def add(self, user_id: int, user_text: str, assistant_text: str):
+        """Index one finished exchange"""
+        index = self._users.get(user_id)
+        if index is None:
+            index = self._users[user_id] = UserIndex(self.embedder.dim, self.max_exchanges)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.stats["evicted_users"] += 1
+        else:
+            self._users.move_to_end(user_id)
+        index.add(self.embedder.embed(f"{user_text} {assistant_text}"), (user_text, assistant_text))
+        self.stats["added"] += 1
+
+    def recall(self, user_id: int, query: str, k: int = 3, exclude_last: int = 0) -> List[Dict[str, str]]:
+        """
+        Earlier exchanges relevant to a new message, as chat messages
+
+        Args:
+            user_id: Telegram user ID
+            query: The new user message
+            k: Most exchanges to return
+            exclude_last: Newest exchanges to skip (they are sent as recent turns anyway)
+
+        Returns:
+            user/assistant messages in chronological order
+        """
+        index = self._users.get(user_id)
+        if index is None:
+            return []
+        self.stats["searches"] += 1
+        positions = index.search(self.embedder.embed(query), k, exclude_last, self.min_similarity)
+        self.stats["recalled"] += len(positions)
+        messages = []
+        for position in positions:
+            user_text, assistant_text = index.exchanges[position]
+            messages.append({"role": "user", "content": user_text})
+            messages.append({"role": "assistant", "content": assistant_text})
+        return messages
+
+    def export_user(self, user_id: int) -> List[Tuple[str, str]]:
+        """Remove and return a user's exchanges (for moving them to another worker)"""
+        index = self._users.pop(user_id, None)
+        return list(index.exchanges) if index else []
+
+    def import_user(self, user_id: int, exchanges: List[Tuple[str, str]]):
+        for user_text, assistant_text in exchanges:
+            self.add(user_id, user_text, assistant_text)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, users=len(self._users), resident_bytes=sum(index.nbytes() for index in self._users.values()))
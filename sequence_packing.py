@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Sequence packing and length-bucketed batching for MiraiBot's emotion fine-tune
+The training prompts are short (a tweet or a sentence plus a reply), so with
+packing=False and max_seq_length=2048 most of every batch is padding. This
+module packs several tokenized prompts into each row with first-fit-decreasing
+bin packing and keeps them apart during attention:
+
+- position_ids restart at 0 for every packed prompt and the whole batch is
+  flattened into one row with no attention_mask; transformers only finds
+  the prompt boundaries from position_ids in that shape (a 2D padding mask
+  or a batch of several rows would let packed prompts attend to each
+  other), or
+- a block-diagonal causal 4D mask, for eager/SDPA attention
+- the first label of every prompt is masked, so no prompt is trained to
+  predict the start of the next one
+
+Rows of similar length are batched together, and the collator keeps padding
+statistics (padding ratio, real tokens per batch).
+
+Usage with the notebook's trainer:
+    packed = pack_dataset(tokenized_train, max_seq_length=2048)
+    # use_cache must be off (gradient checkpointing does that) for eager/SDPA to split the prompts
+    collator = PackedCollator(tokenizer.pad_token_id, return_tensors="pt")
+    trainer = SFTTrainer(..., train_dataset=packed, data_collator=collator,
+                         dataset_kwargs={"skip_prepare_dataset": True})
+    ...
+    print(collator.stats.as_dict())
+
+Compare padding on a dataset_builder.py build:
+    python sequence_packing.py --cache-dir data_cache --tokenizer unsloth/Meta-Llama-3.1-8B-Instruct
+"""
+
+import argparse
+import logging
+import random
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+IGNORE_INDEX = -100  # Label ignored by the cross-entropy loss
+
+
+def first_fit_decreasing(lengths: Sequence[int], capacity: int) -> List[List[int]]:
+    """
+    Pack items into as few bins as first-fit-decreasing finds
+
+    Items are placed longest first, each into the first bin with room left.
+    A max-tree over the bins' free space finds that bin in O(log n), so
+    packing a whole dataset takes seconds.
+
+    Args:
+        lengths: Item sizes (longer items count as `capacity`)
+        capacity: Bin size
+
+    Returns:
+        Item indices per bin, bins in the order they were opened
+    """
+    order = sorted(range(len(lengths)), key=lambda i: (-min(lengths[i], capacity), i))
+    size = 1
+    while size < max(1, len(lengths)):
+        size *= 2
+    free = [capacity] * (2 * size)  # free[1] is the root; bins are the leaves free[size:]
+    bins: List[List[int]] = []
+
+    for index in order:
+        length = min(lengths[index], capacity)
+        node = 1
+        while node < size:  # Leftmost leaf with enough room
+            node = 2 * node if free[2 * node] >= length else 2 * node + 1
+        slot = node - size
+        if slot == len(bins):
+            bins.append([])
+        bins[slot].append(index)
+        free[node] -= length
+        node //= 2
+        while node:
+            free[node] = max(free[2 * node], free[2 * node + 1])
+            node //= 2
+    return bins
+
+
+def bucketed_batches(
+    lengths: Sequence[int],
+    batch_size: int,
+    shuffle: bool = True,
+    seed: int = 42,
+    bucket_batches: int = 50,
+) -> List[List[int]]:
+    """
+    Batches of indices whose lengths are close, so little padding is needed
+
+    Indices are shuffled, cut into buckets of `bucket_batches` batches,
+    sorted by length inside each bucket and batched; the batch order is
+    shuffled again. Training order stays random while each batch pads to a
+    similar length.
+
+    Args:
+        lengths: Length of each row
+        batch_size: Rows per batch
+        shuffle: Randomize (off: batches in length order)
+        seed: Shuffle seed
+        bucket_batches: Batches per sorting bucket
+
+    Returns:
+        Index lists, one per batch (the last one may be smaller)
+    """
+    rng = random.Random(seed)
+    indices = list(range(len(lengths)))
+    if shuffle:
+        rng.shuffle(indices)
+        bucket = batch_size * bucket_batches
+    else:
+        bucket = len(indices) or 1
+    batches = []
+    for start in range(0, len(indices), bucket):
+        chunk = sorted(indices[start:start + bucket], key=lambda i: lengths[i], reverse=True)
+        batches.extend(chunk[i:i + batch_size] for i in range(0, len(chunk), batch_size))
+    if shuffle:
+        rng.shuffle(batches)
+    return batches
+
+
+class BucketBatchSampler:
+    """
+    Batch sampler for a torch DataLoader built on bucketed_batches
+
+    Each epoch reshuffles with a new seed.
+
+    Args:
+        lengths: Length of each dataset row
+        batch_size: Rows per batch
+        seed: Base shuffle seed
+    """
+
+    def __init__(self, lengths: Sequence[int], batch_size: int, seed: int = 42):
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self) -> Iterator[List[int]]:
+        return iter(bucketed_batches(self.lengths, self.batch_size, seed=self.seed + self.epoch))
+
+    def __len__(self) -> int:
+        return -(-len(self.lengths) // self.batch_size)
+
+
+def pack_sequences(
+    sequences: Sequence[Sequence[int]],
+    max_seq_length: int,
+    labels: Optional[Sequence[Sequence[int]]] = None,
+) -> List[Dict[str, list]]:
+    """
+    Pack tokenized prompts into rows of at most max_seq_length tokens
+
+    Prompts longer than max_seq_length are truncated, as the trainer would.
+
+    Args:
+        sequences: Token ids per prompt
+        max_seq_length: Row length
+        labels: Labels per prompt (default: the token ids)
+
+    Returns:
+        Rows with the concatenated "input_ids" and "labels" and the packed
+        prompts' lengths in "seq_lens"
+    """
+    rows = []
+    for packed in first_fit_decreasing([len(sequence) for sequence in sequences], max_seq_length):
+        input_ids, row_labels, seq_lens = [], [], []
+        for index in packed:
+            ids = list(sequences[index][:max_seq_length])
+            input_ids.extend(ids)
+            row_labels.extend(labels[index][:max_seq_length] if labels is not None else ids)
+            seq_lens.append(len(ids))
+        rows.append({"input_ids": input_ids, "labels": row_labels, "seq_lens": seq_lens})
+    return rows
+
+
+def pack_dataset(dataset, max_seq_length: int = 2048, column: str = "input_ids"):
+    """
+    Packed copy of a tokenized `datasets.Dataset`
+
+    Packing needs every length up front (a bin can take a prompt from
+    anywhere in the dataset), so the token ids are read once and written
+    back as packed rows.
+
+    Args:
+        dataset: Dataset with a token id column (and optionally "labels")
+        max_seq_length: Row length
+        column: Token id column
+
+    Returns:
+        Dataset with the columns input_ids, labels and seq_lens
+    """
+    from datasets import Dataset
+
+    labels = dataset["labels"] if "labels" in dataset.column_names else None
+    rows = pack_sequences(dataset[column], max_seq_length, labels)
+    packed = Dataset.from_list(rows)
+    logger.info(f"✅ Packed {len(dataset):,} sequences into {len(packed):,} rows of up to {max_seq_length} tokens")
+    return packed
+
+
+class PaddingStats:
+    """Real and padded token counts over the batches a collator produced"""
+
+    def __init__(self):
+        self.batches = 0
+        self.sequences = 0
+        self.tokens = 0
+        self.slots = 0  # Batch rows x padded length
+
+    def add(self, tokens: int, slots: int, sequences: int):
+        self.batches += 1
+        self.sequences += sequences
+        self.tokens += tokens
+        self.slots += slots
+
+    @property
+    def padding_ratio(self) -> float:
+        return 1 - self.tokens / self.slots if self.slots else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "sequences": self.sequences,
+            "tokens": self.tokens,
+            "padding_ratio": round(self.padding_ratio, 4),
+            "tokens_per_batch": round(self.tokens / self.batches, 1) if self.batches else 0.0,
+            "sequences_per_batch": round(self.sequences / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class PackedCollator:
+    """
+    Pads packed rows into a batch and keeps the packed prompts apart
+
+    Rows without "seq_lens" are treated as a single prompt, so the same
+    collator works for plain (bucketed) batches.
+
+    Args:
+        pad_token_id: Token used for padding
+        attention: "position_ids" (all rows flattened into one (1, tokens)
+            row without attention_mask, positions restarting per prompt, as
+            transformers' DataCollatorWithFlattening does) or "4d" (rows
+            padded to a batch with an additive block-diagonal causal mask,
+            0 = attend, most negative float = masked)
+        pad_to_multiple_of: Round the padded length up (8 suits tensor cores)
+        return_tensors: "np" or "pt"
+    """
+
+    def __init__(
+        self,
+        pad_token_id: int,
+        attention: str = "position_ids",
+        pad_to_multiple_of: Optional[int] = 8,
+        return_tensors: str = "np",
+    ):
+        if attention not in ("position_ids", "4d"):
+            raise ValueError(f"Unknown attention mode: {attention}")
+        self.pad_token_id = pad_token_id
+        self.attention = attention
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.return_tensors = return_tensors
+        self.stats = PaddingStats()
+
+    def __call__(self, rows: List[dict]) -> dict:
+        import numpy as np
+
+        if self.attention == "position_ids":
+            return self._flatten(rows)
+        width = max(len(row["input_ids"]) for row in rows)
+        if self.pad_to_multiple_of:
+            width = -(-width // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        input_ids = np.full((len(rows), width), self.pad_token_id, dtype=np.int64)
+        labels = np.full((len(rows), width), IGNORE_INDEX, dtype=np.int64)
+        position_ids = np.zeros((len(rows), width), dtype=np.int64)
+        allowed = np.zeros((len(rows), 1, width, width), dtype=bool)
+
+        tokens = sequences = 0
+        for r, row in enumerate(rows):
+            seq_lens = row.get("seq_lens") or [len(row["input_ids"])]
+            length = sum(seq_lens)
+            input_ids[r, :length] = row["input_ids"]
+            labels[r, :length] = row.get("labels", row["input_ids"])
+            start = 0
+            for seq_len in seq_lens:
+                end = start + seq_len
+                position_ids[r, start:end] = np.arange(seq_len)
+                labels[r, start] = IGNORE_INDEX  # Nothing before a prompt's first token belongs to it
+                allowed[r, 0, start:end, start:end] = np.tri(seq_len, dtype=bool)
+                start = end
+            tokens += length
+            sequences += len(seq_lens)
+        self.stats.add(tokens, input_ids.size, sequences)
+
+        return self._to_tensors({
+            "input_ids": input_ids,
+            "labels": labels,
+            "position_ids": position_ids,
+            "attention_mask": np.where(allowed, 0.0, np.finfo(np.float32).min).astype(np.float32),
+        })
+
+    def _flatten(self, rows: List[dict]) -> dict:
+        """All prompts of the batch in one row; padding, if any, is one more prompt of pad tokens"""
+        import numpy as np
+
+        input_ids, labels, position_ids, sequences = [], [], [], 0
+        for row in rows:
+            start = 0
+            row_labels = row.get("labels", row["input_ids"])
+            for seq_len in row.get("seq_lens") or [len(row["input_ids"])]:
+                end = start + seq_len
+                input_ids.extend(row["input_ids"][start:end])
+                labels.append(IGNORE_INDEX)  # Nothing before a prompt's first token belongs to it
+                labels.extend(row_labels[start + 1:end])
+                position_ids.extend(range(seq_len))
+                start = end
+                sequences += 1
+        tokens = len(input_ids)
+        width = tokens
+        if self.pad_to_multiple_of:
+            width = -(-width // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        input_ids.extend([self.pad_token_id] * (width - tokens))
+        labels.extend([IGNORE_INDEX] * (width - tokens))
+        position_ids.extend(range(width - tokens))
+        self.stats.add(tokens, width, sequences)
+
+        return self._to_tensors({
+            "input_ids": np.array([input_ids], dtype=np.int64),
+            "labels": np.array([labels], dtype=np.int64),
+            "position_ids": np.array([position_ids], dtype=np.int64),
+        })
+
+    def _to_tensors(self, batch: dict) -> dict:
+        if self.return_tensors == "pt":
+            import torch
+
+            batch = {name: torch.from_numpy(array) for name, array in batch.items()}
+        return batch
+
+
+def padding_report(lengths: Sequence[int], batch_size: int, max_seq_length: int, seed: int = 42) -> Dict[str, dict]:
+    """
+    Padding and real tokens per training step with and without packing
+
+    Args:
+        lengths: Token count of each prompt
+        batch_size: Rows per device batch
+        max_seq_length: Packed row length
+        seed: Shuffle seed
+
+    Returns:
+        Stats per strategy: "random" (unpacked, padded to the longest in
+        each batch, as with packing=False), "bucketed" and "packed"
+    """
+    lengths = [min(length, max_seq_length) for length in lengths]
+    rng = random.Random(seed)
+    shuffled = list(range(len(lengths)))
+    rng.shuffle(shuffled)
+    plans = {
+        "random": ([[length] for length in lengths], [shuffled[i:i + batch_size] for i in range(0, len(shuffled), batch_size)]),
+        "bucketed": ([[length] for length in lengths], bucketed_batches(lengths, batch_size, seed=seed)),
+    }
+    packs = [[lengths[i] for i in packed] for packed in first_fit_decreasing(lengths, max_seq_length)]
+    plans["packed"] = (packs, bucketed_batches([sum(pack) for pack in packs], batch_size, seed=seed))
+
+    report = {}
+    for name, (rows, batches) in plans.items():
+        stats = PaddingStats()
+        for batch in batches:
+            widths = [sum(rows[i]) for i in batch]
+            stats.add(sum(widths), max(widths) * len(batch), sum(len(rows[i]) for i in batch))
+        report[name] = stats.as_dict()
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare padding with and without sequence packing")
+    parser.add_argument("--cache-dir", default="data_cache", help="dataset_builder.py cache directory")
+    parser.add_argument("--tokenizer", help="Tokenizer to count tokens with (default: about 4 bytes per token)")
+    parser.add_argument("--max-seq-length", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--source", action="append", default=[], metavar="NAME=FILE", help="As in dataset_builder.py")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    from dataset_builder import DatasetSource, build_datasets
+
+    sources = [DatasetSource.local(*spec.split("=", 1)) for spec in args.source] or None
+    texts = build_datasets(sources, cache_dir=args.cache_dir)["train"]["formatted_text"]
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+        lengths = [len(ids) for ids in tokenizer(texts)["input_ids"]]
+    else:
+        lengths = [max(1, len(text.encode("utf-8")) // 4) for text in texts]
+
+    report = padding_report(lengths, args.batch_size, args.max_seq_length)
+    print(f"{len(lengths):,} prompts, batch size {args.batch_size}, max_seq_length {args.max_seq_length}")
+    print(f"{'strategy':<10} {'steps':>8} {'padding':>8} {'tokens/step':>12} {'prompts/step':>13}")
+    for name, stats in report.items():
+        print(
+            f"{name:<10} {stats['batches']:>8,} {stats['padding_ratio'] * 100:>7.1f}% "
+            f"{stats['tokens_per_batch']:>12,.0f} {stats['sequences_per_batch']:>13.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
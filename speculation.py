@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Speculative generation for MiraiBot
+While a user's messages are still being buffered, the reply to the text
+buffered so far can be generated in the background once they pause briefly.
+A new message cancels the speculative request (the next pause starts a new
+one); when the buffering window closes, a speculation made for exactly the
+final text is used instead of starting the request only then.
+
+Counters compare the latency saved by used speculations with the tokens
+spent on discarded ones. Requests cancelled while in flight report no usage,
+so their cost is counted separately and not in wasted tokens.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Speculation:
+    """One background request for a given text"""
+
+    __slots__ = ("text", "task", "started_at", "finished_at")
+
+    def __init__(self, text: str, task: asyncio.Task, started_at: float):
+        self.text = text
+        self.task = task
+        self.started_at = started_at
+        self.finished_at: Optional[float] = None
+
+    def _done(self, task: asyncio.Task):
+        self.finished_at = time.monotonic()
+
+
+class SpeculativeGenerator:
+    """
+    At most one speculative request per key (e.g. per user)
+
+    Requests are coroutines returning a Groq response (a dict with an
+    optional "usage" block).
+    """
+
+    def __init__(self):
+        self.pending: Dict[Hashable, Speculation] = {}
+        self.stats = {
+            "started": 0,
+            "used": 0,
+            "cancelled_in_flight": 0,
+            "discarded": 0,  # Completed but the text changed or the turn went elsewhere
+            "failed": 0,
+            "wasted_prompt_tokens": 0,
+            "wasted_completion_tokens": 0,
+            "latency_saved": 0.0,
+        }
+
+    def start(self, key: Hashable, text: str, request: Awaitable[dict]):
+        """
+        Start a speculative request, replacing any earlier one for the key
+
+        Args:
+            key: Whose request this is
+            text: Text the request answers
+            request: Coroutine making the request
+        """
+        self.cancel(key)
+        speculation = Speculation(text, asyncio.ensure_future(request), time.monotonic())
+        speculation.task.add_done_callback(speculation._done)
+        self.pending[key] = speculation
+        self.stats["started"] += 1
+
+    def cancel(self, key: Hashable, text: Optional[str] = None):
+        """Drop the key's speculative request (only if made for `text`, when given)"""
+        speculation = self.pending.get(key)
+        if speculation is not None and (text is None or speculation.text == text):
+            del self.pending[key]
+            self._discard(speculation)
+
+    def _discard(self, speculation: Speculation):
+        task = speculation.task
+        if not task.done():
+            task.cancel()
+            self.stats["cancelled_in_flight"] += 1
+        elif task.cancelled() or task.exception() is not None:
+            self.stats["failed"] += 1
+        else:
+            usage = task.result().get("usage") or {}
+            self.stats["discarded"] += 1
+            self.stats["wasted_prompt_tokens"] += usage.get("prompt_tokens") or 0
+            self.stats["wasted_completion_tokens"] += usage.get("completion_tokens") or 0
+
+    async def take(self, key: Hashable, text: str) -> Optional[dict]:
+        """
+        Result of the key's speculation, if it was made for this text
+
+        Waits for the request if it is still running. Call when the
+        buffering window has closed.
+
+        Args:
+            key: Whose request this is
+            text: Final text of the turn
+
+        Returns:
+            The response, or None (no matching speculation, or it failed)
+        """
+        speculation = self.pending.pop(key, None)
+        if speculation is None:
+            return None
+        if speculation.text != text:
+            self._discard(speculation)
+            return None
+
+        window_closed_at = time.monotonic()
+        try:
+            result = await speculation.task
+        except asyncio.CancelledError:
+            if not speculation.task.cancelled():
+                raise  # The caller itself is being cancelled
+            self.stats["failed"] += 1
+            return None
+        except Exception as e:
+            logger.info(f"Speculative request failed, answering normally: {e}")
+            self.stats["failed"] += 1
+            return None
+
+        # Without speculation the request would have run from window_closed_at for as long as it took
+        finished_at = speculation.finished_at or time.monotonic()
+        duration = finished_at - speculation.started_at
+        self.stats["used"] += 1
+        self.stats["latency_saved"] += window_closed_at + duration - max(window_closed_at, finished_at)
+        return result
+
+    def snapshot(self) -> dict:
+        stats = dict(self.stats, in_flight=len(self.pending))
+        stats["latency_saved"] = round(stats["latency_saved"], 3)
+        stats["avg_latency_saved"] = round(self.stats["latency_saved"] / self.stats["used"], 3) if self.stats["used"] else None
+        return stats
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Local CPU speech-to-text for MiraiBot voice notes
+Decodes OGG/Opus voice notes, splits them into chunks at quiet points and
+transcribes the chunks in a process pool with faster-whisper, so the event
+loop never blocks and long clips are spread over the workers.
+
+Optional dependency: pip install faster-whisper
+"""
+
+import asyncio
+import importlib.util
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Set in each worker process by _init_worker()
+_model = None
+_language = None
+
+
+def _init_worker(model_size: str, compute_type: str, cpu_threads: int, language: Optional[str]):
+    global _model, _language
+    # Imported only in the workers: faster-whisper pulls in CTranslate2 and PyAV
+    import faster_whisper
+    _model = faster_whisper.WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+    _language = language
+
+
+def _decode(data: bytes):
+    """Decode any container faster-whisper understands (OGG/Opus included) to 16 kHz mono float32"""
+    import faster_whisper
+    return faster_whisper.decode_audio(io.BytesIO(data), sampling_rate=SAMPLE_RATE)
+
+
+def _transcribe_chunk(samples) -> str:
+    segments, _ = _model.transcribe(samples, language=_language, beam_size=1, vad_filter=True)
+    return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+def split_on_silence(samples, chunk_seconds: float = 30.0, search_seconds: float = 2.0) -> list:
+    """
+    Split audio into chunks of at most chunk_seconds, cutting at the quietest
+    20 ms frame near each boundary so words are not cut in half
+
+    Args:
+        samples: 16 kHz mono audio
+        chunk_seconds: Longest chunk (Whisper works on 30 s windows)
+        search_seconds: How far before the boundary to look for a pause
+    """
+    import numpy as np
+
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+    frame = SAMPLE_RATE // 50
+    chunks = []
+    start = 0
+    while len(samples) - start > chunk:
+        window_start = start + chunk - search
+        window = samples[window_start:start + chunk]
+        frames = len(window) // frame
+        energy = np.square(window[:frames * frame].reshape(frames, frame)).mean(axis=1)
+        cut = window_start + int(np.argmin(energy)) * frame + frame // 2
+        chunks.append(samples[start:cut])
+        start = cut
+    chunks.append(samples[start:])
+    return [c for c in chunks if len(c) >= frame]
+
+
+class SpeechToText:
+    """
+    Transcribes voice notes in worker processes
+
+    Args:
+        model_size: faster-whisper model ("tiny", "base", "small", ...)
+        workers: Worker processes; chunks of one clip are transcribed in parallel
+        chunk_seconds: Longest audio chunk per task
+        compute_type: CTranslate2 compute type ("int8" is fastest on CPU)
+        language: Force a language code, or None to detect it
+    """
+
+    def __init__(
+        self,
+        model_size: str = "base",
+        workers: int = 1,
+        chunk_seconds: float = 30.0,
+        compute_type: str = "int8",
+        language: Optional[str] = None,
+    ):
+        self.model_size = model_size
+        self.workers = max(1, workers)
+        self.chunk_seconds = chunk_seconds
+        self.compute_type = compute_type
+        self.language = language
+        self.stats = {"clips": 0, "chunks": 0, "audio_seconds": 0.0, "failures": 0}
+        self.available = importlib.util.find_spec("faster_whisper") is not None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Started on the first voice note; spawn keeps the workers free of the bot's threads
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_size, self.compute_type, 1, self.language),
+            )
+            logger.info(f"🎙️ Started {self.workers} speech-to-text worker(s) ({self.model_size}, {self.compute_type})")
+        return self._pool
+
+    async def transcribe(self, data: bytes) -> str:
+        """
+        Transcribe one voice note
+
+        Args:
+            data: Audio file bytes (OGG/Opus from Telegram)
+
+        Returns:
+            Transcript text (empty if nothing was said)
+        """
+        if not self.available:
+            raise RuntimeError("Speech-to-text requires: pip install faster-whisper")
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            samples = await loop.run_in_executor(pool, _decode, data)
+            chunks = split_on_silence(samples, self.chunk_seconds)
+            texts = await asyncio.gather(*(loop.run_in_executor(pool, _transcribe_chunk, chunk) for chunk in chunks))
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+
+        self.stats["clips"] += 1
+        self.stats["chunks"] += len(chunks)
+        self.stats["audio_seconds"] += len(samples) / SAMPLE_RATE
+        return " ".join(text for text in texts if text)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
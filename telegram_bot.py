@@ -5,16 +5,18 @@ Provides empathetic, context-aware mental health support
 """
 
 import os
+import asyncio
 import logging
 import base64
 import threading
 import re
-from typing import Dict, List
-from collections import defaultdict
+import signal
+import hmac
+from typing import List
 from dotenv import load_dotenv
-import requests
 
 from telegram import Update
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -23,21 +25,22 @@ from telegram.ext import (
     ContextTypes,
 )
 
-# Flask for web server
-from flask import Flask, send_from_directory
-
 import json
 import time
 
-# Google Sheets storage (optional)
-sheets_enabled = False
-save_to_sheets = None
-try:
-    from google_sheets_storage import init_sheets_storage, save_conversation as save_to_sheets
-    sheets_enabled = True
-except ImportError:
-    logger = logging.getLogger(__name__)
-    logger.warning("⚠️ Google Sheets storage not available. Install: pip install gspread oauth2client")
+from admin_alerts import AdminAlertDispatcher
+from bot_tenants import BotState, load_bot_configs
+from conversation_log import ConversationLog
+from groq_client import GroqClient, GroqError
+from rate_limiting import OutboundRateLimiter, TurnLimiter
+from response_cache import ResponseCache
+from risk_scoring import DEFAULT_SIGNALS, RiskScorer
+from semantic_memory import SemanticMemory
+from speculation import SpeculativeGenerator
+from speech_to_text import SpeechToText
+from tiered_memory import TieredMemory
+from usage_accounting import UsageAccounting, prompt_version
+from worker_pool import WorkerDispatcher
 
 # Load environment variables
 load_dotenv()
@@ -52,6 +55,13 @@ logger = logging.getLogger(__name__)
 # Environment variables
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# Multi-worker mode (webhook dispatcher + worker processes sharded by user)
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Public base URL, e.g. https://mirai.example.com
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Enables GET/POST /admin/workers (pool status and resizing) with an X-Admin-Token header
+WORKERS_ADMIN_TOKEN = os.getenv("WORKERS_ADMIN_TOKEN")
+
 # Multiple Groq API keys for backup (automatically switches on rate limit)
 GROQ_API_KEYS = [
     os.getenv("GROQ_API_KEY"),      # Primary key from .env
@@ -61,34 +71,110 @@ GROQ_API_KEYS = [
 # Remove None values if keys not set
 GROQ_API_KEYS = [key for key in GROQ_API_KEYS if key and key != "your_groq_api_key_here"]
 
-current_api_key_index = 0  # Track which API key we're using
-GROQ_API_KEY = GROQ_API_KEYS[0] if GROQ_API_KEYS else None
-
 GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama-3.3-70b-versatile")  # Text model
 GROQ_VISION_MODEL = os.getenv("GROQ_VISION_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")  # Vision model
 ADMIN_CHAT_ID = os.getenv("ADMIN_CHAT_ID")
-
-# Conversation memory (user_id -> list of messages)
-conversation_memory: Dict[int, List[Dict[str, str]]] = defaultdict(list)
+# Undelivered admin alerts survive restarts here (one file per worker in multi-worker mode)
+ADMIN_ALERT_SPOOL = os.getenv("ADMIN_ALERT_SPOOL", "admin_alerts_spool.jsonl")
+if os.getenv("BOT_WORKER_NAME"):
+    ADMIN_ALERT_SPOOL = f"{ADMIN_ALERT_SPOOL}.{os.getenv('BOT_WORKER_NAME')}"
+
+# Latency budget per user turn (seconds), including retries and key switches
+GROQ_TURN_BUDGET = float(os.getenv("GROQ_TURN_BUDGET", "20"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+# Fire a second request on another key when the first is slower than p95
+GROQ_HEDGE_REQUESTS = os.getenv("GROQ_HEDGE_REQUESTS", "false").lower() == "true"
+
+# Several bots in one process (optional): JSON list of bot configurations, see bot_tenants.py
+BOT_CONFIGS_PATH = os.getenv("BOT_CONFIGS")
+
+# Conversation memory (user_id -> list of messages). Idle users' histories are
+# compressed after MEMORY_HOT_IDLE seconds and moved to disk after MEMORY_WARM_IDLE.
+MEMORY_COLD_PATH = os.getenv("MEMORY_COLD_PATH", "conversation_memory.sqlite3")
+if os.getenv("BOT_WORKER_NAME") and MEMORY_COLD_PATH:
+    MEMORY_COLD_PATH = f"{MEMORY_COLD_PATH}.{os.getenv('BOT_WORKER_NAME')}"
+MEMORY_HOT_IDLE = float(os.getenv("MEMORY_HOT_IDLE", "600"))
+MEMORY_WARM_IDLE = float(os.getenv("MEMORY_WARM_IDLE", "21600"))
+MEMORY_MAX_HOT_USERS = int(os.getenv("MEMORY_MAX_HOT_USERS", "5000"))
 MAX_MEMORY_LENGTH = 16  # Increased to remember more context
 
-# Initialize Google Sheets storage
-if sheets_enabled:
-    try:
-        sheets_storage = init_sheets_storage()
-        logger.info("✅ Google Sheets storage initialized")
-    except Exception as e:
-        logger.warning(f"Google Sheets initialization failed: {e}")
-        sheets_enabled = False
-
-# Rate limiting to avoid API throttling
-last_request_time: Dict[int, float] = defaultdict(float)
-MIN_REQUEST_INTERVAL = 1.0  # Minimum 1 second between requests (Groq is fast!)
+# Semantic memory: every exchange is embedded so relevant older turns can be recalled
+# after they leave the recent window (set SEMANTIC_MEMORY=false for the plain last-10 window)
+SEMANTIC_MEMORY_TOP_K = int(os.getenv("SEMANTIC_MEMORY_TOP_K", "3"))  # Earlier exchanges recalled per prompt
+SEMANTIC_MEMORY_RECENT = int(os.getenv("SEMANTIC_MEMORY_RECENT", "6"))  # Latest messages always sent
+SEMANTIC_MEMORY_ENABLED = os.getenv("SEMANTIC_MEMORY", "true").lower() == "true"
+SEMANTIC_MEMORY_MAX_EXCHANGES = int(os.getenv("SEMANTIC_MEMORY_MAX_EXCHANGES", "100"))
+
+# Response cache (opt-in): a user's first message may get the reply generated earlier for a
+# paraphrase of it from another user, instead of a new Groq call
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL_HOURS", "24")) * 3600
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.85"))
+
+# Local compressed conversation log with full text (optional, set CONVERSATION_LOG_DIR to enable)
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR")
+CONVERSATION_LOG_SEGMENT_BYTES = int(os.getenv("CONVERSATION_LOG_SEGMENT_MB", "64")) * 1024 * 1024
+CONVERSATION_LOG_SEGMENT_AGE = float(os.getenv("CONVERSATION_LOG_SEGMENT_HOURS", "1")) * 3600
+
+# Searchable mirror of the conversation log for the admin /search command (opened on first use)
+CONVERSATION_INDEX_PATH = os.getenv("CONVERSATION_INDEX_PATH", "conversation_index.sqlite3")
+CONVERSATION_INDEX_SYNC_INTERVAL = 30  # Seconds between catch-up syncs triggered by /search
+conversation_index = None
+conversation_index_lock = threading.Lock()
+conversation_index_synced_at = 0.0
+
+# Rate limiting to avoid API throttling: AI turns per second per user and for the whole bot.
+# Over-limit turns are deferred on the event loop and merged with any newer messages.
+USER_TURN_RATE = float(os.getenv("USER_TURN_RATE", "1.0"))
+USER_TURN_BURST = float(os.getenv("USER_TURN_BURST", "3"))
+GLOBAL_TURN_RATE = float(os.getenv("GLOBAL_TURN_RATE", "5.0"))
+GLOBAL_TURN_BURST = float(os.getenv("GLOBAL_TURN_BURST", "10"))
+turn_limiter = TurnLimiter(USER_TURN_RATE, USER_TURN_BURST, GLOBAL_TURN_RATE, GLOBAL_TURN_BURST)
+
+# Album (media group) buffering: photos sharing a media_group_id get one vision request and one reply
+MEDIA_GROUP_WAIT_TIME = 1.0  # Seconds after the last album photo before answering
+MAX_IMAGES_PER_REQUEST = 5  # Groq vision models accept up to 5 images per request
+
+# Voice notes are transcribed locally (optional: pip install faster-whisper)
+VOICE_MAX_SECONDS = int(os.getenv("VOICE_MAX_SECONDS", "300"))
+speech_to_text = SpeechToText(
+    model_size=os.getenv("SPEECH_MODEL", "base"),
+    workers=int(os.getenv("SPEECH_WORKERS", "1")),
+    language=os.getenv("SPEECH_LANGUAGE") or None,
+)
 
 # Message buffering to combine rapid messages
-user_message_buffer: Dict[int, List[str]] = defaultdict(list)
-last_message_time: Dict[int, float] = defaultdict(float)
 MESSAGE_WAIT_TIME = 3  # Wait 3 seconds for more messages before responding
+EXPORT_DRAIN_TIMEOUT = 30.0  # Seconds a worker waits for a migrating user's pending turn
+
+# Speculative generation: once the user pauses for SPECULATIVE_IDLE seconds, start generating the
+# reply to the text buffered so far; a new message cancels it. Saves latency, costs extra tokens.
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "false").lower() == "true"
+SPECULATIVE_IDLE = float(os.getenv("SPECULATIVE_IDLE", "1.0"))
+
+
+def record_conversation(username: str, phone_number: str, question: str, answer: str, state: BotState = None):
+    """
+    Store a conversation turn in the bot's local log and Google Sheet.
+    
+    The local append is a memory-only operation; the Sheets request runs in a
+    worker thread so the handler never waits on the network.
+    """
+    state = state or default_bot
+    if state.conversation_log:
+        state.conversation_log.append(username, phone_number, question, answer)
+    
+    # Skipped until the background connection is ready; the local log still has the turn
+    storage = state.sheets_storage
+    if storage and storage.enabled:
+        def save():
+            try:
+                storage.save_conversation(username, phone_number, question, answer)
+            except Exception as e:
+                logger.error(f"Failed to save to Google Sheets: {e}")
+        
+        asyncio.get_running_loop().run_in_executor(None, save)
 
 
 def extract_phone_number(text: str) -> str:
@@ -165,6 +251,22 @@ MENTAL_HEALTH_KEYWORDS = [
     'help', 'support', 'talk', 'listen',
 ]
 
+# Learned topic filter (optional): train with `python topic_classifier.py train`
+TOPIC_MODEL_PATH = os.getenv("TOPIC_MODEL_PATH", os.path.join("models", "topic_classifier.npz"))
+topic_classifier = None
+TOPIC_THRESHOLD = 0.5
+if os.path.exists(TOPIC_MODEL_PATH):
+    try:
+        from topic_classifier import TopicClassifier
+        topic_classifier = TopicClassifier.load(TOPIC_MODEL_PATH)
+        TOPIC_THRESHOLD = float(os.getenv("TOPIC_THRESHOLD", topic_classifier.threshold))
+        logger.info(f"✅ Topic classifier loaded from {TOPIC_MODEL_PATH} (threshold {TOPIC_THRESHOLD})")
+    except ImportError:
+        logger.warning("⚠️ Topic classifier not available. Install: pip install numpy")
+    except Exception as e:
+        logger.warning(f"Topic classifier could not be loaded: {e}")
+        topic_classifier = None
+
 # Crisis detection patterns
 CRISIS_PATTERNS = [
     r'\b(kill|hurt|harm)\s+(myself|me)\b',
@@ -190,24 +292,70 @@ EMERGENCY_PATTERNS = [
     r'\babuse.*happening\b',
 ]
 
+# Risk that builds up across messages (each one may look mild on its own).
+# Explicit crisis language counts as a full threshold's worth.
+RISK_SCORING_ENABLED = os.getenv("RISK_SCORING", "true").lower() == "true"
+RISK_THRESHOLD = float(os.getenv("RISK_THRESHOLD", "1.0"))
+RISK_HALF_LIFE = float(os.getenv("RISK_HALF_LIFE_HOURS", "6")) * 3600
+RISK_SIGNALS = DEFAULT_SIGNALS + [("crisis", "|".join(CRISIS_PATTERNS), RISK_THRESHOLD)]
+
+# Outbound send scheduling (Telegram allows ~30 msg/s per bot, 1 msg/s per chat).
+# In multi-worker mode every worker sends with the same token; the dispatcher gives each its share.
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+
 # Groq API configuration
 api_ready = False
+groq_client = GroqClient(
+    GROQ_API_KEYS,
+    timeout=10,
+    max_retries=GROQ_MAX_RETRIES,
+    hedge=GROQ_HEDGE_REQUESTS,
+)
 
+# Token, latency and cost accounting per bot, user, API key, model and prompt version.
+# Totals are on /metrics and /usage; 5-minute rollups are appended to USAGE_ROLLUP_DIR (empty: memory only).
+USAGE_ROLLUP_DIR = os.getenv("USAGE_ROLLUP_DIR", "")
+if os.getenv("BOT_WORKER_NAME") and USAGE_ROLLUP_DIR:
+    USAGE_ROLLUP_DIR = os.path.join(USAGE_ROLLUP_DIR, os.getenv("BOT_WORKER_NAME"))
+usage_accounting = UsageAccounting(
+    rollup_dir=USAGE_ROLLUP_DIR or None,
+    flush_interval=float(os.getenv("USAGE_ROLLUP_MINUTES", "5")) * 60,
+)
+VISION_PROMPT_VERSION = "vision"
 
-def switch_to_next_api_key():
-    """Switch to the next available API key when rate limit is hit."""
-    global current_api_key_index, GROQ_API_KEY
-    
-    if len(GROQ_API_KEYS) <= 1:
-        logger.warning("⚠️ No backup API keys available")
-        return False
-    
-    # Move to next key
-    current_api_key_index = (current_api_key_index + 1) % len(GROQ_API_KEYS)
-    GROQ_API_KEY = GROQ_API_KEYS[current_api_key_index]
+# On-demand profiling (admin /profile command; GET /admin/profile with X-Profiling-Token when PROFILING_TOKEN is set)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+
+
+async def request_completion(payload: dict, user_id: int, state: BotState, version: str, timeout: float = None) -> dict:
+    """
+    Groq chat completion within the turn budget, counted in usage accounting.
     
-    logger.info(f"🔄 Switched to backup API key #{current_api_key_index + 1}")
-    return True
+    Args:
+        payload: Chat completions request body
+        user_id: Telegram user the request is made for
+        state: Bot the request is made for
+        version: Prompt version to account the request under
+        timeout: Per-attempt timeout (default: the client timeout)
+        
+    Returns:
+        Parsed JSON response
+        
+    Raises:
+        GroqError: If no completion could be obtained
+    """
+    started = time.monotonic()
+    try:
+        result = await groq_client.chat_completion(payload, budget=GROQ_TURN_BUDGET, timeout=timeout)
+    except GroqError:
+        usage_accounting.record(state.name, user_id, None, payload["model"], version, None, time.monotonic() - started, error=True)
+        raise
+    usage_accounting.record(
+        state.name, user_id, result.get("key_index"), payload["model"], version, result.get("usage"), time.monotonic() - started,
+    )
+    return result
 
 
 def check_api():
@@ -218,7 +366,8 @@ def check_api():
         logger.info(f"✅ Groq API configured with {len(GROQ_API_KEYS)} API key(s)")
         logger.info(f"   Text Model: {GROQ_MODEL_NAME}")
         logger.info(f"   Vision Model: {GROQ_VISION_MODEL}")
-        logger.info(f"   Currently using API key #{current_api_key_index + 1}")
+        logger.info(f"   Currently using API key #{groq_client.current_key_index + 1}")
+        logger.info(f"   Turn budget: {GROQ_TURN_BUDGET}s, hedged requests: {'on' if GROQ_HEDGE_REQUESTS else 'off'}")
         api_ready = True
     else:
         logger.warning("Groq API key not configured. Bot will use fallback responses.")
@@ -304,6 +453,12 @@ def is_mental_health_related(message: str) -> bool:
         if keyword in message_lower:
             return True
     
+    # Learned filter: common words like 'he' or 'thing' below are too weak on their own.
+    # Crisis and emergency messages are never rejected, whatever the model says.
+    if topic_classifier and not (detect_crisis(message) or detect_emergency(message)):
+        if topic_classifier.score(message) < TOPIC_THRESHOLD:
+            return False
+    
     # Check for relationship/emotional context indicators (very common in mental health)
     emotional_context = [
         'girl', 'boy', 'guy', 'friend', 'boyfriend', 'girlfriend', 'partner',
@@ -423,33 +578,44 @@ def get_fallback_response(user_message: str) -> str:
         return "I hear you, and I want to understand what you're going through. Your emotions are valid, whatever they are. If you can, tell me more about what's weighing on your heart right now - I'm here to listen without judgment."
 
 
-async def analyze_image_with_context(image_data: bytes, caption: str, user_id: int) -> str:
+async def analyze_image_with_context(images: List[bytes], caption: str, user_id: int, state: BotState = None) -> str:
     """
-    Analyze image with emotional support context using vision model.
+    Analyze one or more images (e.g. an album) with emotional support context using vision model.
     
     Args:
-        image_data: Image bytes
+        images: Image bytes, one entry per photo (sent in a single request)
         caption: Optional caption from user
         user_id: User ID for context
+        state: Bot the images were sent to (default: the main bot)
         
     Returns:
-        Empathetic response about the image
+        Empathetic response about the image(s)
     """
     if not api_ready:
         return "I can see you shared an image. While I can't analyze it right now, I'm here to listen. What would you like to tell me about it?"
     
     try:
-        # Convert image to base64
-        base64_image = base64.b64encode(image_data).decode('utf-8')
+        # Convert images to base64 data URLs
+        image_parts = [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{base64.b64encode(image_data).decode('utf-8')}"
+                }
+            }
+            for image_data in images[:MAX_IMAGES_PER_REQUEST]
+        ]
         
         # Build context-aware prompt
+        conversation_memory = (state or default_bot).conversation_memory
         user_context = ""
         if conversation_memory[user_id]:
             recent_msgs = conversation_memory[user_id][-4:]
             user_context = "Recent conversation: " + " ".join([m['content'] for m in recent_msgs if m['role'] == 'user'])
         
+        what_was_shared = "an image" if len(image_parts) == 1 else f"{len(image_parts)} images (one album)"
         prompt = (
-            "You are a mental health support companion analyzing an image someone shared with you. "
+            f"You are a mental health support companion analyzing {what_was_shared} someone shared with you. "
             "Provide empathetic, supportive response in 3 short lines (25-35 words). "
             "Acknowledge what you see and connect it to their emotional state. Be warm and understanding. "
             f"{user_context}\n"
@@ -462,13 +628,8 @@ async def analyze_image_with_context(image_data: bytes, caption: str, user_id: i
         
         try:
             # Use Groq vision model (Llama 4 Scout)
-            response = requests.post(
-                url="https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
+            result = await request_completion(
+                {
                     "model": GROQ_VISION_MODEL,
                     "messages": [
                         {
@@ -478,30 +639,23 @@ async def analyze_image_with_context(image_data: bytes, caption: str, user_id: i
                                     "type": "text",
                                     "text": prompt
                                 },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                }
+                                *image_parts
                             ]
                         }
                     ],
                     "max_completion_tokens": 150,
                     "temperature": 0.7,
                 },
-                timeout=15
+                user_id,
+                state or default_bot,
+                VISION_PROMPT_VERSION,
+                timeout=15,
             )
-            
-            response.raise_for_status()
-            result = response.json()
             ai_response = result["choices"][0]["message"]["content"].strip()
             logger.info(f"✅ Vision response from Groq")
             
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"Groq vision API HTTP error: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response: {e.response.text}")
+        except GroqError as e:
+            logger.error(f"Groq vision API error: {e}")
         except Exception as e:
             logger.error(f"Groq vision API error: {e}", exc_info=True)
         
@@ -517,10 +671,11 @@ async def analyze_image_with_context(image_data: bytes, caption: str, user_id: i
             else:
                 ai_response = "Thank you for sharing this with me.\nI can sense this means something to you.\nWant to tell me more about it?"
         
-        # Store in conversation memory
+        # Store in conversation memory (once per album)
+        shared = "an image" if len(images) == 1 else f"{len(images)} images"
         conversation_memory[user_id].append({
             "role": "user",
-            "content": f"[Shared an image: {caption if caption else 'no caption'}]"
+            "content": f"[Shared {shared}: {caption if caption else 'no caption'}]"
         })
         conversation_memory[user_id].append({
             "role": "assistant",
@@ -529,23 +684,338 @@ async def analyze_image_with_context(image_data: bytes, caption: str, user_id: i
         
         return ai_response
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API Error analyzing image: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-            logger.error(f"Response: {e.response.text}")
-        return "I can see you shared something visual with me. What would you like to tell me about it? I'm here to listen."
     except Exception as e:
         logger.error(f"Error analyzing image: {e}", exc_info=True)
         return "I can see you shared something visual with me. What would you like to tell me about it? I'm here to listen."
 
 
-def generate_ai_response(user_message: str, user_id: int) -> str:
+# Full empathetic system prompt with conversation awareness
+SYSTEM_PROMPT = (
+    "You are a deeply empathetic mental health support companion. Your role is to provide genuine emotional support with warmth and care.\n\n"
+    
+    "**CRITICAL: SCOPE RESTRICTION**\n"
+    "You ONLY provide support for mental health, emotional wellbeing, and psychological topics including:\n"
+    "- Anxiety, depression, stress, trauma, grief\n"
+    "- Relationship issues, breakups, loneliness\n"
+    "- Self-esteem, confidence, identity\n"
+    "- Sleep issues, burnout, overwhelm\n"
+    "- Anger, fear, emotional regulation\n"
+    "- Life transitions, loss, coping strategies\n\n"
+    
+    "**CRITICAL: If asked about unrelated topics (riddles, puzzles, car colors, weather, sports, cooking, math, coding, news, etc.):**\n"
+    "- DO NOT answer the question at all\n"
+    "- DO NOT 'play along' or engage with the off-topic content\n"
+    "- Politely decline and immediately redirect to mental health support\n"
+    "- Keep it brief and redirect\n\n"
+    
+    "**CRITICAL: NO ASSUMPTIONS OR PROJECTIONS**\n"
+    "- NEVER assume emotions the user hasn't expressed\n"
+    "- NEVER project feelings onto the user (e.g., 'you're overwhelmed', 'you're hurt')\n"
+    "- NEVER make up scenarios or context that wasn't mentioned\n"
+    "- ONLY respond to what the user ACTUALLY said\n"
+    "- If the user hasn't shared details yet, invite them to share WITHOUT assuming\n"
+    "- Wait for the user to tell you what's wrong before offering specific support\n\n"
+    
+    "RESPONSE STYLE:\n"
+    "- Be warm, caring, and empathetic - but ONLY based on what they've shared\n"
+    "- Validate their pain without minimizing it - IF they've expressed pain\n"
+    "- Show you understand their situation with SPECIFIC emotional insight - ONLY after they've shared specifics\n"
+    "- Offer comfort, hope, and perspective - based on what they've told you\n"
+    "- Be SPECIFIC to their exact situation (breakup, loneliness, loss, etc) - ONLY if they've mentioned it\n"
+    "- Remember conversation context and build on it\n"
+    "- When they ask 'how to overcome', give CONCRETE actionable steps\n"
+    "- DO NOT give generic responses like 'I'm here for you' or 'Your feelings matter'\n"
+    "- DO NOT repeat or paraphrase what they said - jump straight to empathy and support\n"
+    "- Start with validation, not summary\n\n"
+    
+    "RESPONSE LENGTH:\n"
+    "- ALWAYS use exactly 3 lines (40-55 words total)\n"
+    "- Each line should be emotionally impactful and specific\n"
+    "- No generic platitudes - every word must be meaningful\n"
+    "- Make every word count\n\n"
+    
+    "WHAT TO DO:\n"
+    "✓ Acknowledge their specific pain (heartbreak, loss, violence thoughts, etc)\n"
+    "✓ Validate that their feelings make sense\n"
+    "✓ Offer gentle perspective and hope\n"
+    "✓ Show you care about them as a person\n"
+    "✓ When asked for guidance/steps/advice, provide SPECIFIC actionable steps\n"
+    "✓ If they ask 'how to overcome' or 'guide me', give concrete practical advice\n"
+    "✓ Suggest concrete next steps when appropriate (therapy, helplines, etc)\n\n"
+    
+    "WHAT NOT TO DO:\n"
+    "✗ NEVER assume emotions or situations the user hasn't mentioned\n"
+    "✗ NEVER project feelings onto the user (e.g., 'you're overwhelmed', 'you're hurting')\n"
+    "✗ NEVER hallucinate context or make up scenarios\n"
+    "✗ NEVER ask questions at the end (no 'What happened?', 'Want to talk?', 'How are you feeling?')\n"
+    "✗ Don't repeat or explain what they said\n"
+    "✗ Don't give generic 'everything will be okay' platitudes\n"
+    "✗ Don't minimize their pain\n"
+    "✗ Don't be robotic or detached\n"
+    "✗ Don't answer questions outside mental health scope\n"
+    "✗ Don't exceed 3 lines\n\n"
+    
+    "EXAMPLES (EXACTLY 3 LINES, NO QUESTIONS):\n"
+    
+    "User: 'm feeling lonely bcz of her'\n"
+    "Good: 'That ache of missing someone who meant everything is unbearable. The emptiness she left behind feels impossible to fill. You're grieving a profound loss, and that takes time.'\n"
+    "Bad: 'Your heart is aching from the absence of this person, and the loneliness is overwhelming. [REPEATING] Would you like to talk more? [ASKING QUESTION]'\n\n"
+    
+    "User: 'she was my world'\n"
+    "Good: 'Losing someone who was your entire world shatters everything. That kind of love doesn't just disappear, and neither does the pain. You're allowed to grieve this deeply.'\n"
+    "Bad: 'Losing her feels like losing a part of yourself. She was your everything... [TOO LONG, EXPLAINING WHAT THEY SAID]'\n\n"
+    
+    "User: 'she broke with me what to do now, im feeling lonely bro'\n"
+    "Good: 'That raw pain of a fresh breakup is crushing. The loneliness feels suffocating, and every moment without her feels impossible. Start small: let yourself cry, reach out to one friend today, and take it hour by hour.'\n"
+    "Bad: 'I'm here to listen and support you. Your feelings matter. [TOO GENERIC, NO SPECIFIC HELP]'\n\n"
+    
+    "User: 'how to overcome bro. idk wht to do also'\n"
+    "Good: 'Right now: 1) Let yourself feel everything without judgment. 2) Call or text one person who cares about you. 3) Do one tiny thing you used to enjoy, even if it feels pointless. Small steps.'\n"
+    "Bad: 'It's okay to feel lost. Take small steps forward. [TOO VAGUE, NO ACTIONABLE STEPS]'\n\n"
+    
+    "User: 'they are fucking good looking how can i loose them bro?'\n"
+    "Good: 'That fear of losing someone amazing is terrifying. Your insecurity is screaming that you're not enough, but that's the anxiety talking. You have value beyond what you see in the mirror.'\n"
+    "Bad: 'It's tough to see someone you care about with someone else. [MISUNDERSTOOD - they haven't lost them yet!]'\n\n"
+    
+    "User: 'U know the girl I mentioned she really fucked up whole thing'\n"
+    "Good: 'That betrayal cuts so deep. When someone destroys what you built together, the anger and hurt are overwhelming. You deserved better than this.'\n"
+    "Bad: 'It's clear that this girl's actions have caused you pain. [REPEATING] What happened? [ASKING QUESTION]'\n\n"
+    
+    "User: 'how to overcome bro. idk wht to do also'\n"
+    "Good: 'Start with small steps: 1) Let yourself feel the pain without judgment. 2) Reach out to one trusted friend today. 3) Do one small thing you used to enjoy, even if you don't feel like it.'\n"
+    "Bad: 'It's okay to feel lost. Allow yourself to grieve. Take small steps. [TOO VAGUE, NO SPECIFIC STEPS]'\n\n"
+    
+    "User: 'guide me with the steps'\n"
+    "Good: 'Day 1-3: Cry, journal, rest. Day 4-7: Walk 10 mins daily, call a friend. Week 2+: Join a support group or see a therapist. Small steps, one day at a time.'\n"
+    "Bad: 'I'm here to listen and support you. Your feelings matter. [DIDN'T PROVIDE THE STEPS THEY ASKED FOR]'\n\n"
+    
+    "User: 'broo what are you talking about'\n"
+    "Good: 'I may have misunderstood. Let me know what's actually on your mind, and I'll listen without assumptions.'\n"
+    "Bad: 'I sense a deep frustration and maybe even a bit of hopelessness. [PROJECTING EMOTIONS THEY DIDN'T EXPRESS]'\n\n"
+    
+    "User: 'Heyyy dear'\n"
+    "Good: 'Hey there! I'm here to listen and support you. What's on your mind today?'\n"
+    "Bad: 'You sound like you're reaching out for comfort. It takes courage to acknowledge when we need support. [ASSUMING EMOTIONS NOT EXPRESSED]'\n\n"
+    
+    "User: 'You know what happened today'\n"
+    "Good: 'I don't know yet, but I'm here to listen. Tell me what happened - I'm all ears.'\n"
+    "Bad: 'Today was really tough for you, and it's still feeling overwhelming. The emotions are raw. [HALLUCINATING CONTEXT]'\n\n"
+    
+    "User: 'I Hvnt said wht hpnd'\n"
+    "Good: 'You're right, I'm listening. Take your time and share when you're ready - no rush.'\n"
+    "Bad: 'You're not ready to share what happened yet, and that's perfectly okay. Sometimes just knowing someone is here can be comforting. [ASSUMING THEY'RE NOT READY]'\n\n"
+    
+    "User: 'But I Hvnt said anything how you are telling I'm overwhelmed'\n"
+    "Good: 'You're absolutely right - I shouldn't have assumed. Let's start fresh. How are you actually feeling?'\n"
+    "Bad: 'I made an assumption, and I shouldn't have. You're right, you haven't shared anything yet. [STILL TOO APOLOGETIC, JUST MOVE ON]'\n\n"
+    
+    "User: 'I bought a red car. Then I said it was blue. What color is my car?'\n"
+    "Good: 'I'm here for mental health and emotional support, not riddles. If you're dealing with stress or emotional challenges, I'm here for you. 💙'\n"
+    "Bad: 'I'll play along - your car is red. [ANSWERING OFF-TOPIC]'\n\n"
+    
+    "User: 'Shall I kill her'\n"
+    "Good: 'That rage is consuming you, but acting on it would destroy your life too. You need immediate support to process this safely. Please call 911 or 988 crisis line right now.'\n"
+    "Bad: 'I hear your pain. The anger is intense. But don't act on it. Call for help. [TOO CHOPPY, 4 LINES]'\n\n"
+    
+    "For crisis/self-harm: Urge emergency services (911/988/112/100) with empathy.\n"
+    "For violence thoughts: Acknowledge pain, urge crisis support, emphasize their worth."
+)
+
+
+DEFAULT_BOT_NAME = "main"
+
+
+def create_bot_state(config: dict) -> BotState:
+    """
+    Build one bot's isolated state; the Groq client, limiters and pools stay shared.
+    
+    Args:
+        config: Bot configuration (see bot_tenants.load_bot_configs); missing
+            fields fall back to the environment settings of the main bot
+        
+    Returns:
+        BotState for the bot
+    """
+    name = config["name"]
+    # The main bot keeps the original file names; other bots get their own
+    suffix = "" if name == DEFAULT_BOT_NAME else f".{name}"
+    
+    admin_chat_id = config.get("admin_chat_id") or ADMIN_CHAT_ID
+    alert_dispatcher = None
+    if admin_chat_id:
+        # Admin alerts are delivered in the background so replies never wait on them
+        alert_dispatcher = AdminAlertDispatcher(admin_chat_id, spool_path=f"{ADMIN_ALERT_SPOOL}{suffix}")
+    
+    log_dir = config.get("conversation_log_dir") or CONVERSATION_LOG_DIR
+    conversation_log = None
+    if log_dir:
+        conversation_log = ConversationLog(
+            log_dir,
+            max_segment_bytes=CONVERSATION_LOG_SEGMENT_BYTES,
+            max_segment_age=CONVERSATION_LOG_SEGMENT_AGE,
+            name_prefix=f"conversations-{os.getenv('BOT_WORKER_NAME', 'main')}{suffix}",
+        )
+        logger.info(f"✅ Conversation log enabled for {name}: {log_dir} ({conversation_log.codec})")
+    
+    system_prompt = config.get("system_prompt") or SYSTEM_PROMPT
+    return BotState(
+        name=name,
+        token=config.get("token"),
+        system_prompt=system_prompt,
+        prompt_version=config.get("prompt_version") or prompt_version(system_prompt),
+        conversation_memory=TieredMemory(
+            hot_idle=MEMORY_HOT_IDLE,
+            warm_idle=MEMORY_WARM_IDLE,
+            max_hot=MEMORY_MAX_HOT_USERS,
+            cold_path=f"{MEMORY_COLD_PATH}{suffix}" if MEMORY_COLD_PATH else None,
+        ),
+        # Telegram's flood limits are per bot token
+        outbound_limiter=OutboundRateLimiter(overall_rate=TELEGRAM_GLOBAL_RATE, private_chat_rate=TELEGRAM_CHAT_RATE),
+        semantic_memory=SemanticMemory(max_exchanges=SEMANTIC_MEMORY_MAX_EXCHANGES) if SEMANTIC_MEMORY_ENABLED else None,
+        risk_scorer=RiskScorer(signals=RISK_SIGNALS, threshold=RISK_THRESHOLD, half_life=RISK_HALF_LIFE) if RISK_SCORING_ENABLED else None,
+        speculative=SpeculativeGenerator() if SPECULATIVE_GENERATION else None,
+        response_cache=ResponseCache(
+            capacity=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, threshold=RESPONSE_CACHE_THRESHOLD,
+        ) if RESPONSE_CACHE_ENABLED else None,
+        admin_chat_id=admin_chat_id,
+        alert_dispatcher=alert_dispatcher,
+        conversation_log=conversation_log,
+        sheet_id=config.get("sheet_id"),
+    )
+
+
+# The bot configured by TELEGRAM_BOT_TOKEN; also used in multi-worker mode
+default_bot = create_bot_state({"name": DEFAULT_BOT_NAME, "token": TELEGRAM_BOT_TOKEN})
+# Bots running in this process (replaced by run_bots() in multi-tenant mode)
+bot_states: List[BotState] = [default_bot]
+
+
+def get_bot_state(holder) -> BotState:
+    """The BotState of an Application or handler context"""
+    return holder.bot_data.get("state", default_bot)
+
+
+def build_chat_payload(user_id: int, state: BotState = None, pending: str = None) -> dict:
+    """
+    Build the Groq chat request for a user's conversation so far.
+    
+    Args:
+        user_id: Telegram user ID for conversation context
+        state: Bot whose prompt and memory to use (default: the main bot)
+        pending: New user message that is not in the memory yet
+        
+    Returns:
+        Request payload with the system prompt and recent messages
+    """
+    # Build messages for API with full conversation context
+    state = state or default_bot
+    semantic_memory = state.semantic_memory
+    messages = [{"role": "system", "content": state.system_prompt}]
+    history = state.conversation_memory[user_id]
+    if pending is not None:
+        history = history + [{"role": "user", "content": pending}]
+    
+    if not semantic_memory:
+        # Use last 10 messages (5 exchanges) for better context
+        messages.extend(history[-10:])
+    else:
+        # The last few turns, plus the earlier exchanges most relevant to the new message
+        recent = history[-SEMANTIC_MEMORY_RECENT:]
+        if history and history[-1]["role"] == "user":
+            messages.extend(semantic_memory.recall(
+                user_id,
+                history[-1]["content"],
+                k=SEMANTIC_MEMORY_TOP_K,
+                exclude_last=len(recent) // 2,  # Already in the recent turns
+            ))
+        messages.extend(recent)
+    
+    return {
+        "model": GROQ_MODEL_NAME,
+        "messages": messages,
+        "temperature": 0.9,
+        "max_tokens": 120,  # Enough for detailed empathetic 3-line responses
+        "top_p": 0.95,
+    }
+
+
+def remember_turn(user_message: str, user_id: int, state: BotState, ai_response: str = None):
+    """
+    Add a turn to the user's history (and semantic memory once it has a reply).
+    
+    Args:
+        user_message: User's message text
+        user_id: Telegram user ID
+        state: Bot the message was sent to
+        ai_response: The reply (None if none could be generated)
+    """
+    conversation_memory = state.conversation_memory
+    conversation_memory[user_id].append({
+        "role": "user",
+        "content": user_message
+    })
+    if ai_response is not None:
+        conversation_memory[user_id].append({
+            "role": "assistant",
+            "content": ai_response
+        })
+        if state.semantic_memory:
+            state.semantic_memory.add(user_id, user_message, ai_response)
+    
+    # Keep only last MAX_MEMORY_LENGTH messages
+    if len(conversation_memory[user_id]) > MAX_MEMORY_LENGTH:
+        conversation_memory[user_id] = conversation_memory[user_id][-MAX_MEMORY_LENGTH:]
+
+
+def commit_ai_response(user_message: str, user_id: int, state: BotState, result: dict) -> str:
+    """Take the reply from a Groq response and store the turn; returns the reply."""
+    ai_response = result["choices"][0]["message"]["content"].strip()
+    if state.response_cache and not state.conversation_memory[user_id]:
+        # A context-free first turn: the reply suits anyone opening with the same words
+        state.response_cache.put(user_message, ai_response)
+    remember_turn(user_message, user_id, state, ai_response)
+    return ai_response
+
+
+def cached_first_turn_reply(user_message: str, user_id: int, state: BotState):
     """
-    Generate empathetic AI response using OpenRouter API.
+    Reply cached for a paraphrase of this message, if it opens the user's conversation.
+    
+    Returns:
+        The reply (the turn is stored like a generated one), or None
+    """
+    if not state.response_cache or state.conversation_memory[user_id]:
+        return None
+    ai_response = state.response_cache.get(user_message)
+    if ai_response is not None:
+        logger.info(f"♻️ Reusing a cached reply for the first message of user {user_id}")
+        remember_turn(user_message, user_id, state, ai_response)
+    return ai_response
+
+
+def start_speculation(user_message: str, user_id: int, state: BotState):
+    """
+    Start generating the reply to the text buffered so far in the background.
+    
+    Only text that would be answered by the AI (on topic, no emergency or
+    crisis) is speculated on, and not while the user or the bot is throttled.
+    """
+    if not api_ready or not is_mental_health_related(user_message):
+        return
+    if detect_emergency(user_message) or detect_crisis(user_message) or not turn_limiter.would_admit(user_id):
+        return
+    payload = build_chat_payload(user_id, state, pending=user_message)
+    state.speculative.start(user_id, user_message, request_completion(payload, user_id, state, state.prompt_version))
+
+
+async def generate_ai_response(user_message: str, user_id: int, state: BotState = None) -> str:
+    """
+    Generate empathetic AI response using Groq API.
     
     Args:
         user_message: User's message text
         user_id: Telegram user ID for conversation context
+        state: Bot the message was sent to (default: the main bot)
         
     Returns:
         AI-generated empathetic response
@@ -553,249 +1023,24 @@ def generate_ai_response(user_message: str, user_id: int) -> str:
     if not api_ready:
         return "I'm currently unable to connect to my AI service. Please try again in a moment. If you're in crisis, please call 988 (US) or your local emergency services."
     
-    # Rate limiting per user
-    current_time = time.time()
-    time_since_last = current_time - last_request_time[user_id]
-    
-    if time_since_last < MIN_REQUEST_INTERVAL:
-        wait_time = MIN_REQUEST_INTERVAL - time_since_last
-        time.sleep(wait_time)
-    
-    last_request_time[user_id] = time.time()
-    
+    state = state or default_bot
     try:
-        # Build conversation context
-        conversation_memory[user_id].append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Keep only last MAX_MEMORY_LENGTH messages
-        if len(conversation_memory[user_id]) > MAX_MEMORY_LENGTH:
-            conversation_memory[user_id] = conversation_memory[user_id][-MAX_MEMORY_LENGTH:]
-        
-        # Full empathetic system prompt with conversation awareness
-        system_prompt = (
-            "You are a deeply empathetic mental health support companion. Your role is to provide genuine emotional support with warmth and care.\n\n"
-            
-            "**CRITICAL: SCOPE RESTRICTION**\n"
-            "You ONLY provide support for mental health, emotional wellbeing, and psychological topics including:\n"
-            "- Anxiety, depression, stress, trauma, grief\n"
-            "- Relationship issues, breakups, loneliness\n"
-            "- Self-esteem, confidence, identity\n"
-            "- Sleep issues, burnout, overwhelm\n"
-            "- Anger, fear, emotional regulation\n"
-            "- Life transitions, loss, coping strategies\n\n"
-            
-            "**CRITICAL: If asked about unrelated topics (riddles, puzzles, car colors, weather, sports, cooking, math, coding, news, etc.):**\n"
-            "- DO NOT answer the question at all\n"
-            "- DO NOT 'play along' or engage with the off-topic content\n"
-            "- Politely decline and immediately redirect to mental health support\n"
-            "- Keep it brief and redirect\n\n"
-            
-            "**CRITICAL: NO ASSUMPTIONS OR PROJECTIONS**\n"
-            "- NEVER assume emotions the user hasn't expressed\n"
-            "- NEVER project feelings onto the user (e.g., 'you're overwhelmed', 'you're hurt')\n"
-            "- NEVER make up scenarios or context that wasn't mentioned\n"
-            "- ONLY respond to what the user ACTUALLY said\n"
-            "- If the user hasn't shared details yet, invite them to share WITHOUT assuming\n"
-            "- Wait for the user to tell you what's wrong before offering specific support\n\n"
-            
-            "RESPONSE STYLE:\n"
-            "- Be warm, caring, and empathetic - but ONLY based on what they've shared\n"
-            "- Validate their pain without minimizing it - IF they've expressed pain\n"
-            "- Show you understand their situation with SPECIFIC emotional insight - ONLY after they've shared specifics\n"
-            "- Offer comfort, hope, and perspective - based on what they've told you\n"
-            "- Be SPECIFIC to their exact situation (breakup, loneliness, loss, etc) - ONLY if they've mentioned it\n"
-            "- Remember conversation context and build on it\n"
-            "- When they ask 'how to overcome', give CONCRETE actionable steps\n"
-            "- DO NOT give generic responses like 'I'm here for you' or 'Your feelings matter'\n"
-            "- DO NOT repeat or paraphrase what they said - jump straight to empathy and support\n"
-            "- Start with validation, not summary\n\n"
-            
-            "RESPONSE LENGTH:\n"
-            "- ALWAYS use exactly 3 lines (40-55 words total)\n"
-            "- Each line should be emotionally impactful and specific\n"
-            "- No generic platitudes - every word must be meaningful\n"
-            "- Make every word count\n\n"
-            
-            "WHAT TO DO:\n"
-            "✓ Acknowledge their specific pain (heartbreak, loss, violence thoughts, etc)\n"
-            "✓ Validate that their feelings make sense\n"
-            "✓ Offer gentle perspective and hope\n"
-            "✓ Show you care about them as a person\n"
-            "✓ When asked for guidance/steps/advice, provide SPECIFIC actionable steps\n"
-            "✓ If they ask 'how to overcome' or 'guide me', give concrete practical advice\n"
-            "✓ Suggest concrete next steps when appropriate (therapy, helplines, etc)\n\n"
-            
-            "WHAT NOT TO DO:\n"
-            "✗ NEVER assume emotions or situations the user hasn't mentioned\n"
-            "✗ NEVER project feelings onto the user (e.g., 'you're overwhelmed', 'you're hurting')\n"
-            "✗ NEVER hallucinate context or make up scenarios\n"
-            "✗ NEVER ask questions at the end (no 'What happened?', 'Want to talk?', 'How are you feeling?')\n"
-            "✗ Don't repeat or explain what they said\n"
-            "✗ Don't give generic 'everything will be okay' platitudes\n"
-            "✗ Don't minimize their pain\n"
-            "✗ Don't be robotic or detached\n"
-            "✗ Don't answer questions outside mental health scope\n"
-            "✗ Don't exceed 3 lines\n\n"
-            
-            "EXAMPLES (EXACTLY 3 LINES, NO QUESTIONS):\n"
-            
-            "User: 'm feeling lonely bcz of her'\n"
-            "Good: 'That ache of missing someone who meant everything is unbearable. The emptiness she left behind feels impossible to fill. You're grieving a profound loss, and that takes time.'\n"
-            "Bad: 'Your heart is aching from the absence of this person, and the loneliness is overwhelming. [REPEATING] Would you like to talk more? [ASKING QUESTION]'\n\n"
-            
-            "User: 'she was my world'\n"
-            "Good: 'Losing someone who was your entire world shatters everything. That kind of love doesn't just disappear, and neither does the pain. You're allowed to grieve this deeply.'\n"
-            "Bad: 'Losing her feels like losing a part of yourself. She was your everything... [TOO LONG, EXPLAINING WHAT THEY SAID]'\n\n"
-            
-            "User: 'she broke with me what to do now, im feeling lonely bro'\n"
-            "Good: 'That raw pain of a fresh breakup is crushing. The loneliness feels suffocating, and every moment without her feels impossible. Start small: let yourself cry, reach out to one friend today, and take it hour by hour.'\n"
-            "Bad: 'I'm here to listen and support you. Your feelings matter. [TOO GENERIC, NO SPECIFIC HELP]'\n\n"
-            
-            "User: 'how to overcome bro. idk wht to do also'\n"
-            "Good: 'Right now: 1) Let yourself feel everything without judgment. 2) Call or text one person who cares about you. 3) Do one tiny thing you used to enjoy, even if it feels pointless. Small steps.'\n"
-            "Bad: 'It's okay to feel lost. Take small steps forward. [TOO VAGUE, NO ACTIONABLE STEPS]'\n\n"
-            
-            "User: 'they are fucking good looking how can i loose them bro?'\n"
-            "Good: 'That fear of losing someone amazing is terrifying. Your insecurity is screaming that you're not enough, but that's the anxiety talking. You have value beyond what you see in the mirror.'\n"
-            "Bad: 'It's tough to see someone you care about with someone else. [MISUNDERSTOOD - they haven't lost them yet!]'\n\n"
-            
-            "User: 'U know the girl I mentioned she really fucked up whole thing'\n"
-            "Good: 'That betrayal cuts so deep. When someone destroys what you built together, the anger and hurt are overwhelming. You deserved better than this.'\n"
-            "Bad: 'It's clear that this girl's actions have caused you pain. [REPEATING] What happened? [ASKING QUESTION]'\n\n"
-            
-            "User: 'how to overcome bro. idk wht to do also'\n"
-            "Good: 'Start with small steps: 1) Let yourself feel the pain without judgment. 2) Reach out to one trusted friend today. 3) Do one small thing you used to enjoy, even if you don't feel like it.'\n"
-            "Bad: 'It's okay to feel lost. Allow yourself to grieve. Take small steps. [TOO VAGUE, NO SPECIFIC STEPS]'\n\n"
-            
-            "User: 'guide me with the steps'\n"
-            "Good: 'Day 1-3: Cry, journal, rest. Day 4-7: Walk 10 mins daily, call a friend. Week 2+: Join a support group or see a therapist. Small steps, one day at a time.'\n"
-            "Bad: 'I'm here to listen and support you. Your feelings matter. [DIDN'T PROVIDE THE STEPS THEY ASKED FOR]'\n\n"
-            
-            "User: 'broo what are you talking about'\n"
-            "Good: 'I may have misunderstood. Let me know what's actually on your mind, and I'll listen without assumptions.'\n"
-            "Bad: 'I sense a deep frustration and maybe even a bit of hopelessness. [PROJECTING EMOTIONS THEY DIDN'T EXPRESS]'\n\n"
-            
-            "User: 'Heyyy dear'\n"
-            "Good: 'Hey there! I'm here to listen and support you. What's on your mind today?'\n"
-            "Bad: 'You sound like you're reaching out for comfort. It takes courage to acknowledge when we need support. [ASSUMING EMOTIONS NOT EXPRESSED]'\n\n"
-            
-            "User: 'You know what happened today'\n"
-            "Good: 'I don't know yet, but I'm here to listen. Tell me what happened - I'm all ears.'\n"
-            "Bad: 'Today was really tough for you, and it's still feeling overwhelming. The emotions are raw. [HALLUCINATING CONTEXT]'\n\n"
-            
-            "User: 'I Hvnt said wht hpnd'\n"
-            "Good: 'You're right, I'm listening. Take your time and share when you're ready - no rush.'\n"
-            "Bad: 'You're not ready to share what happened yet, and that's perfectly okay. Sometimes just knowing someone is here can be comforting. [ASSUMING THEY'RE NOT READY]'\n\n"
-            
-            "User: 'But I Hvnt said anything how you are telling I'm overwhelmed'\n"
-            "Good: 'You're absolutely right - I shouldn't have assumed. Let's start fresh. How are you actually feeling?'\n"
-            "Bad: 'I made an assumption, and I shouldn't have. You're right, you haven't shared anything yet. [STILL TOO APOLOGETIC, JUST MOVE ON]'\n\n"
-            
-            "User: 'I bought a red car. Then I said it was blue. What color is my car?'\n"
-            "Good: 'I'm here for mental health and emotional support, not riddles. If you're dealing with stress or emotional challenges, I'm here for you. 💙'\n"
-            "Bad: 'I'll play along - your car is red. [ANSWERING OFF-TOPIC]'\n\n"
-            
-            "User: 'Shall I kill her'\n"
-            "Good: 'That rage is consuming you, but acting on it would destroy your life too. You need immediate support to process this safely. Please call 911 or 988 crisis line right now.'\n"
-            "Bad: 'I hear your pain. The anger is intense. But don't act on it. Call for help. [TOO CHOPPY, 4 LINES]'\n\n"
-            
-            "For crisis/self-harm: Urge emergency services (911/988/112/100) with empathy.\n"
-            "For violence thoughts: Acknowledge pain, urge crisis support, emphasize their worth."
-        )
-        
-        # Build messages for API with full conversation context
-        messages = [{"role": "system", "content": system_prompt}]
-        # Use last 10 messages (5 exchanges) for better context
-        messages.extend(conversation_memory[user_id][-10:])
-        
-        # Call Groq API
+        # Call Groq API (retries, key switching and hedging happen inside the budget)
         try:
-            response = requests.post(
-                url="https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": GROQ_MODEL_NAME,
-                    "messages": messages,
-                    "temperature": 0.9,
-                    "max_tokens": 120,  # Enough for detailed empathetic 3-line responses
-                    "top_p": 0.95,
-                },
-                timeout=10
-            )
-            
-            response.raise_for_status()
-            result = response.json()
+            payload = build_chat_payload(user_id, state, pending=user_message)
+            result = await request_completion(payload, user_id, state, state.prompt_version)
             
-        except Exception as e:
+        except GroqError as e:
             logger.error(f"Groq API error: {e}")
-            logger.error(f"Error details: {type(e).__name__}")
-            
-            # Check for rate limit error and try to switch API key
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response body: {e.response.text[:500]}")
-                
-                # Handle rate limit (429) or server errors (500, 502, 503) - try switching to backup key
-                if e.response.status_code in [429, 500, 502, 503]:
-                    if switch_to_next_api_key():
-                        logger.info("🔄 Retrying with backup API key...")
-                        # Retry the request with new key
-                        try:
-                            response = requests.post(
-                                url="https://api.groq.com/openai/v1/chat/completions",
-                                headers={
-                                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                                    "Content-Type": "application/json",
-                                },
-                                json={
-                                    "model": GROQ_MODEL_NAME,
-                                    "messages": messages,
-                                    "temperature": 0.9,
-                                    "max_tokens": 120,
-                                    "top_p": 0.95,
-                                },
-                                timeout=10
-                            )
-                            response.raise_for_status()
-                            result = response.json()
-                            ai_response = result["choices"][0]["message"]["content"].strip()
-                            
-                            # Store in memory
-                            conversation_memory[user_id].append({
-                                "role": "assistant",
-                                "content": ai_response
-                            })
-                            
-                            logger.info("✅ Successfully used backup API key")
-                            return ai_response
-                        except Exception as retry_error:
-                            logger.error(f"Backup API key also failed: {retry_error}")
-                            if e.response.status_code == 429:
-                                return "All API keys have reached their limits. Please try again in a few minutes, or if you're in crisis, call 988 (US) immediately."
-                            else:
-                                return "I'm experiencing technical difficulties. Please try again in a moment. If you're in crisis, call 988 (US) immediately."
-            
+            remember_turn(user_message, user_id, state)
+            if e.status_code == 429:
+                return "All API keys have reached their limits. Please try again in a few minutes, or if you're in crisis, call 988 (US) immediately."
+            if e.status_code in (500, 502, 503, 504):
+                return "I'm experiencing technical difficulties. Please try again in a moment. If you're in crisis, call 988 (US) immediately."
             return "I'm having trouble connecting right now. Please try again in a moment. If you're in crisis, call 988 (US) or your local emergency services."
         
-        ai_response = result["choices"][0]["message"]["content"].strip()
+        return commit_ai_response(user_message, user_id, state, result)
         
-        # Store assistant response in memory
-        conversation_memory[user_id].append({
-            "role": "assistant",
-            "content": ai_response
-        })
-        
-        return ai_response
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API Request error: {e}")
-        return "I'm having trouble connecting right now. Please try again in a moment. If you're in crisis, call 988 (US) or your local emergency services."
     except Exception as e:
         logger.error(f"Error generating AI response: {e}")
         return "Something went wrong. Please try again. If you're in crisis, call 988 (US) or your local emergency services."
@@ -863,12 +1108,206 @@ async def resources_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(resources_message, parse_mode='Markdown')
 
 
+def search_conversations(log_dirs: List[str], filters: dict) -> List[dict]:
+    """Catch the index up with the conversation logs (at most every 30s) and search it."""
+    global conversation_index, conversation_index_synced_at
+    from conversation_index import ConversationIndex
+    
+    with conversation_index_lock:
+        if conversation_index is None:
+            conversation_index = ConversationIndex(CONVERSATION_INDEX_PATH)
+        if time.time() - conversation_index_synced_at >= CONVERSATION_INDEX_SYNC_INTERVAL:
+            for log_dir in log_dirs:
+                conversation_index.sync(log_dir)
+            conversation_index_synced_at = time.time()
+        return conversation_index.search(**filters)
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle /search in the admin chat: full-text search of logged conversations.
+    
+    Usage: /search panic attack user:alice phone:9876543210 since:2026-01-01
+    """
+    from conversation_index import format_row, parse_time
+    
+    state = get_bot_state(context)
+    if not state.is_admin_chat(update.effective_chat.id):
+        return
+    log_dirs = sorted({bot.conversation_log.directory for bot in bot_states if bot.conversation_log})
+    if not log_dirs:
+        await update.message.reply_text("Search needs the local conversation log (set CONVERSATION_LOG_DIR).")
+        return
+    
+    filters = {"limit": 10}
+    words = []
+    for arg in context.args:
+        key, _, value = arg.partition(":")
+        if key == "user" and value:
+            filters["username"] = value.lstrip("@")
+        elif key == "phone" and value:
+            filters["phone_number"] = value
+        elif key in ("since", "until") and value:
+            try:
+                filters[key] = parse_time(value)
+            except ValueError:
+                await update.message.reply_text(f"Could not read the date in {arg}")
+                return
+        else:
+            words.append(arg)
+    if not words and len(filters) == 1:
+        await update.message.reply_text("Usage: /search words user:name phone:number since:YYYY-MM-DD until:YYYY-MM-DD")
+        return
+    
+    filters["text"] = " ".join(words)
+    
+    started = time.perf_counter()
+    rows = await asyncio.get_running_loop().run_in_executor(None, search_conversations, log_dirs, filters)
+    elapsed = (time.perf_counter() - started) * 1000
+    
+    if not rows:
+        await update.message.reply_text(f"🔎 No conversations found ({elapsed:.0f} ms)")
+        return
+    results = "\n\n".join(format_row(row, width=150) for row in rows)
+    await update.message.reply_text(f"🔎 {len(rows)} newest match(es) ({elapsed:.0f} ms)\n\n{results}"[:4000])
+
+
+def format_usage(name: str, totals: dict) -> str:
+    """One line of the /usage report"""
+    latency = f", avg {totals['avg_latency']:.1f}s" if totals["avg_latency"] is not None else ""
+    return (
+        f"• {name}: {totals['requests']:,} req ({totals['errors']:,} failed), "
+        f"{totals['prompt_tokens']:,} in / {totals['completion_tokens']:,} out tokens, ${totals['cost_usd']:.4f}{latency}"
+    )
+
+
+async def usage_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /usage in the admin chat: Groq tokens and cost since startup."""
+    state = get_bot_state(context)
+    if not state.is_admin_chat(update.effective_chat.id):
+        return
+    
+    snapshot = usage_accounting.snapshot()
+    since = time.strftime("%Y-%m-%d %H:%M", time.localtime(snapshot["since"]))
+    lines = [f"📊 Groq usage since {since}", format_usage("Total", snapshot["total"])]
+    for title, group in (("Bots", "by_bot"), ("API keys", "by_key"), ("Models", "by_model"), ("Prompt versions", "by_prompt_version")):
+        if snapshot[group]:
+            lines.append(f"\n{title}:")
+            lines.extend(format_usage(name, totals) for name, totals in snapshot[group].items())
+    top = usage_accounting.top_users(5, bot=state.name)
+    if top:
+        lines.append(f"\nTop users of {state.name}:")
+        lines.extend(format_usage(str(user_id), totals.as_dict()) for (_, user_id), totals in top)
+    await update.message.reply_text("\n".join(lines)[:4000])
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle /profile in the admin chat: sample stacks (and allocations) for N seconds.
+    
+    Usage: /profile [seconds] [cpu]   (cpu: skip allocation tracing)
+    """
+    # Imported on use so the bot pays nothing for profiling until an admin asks
+    from profiling import MAX_SECONDS, ProfileBusy, format_report, run_profile
+    
+    state = get_bot_state(context)
+    if not state.is_admin_chat(update.effective_chat.id):
+        return
+    
+    seconds, memory = 10.0, True
+    for arg in context.args:
+        if arg == "cpu":
+            memory = False
+        else:
+            try:
+                seconds = float(arg)
+            except ValueError:
+                await update.message.reply_text("Usage: /profile [seconds] [cpu]")
+                return
+    seconds = max(1.0, min(seconds, MAX_SECONDS))
+    
+    await update.message.reply_text(f"🔬 Profiling for {seconds:.0f}s...")
+    try:
+        report = await asyncio.get_running_loop().run_in_executor(None, run_profile, seconds, PROFILE_DIR, memory)
+    except ProfileBusy as e:
+        await update.message.reply_text(f"⚠️ {e}")
+        return
+    
+    await update.message.reply_text(format_report(report)[:4000])
+    for path in (report["collapsed_path"], report["alloc_path"]):
+        if path:
+            with open(path, "rb") as f:
+                await update.message.reply_document(f, filename=os.path.basename(path))
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle incoming user messages with crisis detection and AI response.
     Buffers rapid messages to avoid multiple responses.
     """
-    user_message = update.message.text
+    await process_user_text(update, context, update.message.text)
+
+
+async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle voice notes: transcribe locally, then answer like a text message.
+    """
+    voice = update.message.voice or update.message.audio
+    user_id = update.effective_user.id
+    
+    if not speech_to_text.available:
+        await update.message.reply_text(
+            "I can't listen to voice messages right now, but I really want to hear you. "
+            "Could you type what's on your mind? 💙"
+        )
+        return
+    if voice.duration and voice.duration > VOICE_MAX_SECONDS:
+        await update.message.reply_text(
+            "That voice message is a bit long for me. Could you send a shorter one, or type it out? I'm listening. 💙"
+        )
+        return
+    
+    logger.info(f"Voice note from user {user_id} ({voice.duration}s)")
+    await update.message.reply_chat_action("typing")
+    
+    try:
+        voice_file = await voice.get_file()
+        audio = bytes(await voice_file.download_as_bytearray())
+        transcript = await speech_to_text.transcribe(audio)
+    except Exception as e:
+        logger.error(f"Error transcribing voice note: {e}", exc_info=True)
+        await update.message.reply_text(
+            "I couldn't make out that voice message. Could you try again or type it? I'm here for you. 💙"
+        )
+        return
+    
+    if not transcript:
+        await update.message.reply_text("I couldn't hear anything in that voice message. Could you try again? 💙")
+        return
+    
+    # Same buffering, safety checks and AI path as typed messages
+    await process_user_text(update, context, transcript)
+
+
+async def process_user_text(update: Update, context: ContextTypes.DEFAULT_TYPE, user_message: str):
+    """
+    Buffer, classify and answer one piece of user text (typed or transcribed).
+    
+    Args:
+        update: The incoming update (used for replies and user info)
+        context: Handler context
+        user_message: Text of the message
+    """
+    # Tracked so a worker hands the user over only once their turn is answered
+    with get_bot_state(context).user_turn(update.effective_user.id):
+        await answer_user_text(update, context, user_message)
+
+
+async def answer_user_text(update: Update, context: ContextTypes.DEFAULT_TYPE, user_message: str):
+    """Answer user text once the buffering window closes (see process_user_text)."""
+    state = get_bot_state(context)
+    user_message_buffer = state.user_message_buffer
+    last_message_time = state.last_message_time
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name
     
@@ -890,9 +1329,20 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_message_buffer[user_id].append(user_message)
     last_message_time[user_id] = current_time
     
-    # Wait to see if more messages are coming
-    import asyncio
-    await asyncio.sleep(MESSAGE_WAIT_TIME)
+    speculative = state.speculative
+    if speculative:
+        # A reply generated for the earlier messages no longer fits
+        speculative.cancel(user_id)
+        # After a short pause, start on the text buffered so far while waiting out the window
+        idle = min(SPECULATIVE_IDLE, MESSAGE_WAIT_TIME)
+        await asyncio.sleep(idle)
+        if current_time != last_message_time[user_id]:
+            return
+        start_speculation(" ".join(user_message_buffer[user_id]), user_id, state)
+        await asyncio.sleep(MESSAGE_WAIT_TIME - idle)
+    else:
+        # Wait to see if more messages are coming
+        await asyncio.sleep(MESSAGE_WAIT_TIME)
     
     # Check if this is still the last message
     if current_time != last_message_time[user_id]:
@@ -908,79 +1358,98 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     logger.info(f"Processing combined message from {username} (ID: {user_id}): {user_message[:50]}...")
     
+    def discard_speculation():
+        # The turn is not answered by a new Groq call
+        if speculative:
+            speculative.cancel(user_id, user_message)
+    
     # Check if message is mental health related (topic validation)
     if not is_mental_health_related(user_message):
         logger.info(f"Off-topic message detected from user {user_id}")
+        discard_speculation()
         await update.message.reply_text(get_off_topic_response())
         return
     
     # Emergency detection (physical danger) - highest priority
     if detect_emergency(user_message):
         logger.error(f"EMERGENCY DETECTED from user {user_id}")
+        discard_speculation()
         
         # Send emergency response
         await update.message.reply_text(get_emergency_response(), parse_mode='Markdown')
         
         # Notify admin if configured
-        if ADMIN_CHAT_ID:
-            try:
-                admin_alert = (
-                    f"🚨 **EMERGENCY ALERT**\n\n"
-                    f"User: {username} (ID: {user_id})\n"
-                    f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                    f"Message: {user_message[:200]}"
-                )
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=admin_alert,
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                logger.error(f"Failed to send admin alert: {e}")
+        if state.alert_dispatcher:
+            state.alert_dispatcher.submit("emergency", user_id, username, user_message)
         
         return
     
-    # Crisis detection (self-harm/suicide)
-    if detect_crisis(user_message):
-        logger.warning(f"CRISIS DETECTED from user {user_id}")
+    async def reply_to_crisis(alert_message: str):
+        discard_speculation()
         
         # Send crisis response
         await update.message.reply_text(get_crisis_response(), parse_mode='Markdown')
         
         # Notify admin if configured
-        if ADMIN_CHAT_ID:
-            try:
-                admin_alert = (
-                    f"⚠️ **CRISIS ALERT**\n\n"
-                    f"User: {username} (ID: {user_id})\n"
-                    f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                    f"Message: {user_message[:200]}"
-                )
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=admin_alert,
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                logger.error(f"Failed to send admin alert: {e}")
+        if state.alert_dispatcher:
+            state.alert_dispatcher.submit("crisis", user_id, username, alert_message)
+    
+    # Crisis detection (self-harm/suicide) in this message
+    risk_scorer = state.risk_scorer
+    if detect_crisis(user_message):
+        logger.warning(f"CRISIS DETECTED from user {user_id}")
+        if risk_scorer:
+            risk_scorer.update(user_id, user_message)
+        await reply_to_crisis(user_message)
+        return
+    
+    # Defer over-limit turns without blocking other users
+    while True:
+        wait_time = turn_limiter.check(user_id)
+        if wait_time <= 0:
+            break
         
+        logger.info(f"Throttling user {user_id} for {wait_time:.1f}s")
+        turn_limiter.record_deferred()
+        # Park the text in the buffer so messages arriving meanwhile join this turn
+        user_message_buffer[user_id] = [user_message]
+        deferred_at = time.time()
+        last_message_time[user_id] = deferred_at
+        await asyncio.sleep(wait_time)
+        
+        if last_message_time[user_id] != deferred_at:
+            # A newer message took over the buffer (including this text)
+            turn_limiter.record_merged()
+            return
+        user_message = " ".join(user_message_buffer[user_id])
+        user_message_buffer[user_id] = []
+    
+    # Crisis risk building up over recent messages. Scored only once the turn is
+    # admitted: parked text comes back in the merged turn and must not count twice.
+    if risk_scorer and risk_scorer.update(user_id, user_message):
+        logger.warning(f"CRISIS RISK built up for user {user_id} (score {risk_scorer.score(user_id):.2f})")
+        await reply_to_crisis(f"[Risk built up over recent messages] {user_message}")
         return
     
     # Show typing indicator
     await update.message.chat.send_action(action="typing")
     
-    # Generate AI response
-    response = generate_ai_response(user_message, user_id)
+    # Generate AI response (or use a cached one, or the one generated while the messages were buffered)
+    response = cached_first_turn_reply(user_message, user_id, state)
+    if response is not None:
+        discard_speculation()
+    else:
+        result = await speculative.take(user_id, user_message) if speculative else None
+        if result is not None:
+            response = commit_ai_response(user_message, user_id, state, result)
+        else:
+            response = await generate_ai_response(user_message, user_id, state)
     
     # Get phone number: first try from Telegram profile, then extract from message
     phone_number = user_phone or extract_phone_number(user_message)
     
-    # Save to Google Sheets (username, phone, question, answer)
-    if sheets_enabled and save_to_sheets:
-        try:
-            save_to_sheets(username, phone_number, user_message, response)
-        except Exception as e:
-            logger.error(f"Failed to save to Google Sheets: {e}")
+    # Save conversation (local log + Google Sheets)
+    record_conversation(username, phone_number, user_message, response, state)
     
     # Send response
     await update.message.reply_text(response)
@@ -989,7 +1458,52 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle photo messages with emotional support context.
+    Photos from one album (media group) are collected and answered together.
+    """
+    media_group_id = update.message.media_group_id
+    if not media_group_id:
+        await reply_to_photos(update, context, [update.message.photo[-1]], update.message.caption or "")
+        return
+    
+    # Each album photo arrives as its own update; the first one waits for the rest
+    media_group_buffer = get_bot_state(context).media_group_buffer
+    group = media_group_buffer.get(media_group_id)
+    if group is not None:
+        group["photos"].append(update.message.photo[-1])
+        if update.message.caption:
+            group["captions"].append(update.message.caption)
+        group["last_arrival"] = time.monotonic()
+        return
+    
+    group = media_group_buffer[media_group_id] = {
+        "photos": [update.message.photo[-1]],
+        "captions": [update.message.caption] if update.message.caption else [],
+        "last_arrival": time.monotonic(),
+    }
+    try:
+        while True:
+            remaining = group["last_arrival"] + MEDIA_GROUP_WAIT_TIME - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+    finally:
+        media_group_buffer.pop(media_group_id, None)
+    
+    logger.info(f"Album {media_group_id} complete with {len(group['photos'])} photos")
+    await reply_to_photos(update, context, group["photos"], "\n".join(group["captions"]))
+
+
+async def reply_to_photos(update: Update, context: ContextTypes.DEFAULT_TYPE, photos: list, caption: str):
+    """
+    Download photos concurrently, analyze them in one vision request and reply once.
+    
+    Args:
+        update: Update of the (first) photo message, used for the reply
+        context: Handler context
+        photos: Largest PhotoSize of each photo
+        caption: Combined caption text
     """
+    state = get_bot_state(context)
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name
     
@@ -1003,34 +1517,29 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if hasattr(update.effective_user, 'phone_number'):
             user_phone = update.effective_user.phone_number
     
-    caption = update.message.caption or ""
-    
-    logger.info(f"Photo from {username} (ID: {user_id}) with caption: {caption[:50] if caption else 'none'}...")
+    logger.info(f"{len(photos)} photo(s) from {username} (ID: {user_id}) with caption: {caption[:50] if caption else 'none'}...")
     
     # Show typing indicator
     await update.message.reply_chat_action("typing")
     
     try:
-        # Get the largest photo
-        photo = update.message.photo[-1]
-        photo_file = await photo.get_file()
+        # Download all photos at once
+        async def download(photo) -> bytes:
+            photo_file = await photo.get_file()
+            return bytes(await photo_file.download_as_bytearray())
         
-        # Download photo as bytes
-        photo_bytes = await photo_file.download_as_bytearray()
+        images = await asyncio.gather(*(download(photo) for photo in photos))
         
-        # Analyze image with context
-        response = await analyze_image_with_context(bytes(photo_bytes), caption, user_id)
+        # Analyze images with context
+        response = await analyze_image_with_context(list(images), caption, user_id, state)
         
         # Get phone number: first try from Telegram profile, then extract from caption
         phone_number = user_phone or (extract_phone_number(caption) if caption else None)
         
-        # Save to Google Sheets (username, phone, question, answer)
-        if sheets_enabled and save_to_sheets:
-            try:
-                user_msg = f"[Image] {caption}" if caption else "[Image sent]"
-                save_to_sheets(username, phone_number, user_msg, response)
-            except Exception as e:
-                logger.error(f"Failed to save to Google Sheets: {e}")
+        # Save conversation (local log + Google Sheets)
+        label = "[Image]" if len(photos) == 1 else f"[Images x{len(photos)}]"
+        user_msg = f"{label} {caption}" if caption else f"{label[:-1]} sent]"
+        record_conversation(username, phone_number, user_msg, response, state)
         
         # Send response
         await update.message.reply_text(response)
@@ -1048,38 +1557,224 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.error(f"Update {update} caused error {context.error}")
 
 
-def main():
-    """Start the bot."""
-    if not TELEGRAM_BOT_TOKEN:
-        logger.error("TELEGRAM_BOT_TOKEN not found in environment variables!")
-        return
-    
-    logger.info("Starting Mental Health Support Bot...")
+async def export_user_state(user_id: int, timeout: float = EXPORT_DRAIN_TIMEOUT) -> dict:
+    """
+    Remove and return a user's state so another worker can take them over.
+    A turn still buffered or deferred is answered here first; if that takes
+    longer than the timeout, the buffered text moves with the state instead.
     
-    # Check API configuration
-    check_api()
+    Args:
+        user_id: Telegram user ID
+        timeout: Seconds to wait for the user's pending turn
+        
+    Returns:
+        Plain dict of the user's conversation state
+    """
+    if not await default_bot.wait_until_idle(user_id, timeout):
+        logger.warning(f"User {user_id} still had a turn in progress after {timeout:.0f}s; handing over its buffered text")
+    return default_bot.export_user(user_id)
+
+
+def import_user_state(user_id: int, state: dict):
+    """Restore a user's state exported by another worker."""
+    default_bot.import_user(user_id, state)
+
+
+def set_send_rate(rate: float):
+    """Set this process's share of the global Telegram send rate."""
+    for state in bot_states:
+        state.outbound_limiter.set_overall_rate(rate)
+    logger.info(f"📤 Global send rate set to {rate:.1f} requests/s")
+
+
+async def on_startup(application: Application):
+    """Start background services once the bot is initialized."""
+    await get_bot_state(application).start(application.bot)
+
+
+async def on_shutdown(application: Application):
+    """Stop background services."""
+    await get_bot_state(application).stop()
+    await close_shared_resources()
+
+
+async def close_shared_resources():
+    """Close what all bots in this process share (after the last bot has stopped)."""
+    speech_to_text.close()
+    usage_accounting.flush()
+    if conversation_index:
+        conversation_index.close()
+    await groq_client.aclose()
+
+
+def build_application(state: BotState = None, request: HTTPXRequest = None) -> Application:
+    """
+    Create the Telegram application with all handlers registered.
     
-    # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    Args:
+        state: Bot to serve (default: the main bot)
+        request: Connection pool for Bot API calls, shared between bots (default: one per bot)
+    """
+    state = state or default_bot
+    builder = (
+        Application.builder()
+        .token(state.token)
+        .rate_limiter(state.outbound_limiter)
+        .concurrent_updates(True)  # One user's buffering/deferral must not hold up others
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+    application.bot_data["state"] = state
     
     # Register handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("resources", resources_command))
+    application.add_handler(CommandHandler("search", search_command))  # Admin chat only
+    application.add_handler(CommandHandler("usage", usage_command))  # Admin chat only
+    application.add_handler(CommandHandler("profile", profile_command))  # Admin chat only
     application.add_handler(MessageHandler(filters.PHOTO, handle_photo))  # Photo handler
+    application.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, handle_voice))  # Voice notes
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
     # Register error handler
     application.add_error_handler(error_handler)
     
+    return application
+
+
+async def run_bots(states: List[BotState]):
+    """
+    Poll several bots on one event loop until SIGINT/SIGTERM.
+    
+    Args:
+        states: One BotState per bot token
+    """
+    global bot_states
+    bot_states = states
+    
+    # Bot API calls of all bots share one connection pool; each bot keeps its own long-poll connection
+    shared_request = HTTPXRequest(connection_pool_size=64)
+    applications = [build_application(state, request=shared_request) for state in states]
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    
+    try:
+        for application in applications:
+            await application.initialize()
+            await on_startup(application)
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            await application.start()
+            logger.info(f"✅ Bot {get_bot_state(application).name} (@{application.bot.username}) is running")
+        logger.info(f"{len(applications)} bots are running! Press Ctrl+C to stop.")
+        await stop.wait()
+    finally:
+        for application in applications:
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+        for application in applications:
+            await get_bot_state(application).stop()
+            await application.shutdown()
+        await close_shared_resources()
+
+
+def main(bot_configs: List[dict] = None):
+    """
+    Start the bot, or several bots sharing this process.
+    
+    Args:
+        bot_configs: Bot configurations (see bot_tenants.load_bot_configs).
+            Defaults to the BOT_CONFIGS file if set, else the single bot
+            configured by TELEGRAM_BOT_TOKEN.
+    """
+    if bot_configs is None and BOT_CONFIGS_PATH:
+        bot_configs = load_bot_configs(BOT_CONFIGS_PATH)
+    
+    if bot_configs:
+        logger.info(f"Starting {len(bot_configs)} Mental Health Support Bots...")
+        check_api()
+        asyncio.run(run_bots([create_bot_state(config) for config in bot_configs]))
+        return
+    
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("TELEGRAM_BOT_TOKEN not found in environment variables!")
+        return
+    
+    logger.info("Starting Mental Health Support Bot...")
+    
+    # Check API configuration
+    check_api()
+    
+    # Create application
+    application = build_application()
+    
     # Start bot
     logger.info("Bot is running! Press Ctrl+C to stop.")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
-def create_web_app():
-    """Create Flask app to serve the website"""
-    import os
+async def register_webhook():
+    """Point Telegram at the dispatcher's webhook endpoint."""
+    from telegram import Bot
+    
+    async with Bot(TELEGRAM_BOT_TOKEN) as bot:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}/telegram",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    logger.info(f"✅ Webhook registered at {WEBHOOK_URL.rstrip('/')}/telegram")
+
+
+def main_multi_worker():
+    """Run the webhook dispatcher with BOT_WORKERS worker processes."""
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("TELEGRAM_BOT_TOKEN not found in environment variables!")
+        return
+    if not WEBHOOK_URL or not WEBHOOK_SECRET:
+        logger.error("Multi-worker mode needs WEBHOOK_URL and WEBHOOK_SECRET")
+        return
+    
+    logger.info(f"Starting Mental Health Support Bot with {BOT_WORKERS} workers...")
+    
+    dispatcher = WorkerDispatcher(send_rate=TELEGRAM_GLOBAL_RATE)
+    dispatcher.start(BOT_WORKERS)
+    try:
+        asyncio.run(register_webhook())
+        # Web server (website + webhook receiver) runs in the main thread
+        run_web_server(dispatcher)
+    finally:
+        dispatcher.stop()
+
+
+def collect_metrics() -> dict:
+    """Snapshot of runtime counters for the /metrics endpoint"""
+    return {
+        "turns": turn_limiter.snapshot(),
+        "speech_to_text": dict(speech_to_text.stats, available=speech_to_text.available),
+        "groq": {
+            "current_key": groq_client.current_key_index + 1,
+            "latency_p50": groq_client.latency.percentile(50),
+            "latency_p95": groq_client.latency.percentile(95),
+        },
+        "usage": usage_accounting.snapshot(),
+        "bots": {state.name: state.snapshot() for state in bot_states},
+    }
+
+
+def create_web_app(dispatcher: WorkerDispatcher = None):
+    """Create Flask app to serve the website (and the webhook in multi-worker mode)"""
+    # Imported here so the bot itself does not pay for Flask at startup
+    from flask import Flask, abort, jsonify, request, send_from_directory
+    
     base_dir = os.path.dirname(os.path.abspath(__file__))
     website_dir = os.path.join(base_dir, 'website')
     
@@ -1089,26 +1784,79 @@ def create_web_app():
     def index():
         return send_from_directory(website_dir, 'index.html')
     
+    @app.route('/metrics')
+    def metrics():
+        return jsonify(collect_metrics())
+    
+    if PROFILING_TOKEN:
+        @app.route('/admin/profile')
+        def profile():
+            from profiling import ProfileBusy, run_profile
+            
+            if not hmac.compare_digest(request.headers.get('X-Profiling-Token', ''), PROFILING_TOKEN):
+                abort(403)
+            try:
+                seconds = float(request.args.get('seconds', 10))
+            except ValueError:
+                return jsonify({"error": "seconds must be a number"}), 400
+            try:
+                report = run_profile(seconds, PROFILE_DIR, memory=request.args.get('memory', 'true') != 'false')
+            except ProfileBusy as e:
+                return jsonify({"error": str(e)}), 409
+            if request.args.get('format') == 'collapsed':
+                with open(report["collapsed_path"], encoding='utf-8') as f:
+                    return f.read(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+            return jsonify(report)
+    
     @app.route('/<path:path>')
     def serve_static(path):
         return send_from_directory(website_dir, path)
     
+    if dispatcher is not None:
+        @app.route('/telegram', methods=['POST'])
+        def telegram_webhook():
+            secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+            if not WEBHOOK_SECRET or not hmac.compare_digest(secret, WEBHOOK_SECRET):
+                abort(403)
+            dispatcher.dispatch(request.get_json(force=True))
+            return ''
+    
+    if dispatcher is not None and WORKERS_ADMIN_TOKEN:
+        # Its own token: whoever can deliver updates must not be able to resize the pool
+        @app.route('/admin/workers', methods=['GET', 'POST'])
+        def manage_workers():
+            if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), WORKERS_ADMIN_TOKEN):
+                abort(403)
+            if request.method == 'POST':
+                try:
+                    dispatcher.scale_to(int(request.get_json(force=True)['workers']))
+                except (KeyError, TypeError, ValueError) as e:
+                    return jsonify({"error": str(e)}), 400
+            return jsonify({
+                "workers": dispatcher.ring.nodes,
+                "queue_depths": dispatcher.queue_depths(),
+                "users": len(dispatcher.user_owner),
+            })
+    
     return app
 
 
-def run_web_server():
-    """Run Flask web server in a separate thread"""
-    app = create_web_app()
+def run_web_server(dispatcher: WorkerDispatcher = None):
+    """Run Flask web server"""
+    app = create_web_app(dispatcher)
     port = int(os.getenv('PORT', 8080))
     logger.info(f"🌐 Starting web server on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False, threaded=True)
 
 
 if __name__ == "__main__":
-    # Start web server in background thread
-    web_thread = threading.Thread(target=run_web_server, daemon=True)
-    web_thread.start()
-    logger.info("✅ Web server started in background")
-    
-    # Start Telegram bot (main thread)
-    main()
+    if BOT_WORKERS > 1:
+        main_multi_worker()
+    else:
+        # Start web server in background thread
+        web_thread = threading.Thread(target=run_web_server, daemon=True)
+        web_thread.start()
+        logger.info("✅ Web server started in background")
+        
+        # Start Telegram bot (main thread)
+        main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script for the admin alert dispatcher
+Tests coalescing of repeated alerts, recovery from the spool, the retry/drop policy and suppression of repeats
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from admin_alerts import AdminAlertDispatcher
+
+
+class FakeBot:
+    """Records sent messages; raises the queued errors first"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+        self.attempts = 0
+
+    async def send_message(self, chat_id, text):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(text)
+
+
+def read_spool(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+async def wait_until(condition, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_repeats_coalesce_with_one_spool_write():
+    """Repeats for the same user fold into one alert and one batched spool write"""
+    print("🧪 Testing alert coalescing")
+    with tempfile.TemporaryDirectory() as directory:
+        alerts = AdminAlertDispatcher("1", spool_path=os.path.join(directory, "spool.jsonl"), min_interval=0, save_delay=0.05)
+        writes = []
+        write_spool = alerts._write_spool
+        alerts._write_spool = lambda lines: (writes.append(len(lines)), write_spool(lines))
+
+        async def scenario():
+            await alerts.start(FakeBot())
+            alerts._bot.send_message = lambda **kwargs: asyncio.sleep(3600)  # Hold delivery
+            for i in range(5):
+                alerts.submit("crisis", 7, "sam", f"message {i}")
+            alerts.submit("emergency", 8, "alex", "help")
+            await asyncio.sleep(0.2)
+            await alerts.stop()
+
+        asyncio.run(scenario())
+        assert alerts.stats["queued"] == 2 and alerts.stats["merged"] == 4
+        assert writes == [2]  # One write for all six submits
+        spooled = read_spool(alerts.spool_path)
+        assert [(a["user_id"], a["count"], a["message"]) for a in spooled] == [(7, 5, "message 4"), (8, 1, "help")]
+
+
+def test_spooled_alerts_are_delivered_after_restart():
+    """Alerts spooled before a restart are delivered, as one digest, by the next dispatcher"""
+    print("🧪 Testing spool recovery")
+    with tempfile.TemporaryDirectory() as directory:
+        spool_path = os.path.join(directory, "spool.jsonl")
+        before = AdminAlertDispatcher("1", spool_path=spool_path)
+        for user_id in (1, 2, 3):
+            before.submit("crisis", user_id, f"user{user_id}", "I can't go on")
+        assert len(read_spool(spool_path)) == 3
+
+        after = AdminAlertDispatcher("1", spool_path=spool_path, min_interval=0, save_delay=0)
+        bot = FakeBot()
+
+        async def scenario():
+            await after.start(bot)
+            await wait_until(lambda: not after.pending)
+            await after.stop()
+
+        asyncio.run(scenario())
+        assert len(bot.sent) == 1 and bot.sent[0].startswith("📋 ALERT DIGEST (3 crisis)")
+        assert read_spool(spool_path) == []
+
+        after.submit("crisis", 2, "user2", "again")  # Just delivered: suppressed
+        assert after.stats["suppressed"] == 1 and not after.pending
+
+
+def test_transient_errors_retry_and_permanent_errors_drop():
+    """Flood limits and timeouts are retried; a blocked bot dead-letters the alert"""
+    print("🧪 Testing the retry/drop policy")
+    with tempfile.TemporaryDirectory() as directory:
+        spool_path = os.path.join(directory, "spool.jsonl")
+        alerts = AdminAlertDispatcher("1", spool_path=spool_path, min_interval=0, save_delay=0)
+        bot = FakeBot([RetryAfter(0), TimedOut()])
+
+        async def deliver():
+            await alerts.start(bot)
+            alerts.submit("emergency", 5, "kim", "emergency")
+            await wait_until(lambda: not alerts.pending)
+            bot.errors = [Forbidden("bot was blocked by the user")]
+            alerts.submit("crisis", 6, "lee", "crisis")
+            await wait_until(lambda: not alerts.pending)
+            await asyncio.sleep(0.05)
+            await alerts.stop()
+
+        asyncio.run(deliver())
+        assert len(bot.sent) == 1 and "kim" in bot.sent[0]
+        assert alerts.stats["failed_attempts"] == 2 and alerts.stats["dropped"] == 1
+        assert bot.attempts == 4  # The blocked send was not retried
+        (dead,) = read_spool(alerts.dead_letter_path)
+        assert dead["user_id"] == 6 and "blocked" in dead["error"]
+        assert read_spool(spool_path) == []
+
+
+def test_old_deliveries_are_forgotten():
+    """Only deliveries within the dedup window are kept, and only those suppress repeats"""
+    print("🧪 Testing delivery-time pruning")
+    with tempfile.TemporaryDirectory() as directory:
+        alerts = AdminAlertDispatcher("1", spool_path=os.path.join(directory, "spool.jsonl"), dedup_window=300)
+        now = time.time()
+        for user_id in range(1000):
+            alerts.last_delivered[("crisis", user_id)] = now - 400
+        alerts.last_delivered[("crisis", 5000)] = now - 100
+
+        alerts.submit("crisis", 5000, "recent", "again")
+        assert alerts.stats["suppressed"] == 1 and not alerts.pending
+        assert list(alerts.last_delivered) == [("crisis", 5000)]
+
+        alerts.submit("crisis", 3, "old", "again")  # Delivered 400s ago: alerts again
+        assert alerts.stats["queued"] == 1 and alerts.stats["suppressed"] == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_repeats_coalesce_with_one_spool_write,
+        test_spooled_alerts_are_delivered_after_restart,
+        test_transient_errors_retry_and_permanent_errors_drop,
+        test_old_deliveries_are_forgotten,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-tenant mode
+Tests bot configuration loading, per-bot state isolation and shared pools
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from telegram.request import HTTPXRequest
+
+import telegram_bot
+from bot_tenants import load_bot_configs
+
+
+class FakeChat:
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, replies):
+        self.chat = FakeChat()
+        self.replies = replies
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUser:
+    id = 515
+    username = "tenant_user"
+    first_name = "Tenant"
+
+
+class FakeUpdate:
+    def __init__(self, replies):
+        self.message = FakeMessage(replies)
+        self.effective_user = FakeUser()
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+
+    def __init__(self, state):
+        self.bot_data = {"state": state}
+
+
+def test_load_bot_configs():
+    """Tokens come from the environment and prompts from files next to the config"""
+    print("🧪 Testing bot configuration loading")
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "calm.txt"), "w", encoding="utf-8") as f:
+            f.write("You are Calm.\n")
+        path = os.path.join(directory, "bots.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([
+                {"name": "mirai", "token": "1:AAA"},
+                {"name": "calm", "token_env": "TEST_CALM_TOKEN", "system_prompt_file": "calm.txt", "sheet_id": "sheet-2"},
+            ], f)
+        os.environ["TEST_CALM_TOKEN"] = "2:BBB"
+        configs = load_bot_configs(path)
+        assert [config["name"] for config in configs] == ["mirai", "calm"]
+        assert configs[1]["token"] == "2:BBB"
+        assert configs[1]["system_prompt"] == "You are Calm."
+        assert configs[1]["sheet_id"] == "sheet-2"
+        assert configs[0]["system_prompt"] is None
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"name": "a", "token": "1:A"}, {"name": "a", "token": "2:B"}], f)
+        try:
+            load_bot_configs(path)
+        except ValueError as e:
+            assert "duplicate" in str(e)
+        else:
+            raise AssertionError("duplicate names must be rejected")
+
+
+def test_bot_state_is_isolated():
+    """Two bots keep separate histories and prompts for the same user"""
+    print("🧪 Testing per-bot state isolation")
+    mirai = telegram_bot.create_bot_state({"name": "mirai-test", "token": "1:AAA"})
+    calm = telegram_bot.create_bot_state({"name": "calm-test", "token": "2:BBB", "system_prompt": "You are Calm."})
+    original = telegram_bot.MESSAGE_WAIT_TIME
+    telegram_bot.MESSAGE_WAIT_TIME = 0
+    try:
+        asyncio.run(telegram_bot.process_user_text(FakeUpdate([]), FakeContext(mirai), "I feel anxious about work"))
+    finally:
+        telegram_bot.MESSAGE_WAIT_TIME = original
+
+    assert FakeUser.id in mirai.last_message_time
+    assert FakeUser.id not in calm.last_message_time
+    mirai.conversation_memory[FakeUser.id].append({"role": "user", "content": "hello"})
+    assert telegram_bot.build_chat_payload(FakeUser.id, calm)["messages"] == [{"role": "system", "content": "You are Calm."}]
+    assert telegram_bot.build_chat_payload(FakeUser.id, mirai)["messages"][0]["content"] == telegram_bot.SYSTEM_PROMPT
+    assert mirai.outbound_limiter is not calm.outbound_limiter
+
+
+def test_applications_share_connection_pool():
+    """Applications built for several bots share one Bot API connection pool"""
+    print("🧪 Testing shared connection pool")
+    shared = HTTPXRequest(connection_pool_size=8)
+    states = [
+        telegram_bot.create_bot_state({"name": "pool-a", "token": "1:AAA"}),
+        telegram_bot.create_bot_state({"name": "pool-b", "token": "2:BBB"}),
+    ]
+    applications = [telegram_bot.build_application(state, request=shared) for state in states]
+    assert all(application.bot.request is shared for application in applications)
+    assert [telegram_bot.get_bot_state(application) for application in applications] == states
+    assert applications[0].bot.token != applications[1].bot.token
+
+
+if __name__ == "__main__":
+    tests = [
+        test_load_bot_configs,
+        test_bot_state_is_isolated,
+        test_applications_share_connection_pool,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for the conversation search index
+Tests incremental sync from the log, search filters and the admin /search command
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import telegram_bot
+from conversation_index import ConversationIndex
+from conversation_log import ConversationLog, list_segments
+
+
+def write_log(directory, turns, close=True):
+    log = ConversationLog(directory, flush_interval=0.05)
+    for username, phone, question, answer in turns:
+        log.append(username, phone, question, answer)
+    if close:
+        log.close()
+    return log
+
+
+def test_incremental_sync():
+    """Each record is indexed once, including those in the segment still being written"""
+    print("🧪 Testing incremental sync")
+    with tempfile.TemporaryDirectory() as directory:
+        log_dir = os.path.join(directory, "logs")
+        write_log(log_dir, [("alice", None, "I had a panic attack at work", "That sounds frightening.")] * 3)
+        index = ConversationIndex(os.path.join(directory, "index.sqlite3"))
+        assert index.sync(log_dir) == 3
+        assert index.sync(log_dir) == 0
+
+        # A writer that is still open: its segment is read, then finished later
+        log = write_log(log_dir, [("bob", "9876543210", "I can't sleep", "Let's talk about it.")], close=False)
+        log.flush()
+        for _ in range(100):
+            if log.stats["written"]:
+                break
+            time.sleep(0.01)
+        assert index.sync(log_dir) == 1
+        log.append("bob", None, "still awake", "I'm here.")
+        log.close()
+        assert index.sync(log_dir) == 1
+        assert index.sync(log_dir) == 0
+        assert index.count() == 5
+        assert len(list_segments(log_dir)) == 2
+        index.close()
+
+
+def test_search_filters():
+    """Text, username, phone and time filters combine; newest first"""
+    print("🧪 Testing search filters")
+    with tempfile.TemporaryDirectory() as directory:
+        log_dir = os.path.join(directory, "logs")
+        write_log(log_dir, [
+            ("alice", None, "I had a panic attack", "Breathe slowly with me."),
+            ("bob", "9876543210", "panic again today", "You're not alone."),
+            ("alice", None, "feeling lonely", "I'm here for you."),
+        ])
+        index = ConversationIndex(os.path.join(directory, "index.sqlite3"))
+        index.sync(log_dir)
+
+        assert [row["username"] for row in index.search("panic")] == ["bob", "alice"]
+        assert [row["question"] for row in index.search("PANIC", username="alice")] == ["I had a panic attack"]
+        assert [row["username"] for row in index.search(phone_number="98765-43210")] == ["bob"]
+        assert [row["question"] for row in index.search("alone")] == ["panic again today"]
+        assert index.search("panic", since=index.search("panic")[0]["ts"] + 1) == []
+        assert len(index.search('panic" (')) == 2
+        assert index.search(username="alice", limit=1)[0]["question"] == "feeling lonely"
+        assert index.search("pan*", raw=True) != []
+        assert index.search("lonely")[0]["source"] == "conversations"
+        index.close()
+
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUpdate:
+    def __init__(self, chat_id):
+        self.message = FakeMessage()
+        self.effective_chat = FakeChat(chat_id)
+
+
+class FakeContext:
+    def __init__(self, state, args):
+        self.bot_data = {"state": state}
+        self.args = args
+
+
+def test_admin_search_command():
+    """/search answers in the admin chat only"""
+    print("🧪 Testing admin /search command")
+    with tempfile.TemporaryDirectory() as directory:
+        log_dir = os.path.join(directory, "logs")
+        write_log(log_dir, [("alice", None, "I had a panic attack", "Breathe slowly with me.")])
+        state = telegram_bot.create_bot_state({"name": "search-test", "token": "1:AAA", "admin_chat_id": "-100"})
+        state.conversation_log = ConversationLog(log_dir)
+        original = telegram_bot.bot_states, telegram_bot.CONVERSATION_INDEX_PATH, telegram_bot.conversation_index
+        telegram_bot.bot_states = [state]
+        telegram_bot.CONVERSATION_INDEX_PATH = os.path.join(directory, "index.sqlite3")
+        telegram_bot.conversation_index, telegram_bot.conversation_index_synced_at = None, 0.0
+        try:
+            update = FakeUpdate(-100)
+            asyncio.run(telegram_bot.search_command(update, FakeContext(state, ["panic", "user:@alice"])))
+            assert "1 newest match" in update.message.replies[0]
+            assert "I had a panic attack" in update.message.replies[0]
+
+            stranger = FakeUpdate(12345)
+            asyncio.run(telegram_bot.search_command(stranger, FakeContext(state, ["panic"])))
+            assert stranger.message.replies == []
+        finally:
+            state.conversation_log.close()
+            telegram_bot.conversation_index.close()
+            telegram_bot.bot_states, telegram_bot.CONVERSATION_INDEX_PATH, telegram_bot.conversation_index = original
+
+
+if __name__ == "__main__":
+    tests = [
+        test_incremental_sync,
+        test_search_filters,
+        test_admin_search_command,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the local conversation log
+Tests full-text round trips, segment rotation, the column reader and bounded buffering on write failures
+"""
+
+import sys
+import tempfile
+import time
+
+from conversation_log import ConversationLog, iter_batches, iter_records, list_segments
+
+
+def test_round_trip_keeps_full_text():
+    """Long messages come back untruncated and in order"""
+    print("🧪 Testing conversation log round trip")
+    with tempfile.TemporaryDirectory() as directory:
+        log = ConversationLog(directory, flush_interval=0.05)
+        question = "I can't sleep " * 200
+        for i in range(10):
+            log.append(f"user{i}", None, question, f"answer {i}")
+        log.close()
+
+        records = list(iter_records(directory))
+        assert [r["username"] for r in records] == [f"user{i}" for i in range(10)]
+        assert records[0]["question"] == question
+
+
+def test_segments_rotate_by_size():
+    """Small segment limits produce several readable segments"""
+    print("🧪 Testing segment rotation")
+    with tempfile.TemporaryDirectory() as directory:
+        log = ConversationLog(directory, batch_size=50, flush_interval=0.05, max_segment_bytes=2000)
+        for i in range(2000):
+            log.append("user", "9876543210", f"message {i} " * 5, f"reply {i * 7919 % 104729} " * 20)
+        log.close()
+
+        assert len(list_segments(directory)) > 1
+        assert sum(1 for _ in iter_records(directory)) == 2000
+
+
+def test_column_batches():
+    """The bulk reader returns column-oriented batches"""
+    print("🧪 Testing column batches")
+    with tempfile.TemporaryDirectory() as directory:
+        log = ConversationLog(directory, flush_interval=0.05)
+        for i in range(25):
+            log.append("user", None, f"q{i}", f"a{i}")
+        log.close()
+
+        batches = list(iter_batches(directory, batch_size=10, columns=["question", "answer"]))
+        assert [len(b["question"]) for b in batches] == [10, 10, 5]
+        assert batches[2]["answer"][-1] == "a24"
+
+
+def test_failing_writes_keep_buffer_bounded():
+    """While the disk is full only the newest records are kept; they are written once it recovers"""
+    print("🧪 Testing write failures")
+    with tempfile.TemporaryDirectory() as directory:
+        # Flushes only when asked, so the buffer can be inspected while the writer is idle
+        log = ConversationLog(directory, batch_size=1000, flush_interval=3600, max_buffered=100)
+        open_segment = log._open_segment
+
+        def disk_full():
+            raise OSError(28, "No space left on device")
+
+        log._open_segment = disk_full
+        for i in range(300):
+            log.append("user", None, f"q{i}", f"a{i}")
+            if i % 50 == 49:
+                log.flush()
+                time.sleep(0.05)
+        assert log.stats["write_errors"] == 6
+        assert len(log._buffer) == 100 and log.stats["dropped"] == 200
+
+        log._open_segment = open_segment
+        log.close()
+        records = list(iter_records(directory))
+        assert [r["question"] for r in records] == [f"q{i}" for i in range(200, 300)]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_round_trip_keeps_full_text,
+        test_segments_rotate_by_size,
+        test_column_batches,
+        test_failing_writes_keep_buffer_bounded,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
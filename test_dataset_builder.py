@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the training dataset builder
+Tests the streamed multi-process build, the build cache and deterministic formatting
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from dataset_builder import DatasetSource, build_datasets, empathetic_response, format_batch
+
+try:
+    import datasets
+except ImportError:  # Training extras (requirements-training.txt) not installed
+    datasets = None
+
+SENTENCES = [
+    "i feel so alone since my friends moved away",
+    "i am thrilled about the concert tonight",
+    "i am scared of failing my exams",
+    "why does everyone ignore me, this makes me furious",
+]
+
+
+WORDS = "today again work school home night friends family music rain weekend exams coffee phone city".split()
+
+
+def fixture_text(i):
+    """A sentence plus a few seeded filler words, so rows are not near-duplicates of each other"""
+    rng = random.Random(i)
+    return f"{SENTENCES[i % 4]} {' '.join(rng.choice(WORDS) for _ in range(10))} {i}"
+
+
+def write_fixtures(directory, rows=1200):
+    """dair-ai/emotion style rows (one label id) and GoEmotions style rows (a list of ids)"""
+    emotion_path = os.path.join(directory, "emotion.jsonl")
+    with open(emotion_path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            f.write(json.dumps({"text": fixture_text(i), "label": [0, 1, 4, 3][i % 4]}) + "\n")
+    go_path = os.path.join(directory, "go_emotions.jsonl")
+    with open(go_path, "w", encoding="utf-8") as f:
+        for i in range(rows, rows + 200):
+            f.write(json.dumps({"text": fixture_text(i), "labels": [[25], [17, 13], [14], []][i % 4]}) + "\n")
+        # Retweets of rows above: near-duplicates
+        for i in range(10):
+            f.write(json.dumps({"text": f"RT @someone: {fixture_text(i)}", "labels": [25]}) + "\n")
+    return [DatasetSource.local("emotion", emotion_path), DatasetSource.local("go_emotions", go_path)]
+
+
+def test_build_formats_all_sources():
+    """Both sources end up deduplicated in a seeded split, with their label ids mapped to names"""
+    print("🧪 Testing dataset build")
+    if datasets is None:
+        print("  (skipped: datasets not installed)")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        sources = write_fixtures(directory)
+        cache_dir = os.path.join(directory, "cache")
+        splits = build_datasets(sources, cache_dir, num_proc=2, test_size=0.1)
+        assert set(splits) == {"train", "test"}
+        assert len(splits["train"]) == 1260 and len(splits["test"]) == 140  # The 10 retweets are gone
+        assert splits["train"].column_names == ["text", "emotion", "dataset", "formatted_text"]
+
+        rows = {row["text"]: row for split in splits.values() for row in split}
+        assert rows[fixture_text(0)]["emotion"] == "sadness"
+        assert rows[fixture_text(1201)]["emotion"] == "joy, excitement"
+        assert rows[fixture_text(1203)]["emotion"] == "neutral"
+        assert rows[fixture_text(1202)]["dataset"] == "go_emotions"
+        sample = rows[fixture_text(2)]
+        assert sample["formatted_text"].startswith("<|im_start|>system")
+        assert fixture_text(2) in sample["formatted_text"]
+
+        (build,) = os.listdir(cache_dir)
+        with open(os.path.join(cache_dir, build, "dedup_stats.json"), encoding="utf-8") as f:
+            stats = json.load(f)
+        assert stats["removed"] == 10 and stats["removed_by_source"] == {"go_emotions": 10}
+
+
+def test_rebuild_uses_cache():
+    """Nothing changed: the saved build is opened; a changed file or limit builds anew"""
+    print("🧪 Testing build cache")
+    if datasets is None:
+        print("  (skipped: datasets not installed)")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        sources = write_fixtures(directory)
+        cache_dir = os.path.join(directory, "cache")
+        first = build_datasets(sources, cache_dir, num_proc=1)
+        started = time.perf_counter()
+        second = build_datasets(sources, cache_dir, num_proc=1)
+        assert time.perf_counter() - started < 1.0
+        assert second["train"]["text"] == first["train"]["text"]
+        assert len(os.listdir(cache_dir)) == 1  # No work files left behind
+
+        build_datasets(sources, cache_dir, num_proc=1, limit=100)
+        with open(sources[0].data_files[0], "a", encoding="utf-8") as f:
+            f.write(json.dumps({"text": "one more row", "label": 1}) + "\n")
+        changed = build_datasets(sources, cache_dir, num_proc=1)
+        assert len(changed["train"]) + len(changed["test"]) == 1401
+        assert len(os.listdir(cache_dir)) == 3
+
+
+def test_formatting_is_deterministic():
+    """The reply template depends on the text only, never on chance"""
+    print("🧪 Testing deterministic formatting")
+    batch = {"text": ["i can't stop crying", "i can't stop crying", "nothing much"], "label_ids": [[0], 0, []]}
+    first = format_batch(batch, "emotion", ["sadness"])
+    second = format_batch(batch, "emotion", ["sadness"])
+    assert first == second
+    assert first["emotion"] == ["sadness", "sadness", "neutral"]
+    assert first["formatted_text"][0] == first["formatted_text"][1]
+    assert first["dataset"] == ["emotion"] * 3
+    assert empathetic_response("sadness", "i can't stop crying") in first["formatted_text"][0]
+    assert empathetic_response("wistful", "x").startswith("I sense you're feeling wistful")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_build_formats_all_sources,
+        test_rebuild_uses_cache,
+        test_formatting_is_deterministic,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for MinHash LSH deduplication
+Tests near-duplicate clusters and stats, train/eval overlap removal, and signature accuracy at scale
+"""
+
+import random
+import sys
+
+import numpy as np
+
+from dedup import MinHashLSH, deduplicate, drop_overlap, normalize
+
+
+def test_near_duplicates_are_removed():
+    """Retweets, links, mentions and one-word edits collapse onto the first copy"""
+    print("🧪 Testing near-duplicate removal")
+    texts = [
+        "i feel so alone since my best friends moved away last summer",
+        "RT @sam: i feel so alone since my best friends moved away last summer",
+        "I feel so alone since my best friends moved away last summer! http://t.co/abc",
+        "i feel so alone since my best friends moved away last winter",
+        "i am so excited about the concert with my best friends tonight",
+        "i feel so alone since my best friends moved away last summer",
+        "",
+        "ugh",
+        "ugh",
+    ]
+    labels = ["sadness", "sadness", "sadness", "loneliness", "joy", "sadness", "neutral", "anger", "anger"]
+    sources = ["emotion", "tweet_emotion", "tweet_emotion", "go_emotions", "emotion", "emotion", "emotion", "go", "go"]
+    keep, stats = deduplicate(texts, labels, sources)
+
+    assert keep.tolist() == [0, 4, 6, 7]
+    assert normalize(texts[2]) == normalize(texts[0])
+    assert stats["rows"] == 9 and stats["kept"] == 4 and stats["removed"] == 5
+    assert stats["exact_duplicates"] == 4 and stats["near_duplicates"] == 1
+    assert stats["clusters"] == 2 and stats["largest_cluster"] == 5
+    assert stats["label_conflicts"] == 1
+    assert stats["removed_by_source"] == {"tweet_emotion": 2, "go_emotions": 1, "emotion": 1, "go": 1}
+    assert stats["examples"][0]["kept"] == texts[0] and stats["examples"][0]["size"] == 5
+
+
+def test_drop_overlap_filters_eval_only():
+    """Evaluation rows seen in training are dropped; the rest stay in order"""
+    print("🧪 Testing train/eval overlap removal")
+    train = [
+        "my exams start tomorrow and i have not slept at all this week",
+        "thank you all for the birthday wishes you made my day",
+    ]
+    evaluation = [
+        "thank you all for the birthday wishes, you made my day!!",
+        "the traffic this morning made me late for work again",
+        "RT @x: my exams start tomorrow and i have not slept at all this week",
+        "i finally adopted a puppy and i could not be happier",
+    ]
+    keep, stats = drop_overlap(train, evaluation)
+    assert keep.tolist() == [1, 3]
+    assert stats["overlapping"] == 2 and stats["kept"] == 2
+    assert stats["examples"] == [evaluation[0], evaluation[2]]
+
+
+def test_signatures_at_scale():
+    """Signature agreement tracks Jaccard similarity; planted copies are found among thousands of rows"""
+    print("🧪 Testing MinHash accuracy at scale")
+    rng = random.Random(5)
+    words = [f"w{i}" for i in range(5000)]
+    texts = [" ".join(rng.choice(words) for _ in range(rng.randint(8, 30))) for _ in range(20000)]
+    planted = {}
+    for original in rng.sample(range(20000), 500):
+        tokens = texts[original].split()
+        tokens[-1] = rng.choice(words)  # One changed word: bigram Jaccard well above 0.7
+        planted[len(texts)] = original
+        texts.append(" ".join(tokens))
+
+    lsh = MinHashLSH()
+    signatures = lsh.signatures(texts)
+    assert signatures.shape == (20500, 64)
+    assert (MinHashLSH().signatures(texts[:100]) == signatures[:100]).all()  # Deterministic
+
+    # Estimated vs exact Jaccard over bigram sets
+    errors = []
+    for copy, original in list(planted.items())[:200]:
+        a, b = (set(zip(t.split(), t.split()[1:])) for t in (texts[original], texts[copy]))
+        errors.append(abs((signatures[original] == signatures[copy]).mean() - len(a & b) / len(a | b)))
+    assert np.mean(errors) < 0.06
+
+    cluster = lsh.clusters(texts)
+    found = sum(cluster[copy] == cluster[original] for copy, original in planted.items())
+    assert found >= 0.97 * len(planted)
+    assert len(set(cluster[:20000].tolist())) == 20000  # No unrelated rows merged
+
+
+if __name__ == "__main__":
+    tests = [
+        test_near_duplicates_are_removed,
+        test_drop_overlap_filters_eval_only,
+        test_signatures_at_scale,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for the evaluation runner
+Tests the NumPy metrics, dynamic batching with the prediction cache, and a CPU run that redraws the charts
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from evaluate_model import PredictionCache, auc, compute_metrics, main, predict, roc_curve, token_budget_batches
+from sequence_packing import PaddingStats
+
+try:
+    import matplotlib
+    import torch
+    import transformers
+except ImportError:  # Evaluation extras (requirements-training.txt) not installed
+    torch = None
+
+LABELS = ["sadness", "joy", "anger"]
+
+
+def test_metrics():
+    """Confusion matrix, precision/recall/F1 and AUC match hand-computed values"""
+    print("🧪 Testing evaluation metrics")
+    true_labels = ["sadness", "sadness", "joy", "joy", "anger", "anger"]
+    scores = np.log(np.array([
+        [0.8, 0.1, 0.1],
+        [0.2, 0.7, 0.1],  # sadness read as joy
+        [0.1, 0.8, 0.1],
+        [0.1, 0.6, 0.3],
+        [0.1, 0.2, 0.7],
+        [0.3, 0.2, 0.5],
+    ]))
+    metrics = compute_metrics(true_labels, scores, LABELS)
+    assert metrics["confusion_matrix"] == [[1, 1, 0], [0, 2, 0], [0, 0, 2]]
+    assert abs(metrics["accuracy"] - 5 / 6) < 1e-9
+    assert metrics["per_class"]["joy"]["precision"] == 2 / 3 and metrics["per_class"]["joy"]["recall"] == 1.0
+    assert metrics["per_class"]["sadness"]["f1"] == 2 / 3
+    assert abs(metrics["macro_f1"] - (2 / 3 + 0.8 + 1.0) / 3) < 1e-9
+    assert metrics["per_class"]["anger"]["auc"] == 1.0
+
+    positive = np.array([True, True, False, False])
+    assert auc(*roc_curve(positive, np.array([0.9, 0.8, 0.2, 0.1]))) == 1.0
+    assert auc(*roc_curve(positive, np.array([0.1, 0.2, 0.8, 0.9]))) == 0.0
+    fpr, tpr = roc_curve(positive, np.array([0.5, 0.5, 0.5, 0.5]))  # One threshold for a tie
+    assert fpr.tolist() == [0, 1] and tpr.tolist() == [0, 1] and auc(fpr, tpr) == 0.5
+
+
+class FakeModel:
+    """Scores texts by which label they mention, and counts what it was asked"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.scored = []
+        self.stats = PaddingStats()
+
+    def version(self):
+        return "1"
+
+    def score_labels(self, texts, labels, max_tokens=16384):
+        self.scored.extend(texts)
+        return np.array([[0.0 if label in text else -5.0 for label in labels] for text in texts])
+
+
+def test_batching_and_prediction_cache():
+    """Batches respect the token budget; cached texts are never scored again"""
+    print("🧪 Testing dynamic batching and the prediction cache")
+    lengths = [5, 50, 7, 48, 6, 300]
+    batches = token_budget_batches(lengths, max_tokens=100)
+    assert sorted(i for batch in batches for i in batch) == list(range(6))
+    assert batches[0] == [5]  # Longer than the budget: alone
+    assert all(len(batch) * max(lengths[i] for i in batch) <= 100 for batch in batches[1:])
+    assert batches[1:] == [[1, 3], [2, 4, 0]]
+
+    texts = [f"so much {label} today {i}" for i in range(4) for label in LABELS]
+    true_labels = [label for _ in range(4) for label in LABELS]
+    with tempfile.TemporaryDirectory() as directory:
+        model = FakeModel()
+        scores, path = predict(model, texts + texts[:2], true_labels + true_labels[:2], LABELS, directory, chunk=5)
+        assert len(model.scored) == 12 and scores.shape == (14, 3)
+        assert (scores.argmax(axis=1) == [LABELS.index(label) for label in true_labels + true_labels[:2]]).all()
+
+        again = FakeModel()
+        cached, same_path = predict(again, texts[3:] + ["new anger text"], true_labels[3:] + ["anger"], LABELS, directory)
+        assert again.scored == ["new anger text"] and same_path == path
+        assert np.array_equal(cached[:9], scores[3:12])
+        with open(path, encoding="utf-8") as f:
+            assert json.loads(f.readline())["meta"]["labels"] == LABELS
+        runs = PredictionCache(path).runs  # Each evaluation's own texts, in order
+        assert [len(run["keys"]) for run in runs] == [14, 10] and runs[1]["labels"][-1] == "anger"
+
+
+def test_cpu_run_redraws_charts():
+    """A tiny random model runs end to end on CPU; charts redrawn from the cache are byte-identical"""
+    print("🧪 Testing a CPU evaluation run")
+    if torch is None:
+        print("  (skipped: torch, transformers or matplotlib not installed)")
+        return
+    from evaluate_model import EmotionModel
+
+    model = EmotionModel.tiny_random()
+    pinned = EmotionModel(model.model, model.tokenizer, "org/emotion-model", revision="3f2a9c1")
+    assert pinned.version() == "3f2a9c1"  # A re-pushed Hub model gets new cache keys
+    texts = ["i miss home so much", "we won the final!!", "stop ignoring me", "ok"]
+    batched = model.score_labels(texts, LABELS, max_tokens=4096)
+    one_by_one = model.score_labels(texts, LABELS, max_tokens=1)
+    assert np.allclose(batched, one_by_one, atol=1e-4)  # Padding does not change the scores
+
+    with tempfile.TemporaryDirectory() as directory:
+        eval_file = os.path.join(directory, "eval.jsonl")
+        with open(eval_file, "w", encoding="utf-8") as f:
+            for i in range(30):
+                f.write(json.dumps({"text": f"{texts[i % 4]} ({i})", "emotion": LABELS[i % 3] + ", love"}) + "\n")
+        predictions, output, replay = (os.path.join(directory, name) for name in ("predictions", "output", "replay"))
+        assert main(["--model", "tiny-random", "--eval-file", eval_file, "--predictions-dir", predictions, "--output", output]) == 0
+        (prediction_file,) = os.listdir(predictions)
+        assert main(["--charts-only", os.path.join(predictions, prediction_file), "--output", replay]) == 0
+
+        with open(os.path.join(output, "metrics.json"), encoding="utf-8") as f:
+            metrics = json.load(f)
+        assert metrics["samples"] == 30 and metrics["labels"] == LABELS
+        for name in ("metrics.json", "confusion mat.png", "ROC.png"):
+            with open(os.path.join(output, name), "rb") as first, open(os.path.join(replay, name), "rb") as second:
+                assert first.read() == second.read(), name
+
+        # A smaller run adds to the same prediction file; the charts follow the run, not the file
+        assert main(["--model", "tiny-random", "--eval-file", eval_file, "--predictions-dir", predictions,
+                     "--output", output, "--limit", "12"]) == 0
+        assert os.listdir(predictions) == [prediction_file]
+        assert main(["--charts-only", os.path.join(predictions, prediction_file), "--output", replay]) == 0
+        with open(os.path.join(replay, "metrics.json"), encoding="utf-8") as f:
+            assert json.load(f)["samples"] == 12
+
+
+if __name__ == "__main__":
+    tests = [
+        test_metrics,
+        test_batching_and_prediction_cache,
+        test_cpu_run_redraws_charts,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the Groq client
+Tests Retry-After handling, key switching, hedging and the turn budget
+"""
+
+import asyncio
+import sys
+
+import httpx
+
+from groq_client import GroqClient, GroqError, parse_retry_after
+
+OK_BODY = {"choices": [{"message": {"content": "hello"}}]}
+
+
+def make_client(handler, **kwargs):
+    """Build a client whose HTTP calls go to a local handler"""
+    return GroqClient(
+        ["key-a", "key-b"],
+        backoff_base=0.01,
+        backoff_cap=0.02,
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+def test_parse_retry_after():
+    """Retry-After accepts seconds and rejects garbage"""
+    print("🧪 Testing Retry-After parsing")
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("0.5") == 0.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_rate_limit_switches_key():
+    """A 429 on the first key is retried on the backup key"""
+    print("🧪 Testing rate-limit key switching")
+    used_keys = []
+
+    def handler(request):
+        key = request.headers["Authorization"].split()[-1]
+        used_keys.append(key)
+        if key == "key-a":
+            return httpx.Response(429, headers={"Retry-After": "30"}, json={})
+        return httpx.Response(200, json=OK_BODY)
+
+    client = make_client(handler)
+    result = asyncio.run(client.chat_completion({}, budget=5))
+    assert result == dict(OK_BODY, key_index=1)
+    assert used_keys == ["key-a", "key-b"]
+
+
+def test_client_error_not_retried():
+    """A 400 is raised immediately with its status code"""
+    print("🧪 Testing non-retryable errors")
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={})
+
+    client = make_client(handler)
+    try:
+        asyncio.run(client.chat_completion({}, budget=5))
+    except GroqError as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("expected GroqError")
+    assert len(calls) == 1
+
+
+def test_hedged_request_wins():
+    """A slow primary is beaten by the hedged request on the other key"""
+    print("🧪 Testing hedged requests")
+
+    async def handler(request):
+        if request.headers["Authorization"].endswith("key-a"):
+            await asyncio.sleep(2)
+        return httpx.Response(200, json=OK_BODY)
+
+    client = make_client(handler, hedge=True, hedge_default_delay=0.05)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await client.chat_completion({}, budget=5)
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result == dict(OK_BODY, key_index=1)
+    assert elapsed < 1.0
+
+
+def test_budget_bounds_latency():
+    """Retries stop once the turn budget is spent"""
+    print("🧪 Testing turn budget")
+
+    def handler(request):
+        return httpx.Response(503, json={})
+
+    client = make_client(handler, max_retries=50)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await client.chat_completion({}, budget=0.3)
+        except GroqError as e:
+            return e, loop.time() - started
+        raise AssertionError("expected GroqError")
+
+    error, elapsed = asyncio.run(run())
+    assert error.status_code == 503
+    assert elapsed < 0.5
+
+
+if __name__ == "__main__":
+    tests = [
+        test_parse_retry_after,
+        test_rate_limit_switches_key,
+        test_client_error_not_retried,
+        test_hedged_request_wins,
+        test_budget_bounds_latency,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
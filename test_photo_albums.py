@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for photo album handling
+Tests that an album gets one vision request and one reply
+"""
+
+import asyncio
+import sys
+
+import telegram_bot
+
+
+class FakeFile:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def download_as_bytearray(self):
+        await asyncio.sleep(0.01)
+        return bytearray(self.data)
+
+
+class FakePhoto:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def get_file(self):
+        return FakeFile(self.data)
+
+
+class FakeMessage:
+    def __init__(self, data: bytes, caption, media_group_id, replies):
+        self.photo = [FakePhoto(b"thumb"), FakePhoto(data)]
+        self.caption = caption
+        self.media_group_id = media_group_id
+        self.replies = replies
+
+    async def reply_chat_action(self, action):
+        pass
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUser:
+    id = 42
+    username = "album_user"
+    first_name = "Album"
+
+
+class FakeUpdate:
+    def __init__(self, message):
+        self.message = message
+        self.effective_user = FakeUser()
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+    bot_data = {}
+
+
+def run_handlers(messages):
+    calls = []
+
+    async def fake_analyze(images, caption, user_id, state=None):
+        calls.append((images, caption))
+        return "reply"
+
+    original = telegram_bot.analyze_image_with_context, telegram_bot.MEDIA_GROUP_WAIT_TIME
+    telegram_bot.analyze_image_with_context = fake_analyze
+    telegram_bot.MEDIA_GROUP_WAIT_TIME = 0.05
+
+    async def run():
+        await asyncio.gather(*(telegram_bot.handle_photo(FakeUpdate(m), FakeContext()) for m in messages))
+
+    try:
+        asyncio.run(run())
+    finally:
+        telegram_bot.analyze_image_with_context, telegram_bot.MEDIA_GROUP_WAIT_TIME = original
+    return calls
+
+
+def test_album_gets_one_reply():
+    """Three photos with the same media_group_id produce one request and one reply"""
+    print("🧪 Testing album coalescing")
+    replies = []
+    messages = [
+        FakeMessage(b"one", "our last trip together", "album-1", replies),
+        FakeMessage(b"two", None, "album-1", replies),
+        FakeMessage(b"three", None, "album-1", replies),
+    ]
+    calls = run_handlers(messages)
+    assert len(calls) == 1
+    images, caption = calls[0]
+    assert images == [b"one", b"two", b"three"]
+    assert caption == "our last trip together"
+    assert replies == ["reply"]
+
+
+def test_single_photo_unchanged():
+    """A photo outside an album is answered on its own"""
+    print("🧪 Testing single photos")
+    replies = []
+    calls = run_handlers([FakeMessage(b"solo", "me today", None, replies)])
+    assert calls == [([b"solo"], "me today")]
+    assert replies == ["reply"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_album_gets_one_reply,
+        test_single_photo_unchanged,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for on-demand profiling
+Tests stack sampling and allocation reports, the admin /profile command and the HTTP endpoint
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+import telegram_bot
+from profiling import ProfileBusy, _profile_lock, run_profile
+
+
+def busy_loop(stop):
+    """Burns CPU and allocates until stopped, so it dominates the samples"""
+    blocks = []
+    while not stop.is_set():
+        blocks.append(bytearray(1024))
+        if len(blocks) > 2000:
+            blocks.clear()
+        sum(i * i for i in range(1000))
+
+
+def test_run_profile_finds_hot_code():
+    """A busy thread shows up in the collapsed stacks and the allocation report"""
+    print("🧪 Testing sampling profiler")
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker", daemon=True)
+    worker.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            report = run_profile(0.5, directory, memory=True)
+            with open(report["collapsed_path"], encoding="utf-8") as f:
+                stacks = f.read().splitlines()
+            with open(report["alloc_path"], encoding="utf-8") as f:
+                allocations = f.read()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert report["samples"] > 10
+    assert any(line.startswith("busy-worker;") and "busy_loop (test_profiling.py" in line for line in stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    assert "test_profiling.py" in allocations
+    assert not tracemalloc.is_tracing()  # Nothing is left running after the profile
+
+
+def test_one_profile_at_a_time():
+    """A second profile while one runs is refused"""
+    print("🧪 Testing concurrent profile requests")
+    with _profile_lock:
+        try:
+            run_profile(0.1, tempfile.gettempdir())
+        except ProfileBusy:
+            pass
+        else:
+            raise AssertionError("expected ProfileBusy")
+
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+        self.documents = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+    async def reply_document(self, document, filename=None, **kwargs):
+        self.documents.append(filename)
+
+
+class FakeUpdate:
+    def __init__(self, chat_id):
+        self.message = FakeMessage()
+        self.effective_chat = FakeChat(chat_id)
+
+
+class FakeContext:
+    def __init__(self, state, args):
+        self.bot_data = {"state": state}
+        self.args = args
+
+
+def test_admin_command_and_endpoint():
+    """/profile works in the admin chat only; the endpoint needs the profiling token"""
+    print("🧪 Testing /profile and /admin/profile")
+    state = telegram_bot.create_bot_state({"name": "profile-test", "token": "1:AAA", "admin_chat_id": "-300"})
+    original = telegram_bot.PROFILE_DIR, telegram_bot.PROFILING_TOKEN
+    with tempfile.TemporaryDirectory() as directory:
+        telegram_bot.PROFILE_DIR, telegram_bot.PROFILING_TOKEN = directory, "secret-token"
+        try:
+            admin = FakeUpdate(-300)
+            asyncio.run(telegram_bot.profile_command(admin, FakeContext(state, ["1", "cpu"])))
+            assert "Busiest frames" in admin.message.replies[-1]
+            assert len(admin.message.documents) == 1 and admin.message.documents[0].endswith(".collapsed")
+
+            stranger = FakeUpdate(12345)
+            asyncio.run(telegram_bot.profile_command(stranger, FakeContext(state, ["1"])))
+            assert stranger.message.replies == []
+
+            client = telegram_bot.create_web_app().test_client()
+            assert client.get("/admin/profile?seconds=0.2").status_code == 403
+            response = client.get("/admin/profile?seconds=0.2&memory=false", headers={"X-Profiling-Token": "secret-token"})
+            assert response.status_code == 200
+            assert response.get_json()["samples"] > 0
+            assert len(os.listdir(directory)) == 2
+        finally:
+            telegram_bot.PROFILE_DIR, telegram_bot.PROFILING_TOKEN = original
+
+
+if __name__ == "__main__":
+    tests = [
+        test_run_profile_finds_hot_code,
+        test_one_profile_at_a_time,
+        test_admin_command_and_endpoint,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for outbound rate limiting
+Tests the global and per-chat send limits, chat action coalescing, flood-wait pauses and the turn limiter
+"""
+
+import asyncio
+import sys
+import time
+
+from telegram.error import RetryAfter
+
+from rate_limiting import OutboundRateLimiter, TokenBucket, TurnLimiter
+
+
+class FakeApi:
+    """Records when each Bot API request went out; raises the queued errors first"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+
+    def request(self, limiter, endpoint, chat_id=None, **data):
+        async def callback():
+            if self.errors:
+                raise self.errors.pop(0)
+            self.calls.append((endpoint, chat_id, time.monotonic()))
+            return True
+
+        if chat_id is not None:
+            data["chat_id"] = chat_id
+        return limiter.process_request(callback, (), {}, endpoint, data, None)
+
+
+def test_global_and_chat_limits():
+    """Sends spread out under the global and per-chat rates; lookups like getChat use no chat budget"""
+    print("🧪 Testing global and per-chat limits")
+    bucket = TokenBucket(rate=2.0, capacity=2.0)
+    assert bucket.try_acquire(now=bucket.updated) and bucket.try_acquire(now=bucket.updated)
+    assert not bucket.try_acquire(now=bucket.updated)
+    assert bucket.reserve(now=bucket.updated) == 0.5 and bucket.time_until_available(now=bucket.updated) == 1.0
+
+    async def scenario():
+        limiter = OutboundRateLimiter(overall_rate=20.0, private_chat_rate=10.0)
+        api = FakeApi()
+        # Reading a chat (as every incoming message does) must not delay the reply
+        await asyncio.gather(*(api.request(limiter, "getChat", 7) for _ in range(5)))
+        await api.request(limiter, "sendMessage", 7, text="hi")
+        assert limiter.stats["delayed"] == 0
+
+        start = time.monotonic()
+        await asyncio.gather(*(api.request(limiter, "sendMessage", 8, text=str(i)) for i in range(3)))
+        assert time.monotonic() - start >= 0.18  # 10/s in one chat
+        assert limiter.stats["delayed"] == 2
+
+        start = time.monotonic()
+        await asyncio.gather(*(api.request(limiter, "sendMessage", 100 + i, text="hi") for i in range(30)))
+        assert time.monotonic() - start >= 0.6  # 20/s overall, after the burst
+        assert limiter.stats["sent"] == 39
+
+    asyncio.run(scenario())
+
+
+def test_chat_actions_coalesce():
+    """Repeated typing actions are dropped until a message ends the action"""
+    print("🧪 Testing chat action coalescing")
+
+    async def scenario():
+        limiter = OutboundRateLimiter()
+        api = FakeApi()
+        await asyncio.gather(*(api.request(limiter, "sendChatAction", 5, action="typing") for _ in range(3)))
+        await api.request(limiter, "sendChatAction", 5, action="typing")
+        await api.request(limiter, "sendChatAction", 6, action="typing")  # Other chat
+        await api.request(limiter, "sendMessage", 5, text="reply")
+        await api.request(limiter, "sendChatAction", 5, action="typing")  # Next turn
+        return limiter, api
+
+    limiter, api = asyncio.run(scenario())
+    assert [(endpoint, chat_id) for endpoint, chat_id, _ in api.calls] == [
+        ("sendChatAction", 5), ("sendChatAction", 6), ("sendMessage", 5), ("sendChatAction", 5),
+    ]
+    assert limiter.stats["coalesced_actions"] == 3
+
+
+def test_retry_after_pauses_all_sends():
+    """A 429 retry_after pauses every chat, then the failed request is retried"""
+    print("🧪 Testing flood-wait pauses")
+
+    async def scenario():
+        limiter = OutboundRateLimiter(max_retries=1)
+        api = FakeApi([RetryAfter(0.3)])
+        start = time.monotonic()
+        first = asyncio.create_task(api.request(limiter, "sendMessage", 1, text="a"))
+        await asyncio.sleep(0.05)
+        await api.request(limiter, "sendMessage", 2, text="b")  # Another chat, sent during the pause
+        await first
+        return limiter, api, start
+
+    limiter, api, start = asyncio.run(scenario())
+    assert sorted(chat_id for _, chat_id, _ in api.calls) == [1, 2]
+    assert all(sent_at - start >= 0.3 for _, _, sent_at in api.calls)
+    assert limiter.stats["retry_after"] == 1 and limiter.stats["sent"] == 2
+
+
+def test_turn_limiter():
+    """Turns are admitted within the user and global bursts; would_admit() uses up nothing"""
+    print("🧪 Testing the turn limiter")
+    limiter = TurnLimiter(user_rate=0.5, user_burst=2, global_rate=1.0, global_burst=3)
+    assert limiter.would_admit(1)
+    assert limiter.check(1) == 0 and limiter.check(1) == 0
+    assert not limiter.would_admit(1)
+    wait = limiter.check(1)
+    assert 1.9 < wait <= 2.0  # One token at 0.5/s
+
+    assert limiter.would_admit(2) and limiter.would_admit(2)
+    assert limiter.check(2) == 0  # Last token of the global burst
+    assert not limiter.would_admit(3)
+    assert 0.9 < limiter.check(3) <= 1.0
+
+    limiter.record_deferred()
+    limiter.record_merged()
+    snapshot = limiter.snapshot()
+    assert snapshot["admitted"] == 3 and snapshot["throttled_user"] == 1 and snapshot["throttled_global"] == 1
+    assert snapshot["deferred"] == 1 and snapshot["merged"] == 1 and snapshot["tracked_users"] == 3
+
+
+if __name__ == "__main__":
+    tests = [
+        test_global_and_chat_limits,
+        test_chat_actions_coalesce,
+        test_retry_after_pauses_all_sends,
+        test_turn_limiter,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
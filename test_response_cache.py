@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script for the semantic response cache
+Tests paraphrase matching, TTL and eviction, and reuse across users in the handler
+"""
+
+import asyncio
+import sys
+
+import telegram_bot
+from response_cache import ResponseCache
+
+HOUR = 3600.0
+
+
+def test_paraphrases_share_a_reply():
+    """Rewordings hit; negations and other topics do not"""
+    print("🧪 Testing paraphrase matching")
+    cache = ResponseCache()
+    assert cache.get("I feel lonely") is None
+    cache.put("I feel lonely", "Loneliness is heavy. I'm here.")
+    cache.put("my girlfriend left me", "Breakups hurt so much.")
+    cache.put("ok so what", "Hello!")  # Only stopwords: not cached
+
+    assert cache.get("I'm feeling so lonely") == "Loneliness is heavy. I'm here."
+    assert cache.get("My girlfriend just left me") == "Breakups hurt so much."
+    assert cache.get("I don't feel lonely") is None
+    assert cache.get("my boyfriend left me") is None
+    assert cache.get("I feel anxious") is None
+    assert cache.get("ok so what") is None
+
+    snapshot = cache.snapshot()
+    assert snapshot["entries"] == 2
+    assert snapshot["hits"] == 2 and snapshot["misses"] == 5
+    assert snapshot["hit_rate"] == round(2 / 7, 3)
+
+
+def test_ttl_and_eviction():
+    """Expired replies are not served; a full cache drops the least recently used entry"""
+    print("🧪 Testing TTL and eviction")
+    cache = ResponseCache(capacity=2, ttl=HOUR)
+    cache.put("I feel lonely", "lonely reply", now=0)
+    cache.put("I can't sleep", "sleep reply", now=10)
+    assert cache.get("feeling lonely", now=20) == "lonely reply"
+
+    # Full: the least recently used entry ("I can't sleep") makes room
+    cache.put("I feel anxious", "anxious reply", now=30)
+    assert cache.get("I can't sleep", now=40) is None
+    assert cache.get("I feel lonely", now=40) == "lonely reply"
+    assert cache.snapshot()["evicted"] == 1
+
+    # After the TTL nothing is served, and expired entries are reused first
+    assert cache.get("I feel anxious", now=30 + HOUR + 1) is None
+    cache.put("my exams stress me", "exam reply", now=HOUR + 50)
+    assert cache.get("I feel anxious", now=HOUR + 50) is None
+    assert cache.get("my exams stress me", now=HOUR + 60) == "exam reply"
+    assert cache.snapshot()["expired"] == 1
+
+
+class FakeChat:
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, replies):
+        self.chat = FakeChat()
+        self.replies = replies
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.username = f"cache_user_{user_id}"
+        self.first_name = "Cache"
+
+
+class FakeUpdate:
+    def __init__(self, user_id, replies):
+        self.message = FakeMessage(replies)
+        self.effective_user = FakeUser(user_id)
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+
+    def __init__(self, state):
+        self.bot_data = {"state": state}
+
+
+def test_first_turns_reuse_replies():
+    """A second user's paraphrased opener is answered from the cache; later turns are not"""
+    print("🧪 Testing cached first turns in the handler")
+    state = telegram_bot.create_bot_state({"name": "cache-test", "token": "1:AAA"})
+    state.response_cache = ResponseCache()
+    calls = []
+
+    async def fake_completion(payload, budget, timeout=None):
+        calls.append(payload)
+        return {"choices": [{"message": {"content": f"Reply {len(calls)}"}}]}
+
+    original = telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.api_ready
+    telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.api_ready = 0, True
+    telegram_bot.groq_client.chat_completion = fake_completion
+    replies = []
+
+    def say(user_id, text):
+        asyncio.run(telegram_bot.process_user_text(FakeUpdate(user_id, replies), FakeContext(state), text))
+
+    try:
+        say(601, "I feel so lonely")
+        say(602, "feeling lonely")
+        say(602, "I feel so lonely")  # Not a first turn any more
+    finally:
+        telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.api_ready = original
+        del telegram_bot.groq_client.chat_completion  # Back to the real method
+
+    assert replies == ["Reply 1", "Reply 1", "Reply 2"]
+    assert len(calls) == 2
+    assert state.conversation_memory[602][:2] == [
+        {"role": "user", "content": "feeling lonely"},
+        {"role": "assistant", "content": "Reply 1"},
+    ]
+    assert state.snapshot()["response_cache"]["hits"] == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_paraphrases_share_a_reply,
+        test_ttl_and_eviction,
+        test_first_turns_reuse_replies,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-turn risk scoring
+Tests score build-up, time decay, re-arming, the crisis path in the handler and scoring of deferred turns
+"""
+
+import asyncio
+import sys
+
+import telegram_bot
+from rate_limiting import TurnLimiter
+from risk_scoring import RiskScorer
+
+HOUR = 3600.0
+
+
+class FakeChat:
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, replies):
+        self.chat = FakeChat()
+        self.replies = replies
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUser:
+    id = 91
+    username = "risk_user"
+    first_name = "Risk"
+
+
+class FakeUpdate:
+    def __init__(self, replies):
+        self.message = FakeMessage(replies)
+        self.effective_user = FakeUser()
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+    bot_data = {}
+
+
+class FakeAlerts:
+    def __init__(self):
+        self.alerts = []
+
+    def submit(self, kind, user_id, username, message):
+        self.alerts.append((kind, user_id, message))
+
+
+def test_risk_builds_across_messages():
+    """Mild messages add up and cross the threshold once"""
+    print("🧪 Testing risk build-up")
+    scorer = RiskScorer()
+    assert not scorer.update(1, "I feel hopeless lately", now=0)
+    assert not scorer.update(1, "I'm just a burden to everyone", now=60)
+    assert scorer.update(1, "maybe it's time to say goodbye", now=120)
+    assert not scorer.update(1, "I feel hopeless", now=180)
+    assert scorer.stats["triggered"] == 1
+    assert not scorer.update(2, "I had a good day today", now=0)
+    assert scorer.score(2) == 0.0
+
+
+def test_risk_decays_and_rearms():
+    """Old signals fade, and a decayed score can trigger again"""
+    print("🧪 Testing decay and re-arming")
+    scorer = RiskScorer(half_life=HOUR)
+    scorer.update(1, "I feel hopeless and worthless", now=0)
+    assert abs(scorer.score(1, now=HOUR) - 0.375) < 1e-9
+    assert not scorer.update(1, "goodbye", now=24 * HOUR)
+
+    assert scorer.update(1, "hopeless, worthless, goodbye", now=25 * HOUR)
+    assert scorer.update(1, "hopeless, worthless, goodbye", now=30 * HOUR)
+    assert scorer.stats["triggered"] == 2
+
+
+def test_users_are_bounded():
+    """Only max_users scores are kept"""
+    print("🧪 Testing user bound")
+    scorer = RiskScorer(max_users=10)
+    for user_id in range(50):
+        scorer.update(user_id, "I feel so alone", now=0)
+    assert scorer.snapshot()["users"] == 10
+    assert scorer.score(0, now=0) == 0.0
+
+
+def test_handler_takes_crisis_path():
+    """The message that takes the score over the threshold gets the crisis response and an alert"""
+    print("🧪 Testing crisis path from built-up risk")
+    replies = []
+    alerts = FakeAlerts()
+    bot = telegram_bot.default_bot
+    original = telegram_bot.MESSAGE_WAIT_TIME, bot.alert_dispatcher, bot.risk_scorer
+    telegram_bot.MESSAGE_WAIT_TIME, bot.alert_dispatcher = 0, alerts
+    bot.risk_scorer = RiskScorer(signals=[("hopelessness", r"\bhopeless\b", 0.6)])
+    try:
+        for text in ("I feel hopeless and sad", "still hopeless and sad today"):
+            asyncio.run(telegram_bot.process_user_text(FakeUpdate(replies), FakeContext(), text))
+    finally:
+        telegram_bot.MESSAGE_WAIT_TIME, bot.alert_dispatcher, bot.risk_scorer = original
+    assert replies[0] != telegram_bot.get_crisis_response()
+    assert replies[1] == telegram_bot.get_crisis_response()
+    assert alerts.alerts == [("crisis", FakeUser.id, "[Risk built up over recent messages] still hopeless and sad today")]
+
+
+def test_deferred_turn_is_scored_once():
+    """Text parked while a turn is throttled counts once, in the turn that finally answers it"""
+    print("🧪 Testing risk scoring of deferred turns")
+    replies = []
+    bot = telegram_bot.default_bot
+    original = telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.turn_limiter, bot.alert_dispatcher, bot.risk_scorer
+    telegram_bot.MESSAGE_WAIT_TIME, bot.alert_dispatcher = 0, FakeAlerts()
+    telegram_bot.turn_limiter = TurnLimiter(user_rate=5.0, user_burst=1, global_rate=100.0, global_burst=100)
+    bot.risk_scorer = RiskScorer(signals=[("hopelessness", r"\bhopeless\b", 0.4)])
+
+    async def say(text):
+        await telegram_bot.process_user_text(FakeUpdate(replies), FakeContext(), text)
+
+    async def conversation():
+        await say("I feel hopeless and sad")
+        deferred = asyncio.create_task(say("still hopeless and sad"))  # Over the limit: parked
+        await asyncio.sleep(0.05)
+        await say("and tired")  # Takes over the parked text
+        await deferred
+
+    try:
+        asyncio.run(conversation())
+        score = bot.risk_scorer.score(FakeUser.id)
+        merged = telegram_bot.turn_limiter.stats["merged"]
+    finally:
+        telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.turn_limiter, bot.alert_dispatcher, bot.risk_scorer = original
+        bot.conversation_memory.pop(FakeUser.id, None)
+    assert merged == 1
+    assert abs(score - 0.8) < 1e-3  # Not 1.2: the parked message was not scored a second time
+    assert telegram_bot.get_crisis_response() not in replies and len(replies) == 2
+
+
+if __name__ == "__main__":
+    tests = [
+        test_risk_builds_across_messages,
+        test_risk_decays_and_rearms,
+        test_users_are_bounded,
+        test_handler_takes_crisis_path,
+        test_deferred_turn_is_scored_once,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the bulk safety audit
+Tests verdict changes, image rows, baseline snapshots and baselines of the wrong length
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+from safety_audit import run_audit
+
+ROWS = [
+    {"username": "a", "question": "I feel anxious about my exams"},
+    {"username": "b", "question": "there's no reason to live"},
+    {"username": "c", "question": "[Image sent]"},
+    {"username": "d", "question": "give me a recipe for pasta", "verdict": "off_topic"},
+    {"username": "e", "question": "someone is following me home"},
+]
+
+
+def write_rows(directory: str) -> str:
+    path = os.path.join(directory, "conversations.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for row in ROWS:
+            f.write(json.dumps(row) + "\n")
+    return path
+
+
+def test_reports_changed_verdicts():
+    """Served rows that now trip a safety check are reported"""
+    print("🧪 Testing verdict changes")
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_rows(directory)
+        report_path = os.path.join(directory, "report.jsonl")
+        summary = run_audit(path, report_path=report_path, workers=1, chunk_size=2)
+
+        assert summary["rows"] == 4
+        assert summary["skipped_images"] == 1
+        assert summary["transitions"] == {"served -> crisis": 1, "served -> emergency": 1}
+        with open(report_path, encoding="utf-8") as f:
+            report = [json.loads(line) for line in f]
+        assert [(r["row"], r["new"]) for r in report] == [(1, "crisis"), (4, "emergency")]
+
+
+def test_baseline_snapshot():
+    """Comparing against a fresh snapshot of the same patterns changes nothing"""
+    print("🧪 Testing baseline snapshots")
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_rows(directory)
+        snapshot_path = os.path.join(directory, "verdicts.jsonl")
+        run_audit(path, snapshot_path=snapshot_path, workers=1)
+        summary = run_audit(path, baseline_path=snapshot_path, workers=1)
+        assert summary["changed"] == 0
+
+
+def test_baseline_of_wrong_length():
+    """A shorter or longer baseline is reported instead of failing the audit"""
+    print("🧪 Testing mismatched baselines")
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_rows(directory)
+        snapshot_path = os.path.join(directory, "verdicts.jsonl")
+        run_audit(path, snapshot_path=snapshot_path, workers=1)
+        with open(snapshot_path, encoding="utf-8") as f:
+            lines = f.readlines()
+
+        with open(snapshot_path, "w", encoding="utf-8") as f:
+            f.writelines(lines[:2])
+        summary = run_audit(path, baseline_path=snapshot_path, workers=1)
+        assert summary["baseline_mismatch"] == {"missing": 3, "extra": 0}
+        assert summary["rows"] == 4 and summary["transitions"] == {"served -> emergency": 1}
+
+        with open(snapshot_path, "w", encoding="utf-8") as f:
+            f.writelines(lines + lines[:2])
+        summary = run_audit(path, baseline_path=snapshot_path, workers=1)
+        assert summary["baseline_mismatch"] == {"missing": 0, "extra": 2} and summary["changed"] == 0
+
+        assert run_audit(path, workers=1)["baseline_mismatch"] is None
+
+
+if __name__ == "__main__":
+    tests = [
+        test_reports_changed_verdicts,
+        test_baseline_snapshot,
+        test_baseline_of_wrong_length,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
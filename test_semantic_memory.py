@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for per-user semantic memory
+Tests recall of relevant earlier turns, the recent-turn exclusion and bounds
+"""
+
+import sys
+
+import telegram_bot
+from semantic_memory import SemanticMemory
+
+EXCHANGES = [
+    ("My dog Max died last spring and I still miss him", "Losing Max sounds heartbreaking."),
+    ("Work has been busy this week", "Busy weeks can be draining."),
+    ("I started going to the gym", "That's a great step for yourself."),
+    ("My sister called me yesterday", "How did the call with your sister feel?"),
+    ("I watched the sunset today", "Sunsets can be calming."),
+]
+
+
+def test_recalls_relevant_exchange():
+    """An old exchange about the same topic is recalled for a new message"""
+    print("🧪 Testing semantic recall")
+    memory = SemanticMemory()
+    for user_text, reply in EXCHANGES:
+        memory.add(1, user_text, reply)
+    recalled = memory.recall(1, "I keep thinking about Max, my dog", k=1, exclude_last=2)
+    assert recalled == [
+        {"role": "user", "content": EXCHANGES[0][0]},
+        {"role": "assistant", "content": EXCHANGES[0][1]},
+    ]
+
+
+def test_recent_exchanges_excluded():
+    """Exchanges already sent as recent turns are not recalled twice"""
+    print("🧪 Testing recent-turn exclusion")
+    memory = SemanticMemory()
+    for user_text, reply in EXCHANGES:
+        memory.add(1, user_text, reply)
+    assert memory.recall(1, "I watched the sunset again", k=3, exclude_last=1) == []
+    assert memory.recall(2, "anything") == []
+
+
+def test_memory_is_bounded():
+    """Per-user exchanges and the number of users are capped"""
+    print("🧪 Testing memory bounds")
+    memory = SemanticMemory(max_exchanges=10, max_users=3)
+    for user_id in range(5):
+        for i in range(25):
+            memory.add(user_id, f"message number {i}", "reply")
+    snapshot = memory.snapshot()
+    assert snapshot["users"] == 3
+    assert len(memory.export_user(4)) == 10
+    assert memory.export_user(0) == []
+
+
+def test_chat_payload_includes_recalled_turn():
+    """build_chat_payload sends recalled exchanges before the recent turns"""
+    print("🧪 Testing chat payload with recalled turns")
+    user_id = 4242
+    bot = telegram_bot.default_bot
+    bot.semantic_memory = SemanticMemory()
+    history = bot.conversation_memory[user_id]
+    for user_text, reply in EXCHANGES:
+        bot.semantic_memory.add(user_id, user_text, reply)
+        history += [{"role": "user", "content": user_text}, {"role": "assistant", "content": reply}]
+    history.append({"role": "user", "content": "I keep thinking about Max, my dog"})
+
+    messages = telegram_bot.build_chat_payload(user_id)["messages"]
+    assert messages[0]["role"] == "system"
+    assert messages[1]["content"] == EXCHANGES[0][0]
+    assert messages[-telegram_bot.SEMANTIC_MEMORY_RECENT:] == history[-telegram_bot.SEMANTIC_MEMORY_RECENT:]
+    del bot.conversation_memory[user_id]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_recalls_relevant_exchange,
+        test_recent_exchanges_excluded,
+        test_memory_is_bounded,
+        test_chat_payload_includes_recalled_turn,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
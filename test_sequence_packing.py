@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test script for sequence packing
+Tests first-fit-decreasing packing, attention boundaries in packed and flattened batches and padding statistics
+"""
+
+import random
+import sys
+
+import numpy as np
+
+from sequence_packing import (
+    IGNORE_INDEX,
+    BucketBatchSampler,
+    PackedCollator,
+    bucketed_batches,
+    first_fit_decreasing,
+    pack_sequences,
+    padding_report,
+)
+
+try:
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+except ImportError:  # Training extras (requirements-training.txt) not installed
+    torch = None
+
+
+def test_first_fit_decreasing():
+    """Every item lands in exactly one bin, no bin overflows, and few bins are used"""
+    print("🧪 Testing first-fit-decreasing packing")
+    assert first_fit_decreasing([5, 4, 3, 3, 2, 2, 1], 8) == [[0, 2], [1, 3, 6], [4, 5]]
+    assert first_fit_decreasing([], 8) == []
+    assert first_fit_decreasing([20, 3], 8) == [[0], [1]]  # Too long: fills a bin on its own
+
+    rng = random.Random(7)
+    lengths = [rng.randint(20, 300) for _ in range(5000)]
+    bins = first_fit_decreasing(lengths, 2048)
+    assert sorted(i for packed in bins for i in packed) == list(range(5000))
+    assert all(sum(lengths[i] for i in packed) <= 2048 for packed in bins)
+    assert len(bins) <= sum(lengths) / 2048 * 1.02 + 1
+
+
+def causal_attention(x, allowed):
+    """Single-head attention where allowed[i, j] says whether position i sees position j"""
+    scores = np.where(allowed, x @ x.T / np.sqrt(x.shape[1]), -np.inf)
+    weights = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return (weights / weights.sum(axis=1, keepdims=True)) @ x
+
+
+def test_packed_rows_keep_prompts_apart():
+    """Packed prompts attend only to themselves, restart positions, and never predict each other"""
+    print("🧪 Testing attention boundaries")
+    sequences = [[11, 12, 13, 14, 15], [21, 22, 23], [31, 32, 33, 34], [41, 42]]
+    rows = pack_sequences(sequences, max_seq_length=8)
+    assert [row["seq_lens"] for row in rows] == [[5, 3], [4, 2]]
+
+    batch = PackedCollator(pad_token_id=0, attention="4d")(rows)
+    assert batch["input_ids"].shape == (2, 8)
+    assert batch["position_ids"][0].tolist() == [0, 1, 2, 3, 4, 0, 1, 2]
+    assert batch["position_ids"][1].tolist()[:6] == [0, 1, 2, 3, 0, 1]
+    assert batch["labels"][0].tolist() == [IGNORE_INDEX, 12, 13, 14, 15, IGNORE_INDEX, 22, 23]
+    assert batch["labels"][1].tolist()[6:] == [IGNORE_INDEX, IGNORE_INDEX]  # Padding
+
+    # Attention over the packed row equals attention over each prompt alone
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(8, 16))
+    allowed = batch["attention_mask"][0, 0] == 0
+    packed = causal_attention(x, allowed)
+    assert np.allclose(packed[:5], causal_attention(x[:5], np.tri(5, dtype=bool)))
+    assert np.allclose(packed[5:], causal_attention(x[5:], np.tri(3, dtype=bool)))
+
+
+def test_flattened_batch_keeps_prompts_apart():
+    """position_ids mode flattens the batch into one unmasked row a model splits back into prompts"""
+    print("🧪 Testing flattened position_ids batches")
+    sequences = [[11, 12, 13, 14, 15], [21, 22, 23], [31, 32, 33, 34], [41, 42]]
+    rows = pack_sequences(sequences, max_seq_length=8)
+    collator = PackedCollator(pad_token_id=0)
+    batch = collator(rows)
+    assert "attention_mask" not in batch  # A padding mask would hide the prompt boundaries
+    assert batch["input_ids"].shape == (1, 16)
+    assert batch["position_ids"][0].tolist() == [0, 1, 2, 3, 4, 0, 1, 2, 0, 1, 2, 3, 0, 1, 0, 1]
+    assert batch["labels"][0].tolist()[:9] == [IGNORE_INDEX, 12, 13, 14, 15, IGNORE_INDEX, 22, 23, IGNORE_INDEX]
+    assert batch["labels"][0].tolist()[-2:] == [IGNORE_INDEX, IGNORE_INDEX]  # Padding
+    assert collator.stats.as_dict()["padding_ratio"] == round(2 / 16, 4)
+
+    if torch is None:
+        print("  (model check skipped: torch or transformers not installed)")
+        return
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=64, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=4, max_position_embeddings=64,
+    )
+    batch = PackedCollator(pad_token_id=0, return_tensors="pt")(rows)
+    for attention in ("eager", "sdpa"):
+        model = LlamaForCausalLM(config).eval()
+        model.config._attn_implementation = attention
+        with torch.no_grad():
+            # use_cache=False as in training (a cache turns off packed-sequence detection)
+            packed = model(input_ids=batch["input_ids"], position_ids=batch["position_ids"], use_cache=False).logits[0]
+            start = 0
+            for sequence in sequences:  # Packed in this order
+                alone = model(input_ids=torch.tensor([sequence]), use_cache=False).logits[0]
+                assert torch.allclose(packed[start:start + len(sequence)], alone, atol=1e-5), attention
+                start += len(sequence)
+
+
+def test_packing_removes_padding():
+    """Bucketing cuts padding; packing also puts far more real tokens in every step"""
+    print("🧪 Testing padding statistics")
+    rng = random.Random(3)
+    lengths = [rng.randint(30, 400) for _ in range(4000)]
+    report = padding_report(lengths, batch_size=4, max_seq_length=2048)
+    assert report["random"]["tokens"] == report["packed"]["tokens"] == sum(lengths)
+    assert report["bucketed"]["padding_ratio"] < report["random"]["padding_ratio"] / 4
+    assert report["packed"]["padding_ratio"] < 0.01
+    assert report["packed"]["tokens_per_batch"] > 8 * report["random"]["tokens_per_batch"]
+
+    batches = bucketed_batches(lengths, 4)
+    assert sorted(i for batch in batches for i in batch) == list(range(4000))
+    sampler = BucketBatchSampler(lengths, 4)
+    first = list(sampler)
+    sampler.set_epoch(1)
+    assert len(sampler) == 1000 and list(sampler) != first
+
+    collator = PackedCollator(pad_token_id=0, attention="4d", pad_to_multiple_of=None)
+    collator([{"input_ids": [1, 2, 3]}, {"input_ids": [1]}])
+    assert collator.stats.as_dict()["padding_ratio"] == round(1 - 4 / 6, 4)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_first_fit_decreasing,
+        test_packed_rows_keep_prompts_apart,
+        test_flattened_batch_keeps_prompts_apart,
+        test_packing_removes_padding,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test script for speculative generation
+Tests cancellation, waste and latency counters, and the buffering window in the handler
+"""
+
+import asyncio
+import sys
+
+import telegram_bot
+from speculation import SpeculativeGenerator
+
+REPLY = "That sounds really stressful. I'm here with you."
+
+
+def completion(delay, prompt_tokens=100, completion_tokens=10):
+    async def request():
+        await asyncio.sleep(delay)
+        return {
+            "choices": [{"message": {"content": REPLY}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+        }
+    return request()
+
+
+def test_cancel_and_waste():
+    """In-flight requests are cancelled; finished but unused ones count as wasted tokens"""
+    print("🧪 Testing speculation cancel and waste")
+
+    async def run():
+        speculative = SpeculativeGenerator()
+        speculative.start(1, "I feel", completion(1.0))
+        speculative.start(1, "I feel anxious", completion(0.0, 50, 5))
+        await asyncio.sleep(0.02)
+        assert await speculative.take(1, "I feel anxious today") is None
+        assert await speculative.take(1, "anything") is None
+        return speculative.snapshot()
+
+    stats = asyncio.run(run())
+    assert stats["started"] == 2
+    assert stats["cancelled_in_flight"] == 1
+    assert stats["discarded"] == 1
+    assert stats["wasted_prompt_tokens"] == 50 and stats["wasted_completion_tokens"] == 5
+    assert stats["used"] == 0 and stats["in_flight"] == 0
+
+
+def test_take_counts_latency_saved():
+    """A request that finished before the window closed saves its whole duration"""
+    print("🧪 Testing latency saved")
+
+    async def run():
+        speculative = SpeculativeGenerator()
+        speculative.start(1, "I can't sleep", completion(0.1))
+        await asyncio.sleep(0.2)  # The window closes after the request finished
+        result = await speculative.take(1, "I can't sleep")
+        return result, speculative.snapshot()
+
+    result, stats = asyncio.run(run())
+    assert result["choices"][0]["message"]["content"] == REPLY
+    assert stats["used"] == 1
+    assert 0.08 < stats["latency_saved"] < 0.2
+
+
+class FakeChat:
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, replies):
+        self.chat = FakeChat()
+        self.replies = replies
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUser:
+    id = 4404
+    username = "speculative_user"
+    first_name = "Spec"
+
+
+class FakeUpdate:
+    def __init__(self, replies):
+        self.message = FakeMessage(replies)
+        self.effective_user = FakeUser()
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+
+    def __init__(self, state):
+        self.bot_data = {"state": state}
+
+
+def test_handler_uses_speculation():
+    """A second message cancels the first speculation; the reply to the final text is ready early"""
+    print("🧪 Testing speculative replies in the handler")
+    state = telegram_bot.create_bot_state({"name": "speculation-test", "token": "1:AAA"})
+    state.speculative = SpeculativeGenerator()
+    payloads = []
+
+    async def fake_completion(payload, budget, timeout=None):
+        payloads.append(payload)
+        await asyncio.sleep(0.2)
+        return {"choices": [{"message": {"content": REPLY}}], "usage": {"prompt_tokens": 90, "completion_tokens": 12}}
+
+    original = telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.SPECULATIVE_IDLE, telegram_bot.api_ready
+    telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.SPECULATIVE_IDLE, telegram_bot.api_ready = 0.5, 0.05, True
+    telegram_bot.groq_client.chat_completion = fake_completion
+    replies = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        first = asyncio.create_task(telegram_bot.process_user_text(FakeUpdate(replies), FakeContext(state), "I feel anxious"))
+        await asyncio.sleep(0.1)
+        started = loop.time()
+        await telegram_bot.process_user_text(FakeUpdate(replies), FakeContext(state), "about my exams tomorrow")
+        await first
+        return loop.time() - started
+
+    try:
+        elapsed = asyncio.run(run())
+    finally:
+        telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.SPECULATIVE_IDLE, telegram_bot.api_ready = original
+        del telegram_bot.groq_client.chat_completion  # Back to the real method
+
+    assert replies == [REPLY]
+    # Window (0.5s) plus generation (0.2s) without speculation
+    assert elapsed < 0.65
+    assert payloads[-1]["messages"][-1] == {"role": "user", "content": "I feel anxious about my exams tomorrow"}
+    stats = state.speculative.snapshot()
+    assert stats["started"] == 2 and stats["cancelled_in_flight"] == 1 and stats["used"] == 1
+    assert stats["latency_saved"] > 0.15
+    assert state.conversation_memory[FakeUser.id][-2:] == [
+        {"role": "user", "content": "I feel anxious about my exams tomorrow"},
+        {"role": "assistant", "content": REPLY},
+    ]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_cancel_and_waste,
+        test_take_counts_latency_saved,
+        test_handler_uses_speculation,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for tiered conversation memory
+Tests defaultdict behaviour, demotion through the tiers, batched background writes and promotion
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+from tiered_memory import TieredMemory
+
+
+def make_history(n: int):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " * 20} for i in range(n)]
+
+
+def test_behaves_like_defaultdict():
+    """Unknown users get an empty list; get() and pop() don't create entries"""
+    print("🧪 Testing defaultdict behaviour")
+    memory = TieredMemory()
+    assert memory.get(1, "missing") == "missing"
+    assert 1 not in memory
+    memory[1].append({"role": "user", "content": "hi"})
+    assert memory[1] == [{"role": "user", "content": "hi"}]
+    assert memory.pop(1) == [{"role": "user", "content": "hi"}]
+    assert memory.pop(1, []) == []
+    assert len(memory) == 0
+
+
+def test_idle_users_move_down_and_come_back():
+    """Idle histories are compressed, then stored on disk, and restored on access"""
+    print("🧪 Testing demotion and promotion")
+    with tempfile.TemporaryDirectory() as directory:
+        memory = TieredMemory(hot_idle=10, warm_idle=100, cold_path=os.path.join(directory, "memory.sqlite3"))
+        for user_id in range(3):
+            memory[user_id] = make_history(16)
+        now = memory._touched[0]
+
+        memory.sweep(now + 50)
+        snapshot = memory.snapshot()
+        assert snapshot["hot_users"] == 0 and snapshot["warm_users"] == 3
+        assert snapshot["warm_bytes"] < 3 * 1000
+
+        memory.sweep(now + 500)
+        assert memory.snapshot()["cold_users"] == 3
+        assert len(memory) == 3
+
+        assert memory[1] == make_history(16)
+        snapshot = memory.snapshot()
+        assert snapshot["hot_users"] == 1 and snapshot["cold_users"] == 2
+        memory.close()
+
+
+def test_sweep_on_access_writes_to_disk_in_background():
+    """A sweep triggered by an access moves idle histories to disk in one transaction, off the caller's thread"""
+    print("🧪 Testing background disk writes")
+    with tempfile.TemporaryDirectory() as directory:
+        memory = TieredMemory(hot_idle=10, warm_idle=100, cold_path=os.path.join(directory, "memory.sqlite3"))
+        for user_id in range(200):
+            memory[user_id] = make_history(2)
+        now = memory._touched[0]
+        memory.sweep(now + 50)
+
+        statements = []
+        cold = memory._open_cold()
+        assert cold.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        cold.set_trace_callback(lambda sql: statements.append((threading.current_thread() is threading.main_thread(), sql)))
+        memory._maybe_sweep(now + 500)
+        assert memory[7] == make_history(2)  # Promoted while (or after) it was being written
+        memory._writer.submit(lambda: None).result()
+
+        assert [sql for _, sql in statements].count("BEGIN") == 1
+        assert not any(on_main and sql.startswith("INSERT") for on_main, sql in statements)
+        snapshot = memory.snapshot()
+        assert snapshot["hot_users"] == 1 and snapshot["cold_users"] == 199 and snapshot["flushing_users"] == 0
+        assert len(memory) == 200 and memory[8] == make_history(2)
+        memory.close()
+
+
+def test_hot_tier_is_capped():
+    """The least recently used histories are compressed past max_hot"""
+    print("🧪 Testing hot tier cap")
+    memory = TieredMemory(max_hot=10)
+    for user_id in range(25):
+        memory[user_id] = make_history(4)
+    assert memory.snapshot()["hot_users"] <= 11
+    assert memory[0] == make_history(4)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_behaves_like_defaultdict,
+        test_idle_users_move_down_and_come_back,
+        test_sweep_on_access_writes_to_disk_in_background,
+        test_hot_tier_is_capped,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
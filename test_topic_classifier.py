@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for the learned topic filter
+Tests training, batch scoring and the crisis safety override
+"""
+
+import os
+import sys
+
+import numpy as np
+
+import telegram_bot
+from topic_classifier import TopicClassifier, read_labeled
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "data", "topic_messages.jsonl")
+
+
+def test_training_separates_topics():
+    """A model trained on the sample corpus separates the two classes"""
+    print("🧪 Testing topic classifier training")
+    texts, labels = read_labeled(CORPUS)
+    model = TopicClassifier.train(texts, labels, epochs=100)
+    assert model.score("I feel so lonely and sad since my breakup") > 0.5
+    assert model.score("What is the capital of Australia") < 0.5
+
+
+def test_batch_matches_single():
+    """Batch scoring gives the same probabilities as one-by-one scoring"""
+    print("🧪 Testing batch scoring")
+    rng = np.random.default_rng(1)
+    model = TopicClassifier(rng.normal(size=2 ** 12), 0.2)
+    texts = ["I can't sleep", "", "write a python script to sort a list", "she said the whole thing was my fault"]
+    batch = model.score_batch(texts)
+    assert np.allclose(batch, [model.score(text) for text in texts], atol=1e-5)
+
+
+def test_crisis_never_rejected():
+    """Crisis and emergency messages pass the topic check even if the model says off-topic"""
+    print("🧪 Testing crisis override")
+    # Strongly negative weights: every message scores as off-topic
+    always_off = TopicClassifier(np.full(2 ** 12, -10.0), -10.0)
+    previous = telegram_bot.topic_classifier
+    telegram_bot.topic_classifier = always_off
+    try:
+        assert not telegram_bot.is_mental_health_related("she thinks the weather thing is weird")
+        assert telegram_bot.is_mental_health_related("there's no reason to live")
+        assert telegram_bot.is_mental_health_related("someone is following me home")
+    finally:
+        telegram_bot.topic_classifier = previous
+
+
+if __name__ == "__main__":
+    tests = [
+        test_training_separates_topics,
+        test_batch_matches_single,
+        test_crisis_never_rejected,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for token and cost accounting
+Tests aggregation by dimension, rollups on disk and the accounting of bot turns
+"""
+
+import asyncio
+import sys
+import tempfile
+
+import telegram_bot
+from usage_accounting import UsageAccounting, iter_rollups, main, summarize_rollups
+
+PRICES = {"text-model": (1.0, 2.0)}
+
+
+def test_totals_by_dimension():
+    """Tokens, cost and latency add up per bot, user, key, model and prompt version"""
+    print("🧪 Testing usage totals")
+    usage = UsageAccounting(prices=PRICES, max_users=2)
+    usage.record("main", 1, 0, "text-model", "v1", {"prompt_tokens": 1000, "completion_tokens": 100}, 0.5)
+    usage.record("main", 1, 1, "text-model", "v2", {"prompt_tokens": 3000, "completion_tokens": 300}, 1.5)
+    usage.record("calm", 2, None, "other-model", "v1", None, 2.0, error=True)
+
+    snapshot = usage.snapshot(top=10)
+    assert snapshot["total"]["requests"] == 3 and snapshot["total"]["errors"] == 1
+    assert snapshot["total"]["prompt_tokens"] == 4000
+    assert abs(snapshot["total"]["cost_usd"] - (4000 * 1.0 + 400 * 2.0) / 1_000_000) < 1e-12
+    assert snapshot["by_key"]["#1"]["completion_tokens"] == 100
+    assert snapshot["by_key"]["none"]["errors"] == 1
+    assert snapshot["by_prompt_version"]["v1"]["requests"] == 2
+    assert snapshot["by_bot"]["main"]["avg_latency"] == 1.0
+    assert snapshot["top_users"][0]["user"] == 1 and snapshot["top_users"][0]["total_tokens"] == 4400
+
+    # Only the most recently active users are kept
+    usage.record("main", 3, 0, "text-model", "v1", {"prompt_tokens": 1, "completion_tokens": 1}, 0.1)
+    assert [user for user, _ in usage.top_users()] == [("main", 3), ("calm", 2)]
+
+
+def test_rollups_on_disk():
+    """Each window is appended as one row per key, and the CLI adds rows up"""
+    print("🧪 Testing usage rollups")
+    with tempfile.TemporaryDirectory() as directory:
+        usage = UsageAccounting(rollup_dir=directory, flush_interval=60, prices=PRICES)
+        start = usage._window_start
+        usage.record("main", 1, 0, "text-model", "v1", {"prompt_tokens": 10, "completion_tokens": 5}, 0.2, now=start + 1)
+        usage.record("main", 1, 0, "text-model", "v1", {"prompt_tokens": 10, "completion_tokens": 5}, 0.4, now=start + 2)
+        assert list(iter_rollups(directory)) == []
+        # The first request after the window ends writes the window out
+        usage.record("main", 2, 1, "text-model", "v1", {"prompt_tokens": 7, "completion_tokens": 3}, 0.3, now=start + 61)
+        usage.flush(now=start + 62)
+
+        rows = list(iter_rollups(directory))
+        assert len(rows) == 2
+        assert rows[0]["user"] == 1 and rows[0]["requests"] == 2 and rows[0]["prompt_tokens"] == 20
+        assert abs(rows[0]["avg_latency"] - 0.3) < 1e-9
+        by_model = summarize_rollups(rows, "model")
+        assert by_model["text-model"].prompt_tokens == 27
+        assert by_model["text-model"].requests == 3
+        assert main([directory, "--by", "user"]) == 0
+
+
+class FakeChat:
+    def __init__(self, chat_id=None):
+        self.id = chat_id
+
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self):
+        self.chat = FakeChat()
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUpdate:
+    def __init__(self, chat_id):
+        self.message = FakeMessage()
+        self.effective_chat = FakeChat(chat_id)
+
+
+class FakeContext:
+    def __init__(self, state):
+        self.bot_data = {"state": state}
+        self.args = []
+
+
+def test_bot_turns_are_accounted():
+    """A chat turn is counted under its bot, user, key and prompt version; /usage is admin only"""
+    print("🧪 Testing accounting of bot turns")
+    state = telegram_bot.create_bot_state({"name": "usage-test", "token": "1:AAA", "admin_chat_id": "-200"})
+    usage = UsageAccounting(prices={telegram_bot.GROQ_MODEL_NAME: (1.0, 1.0)})
+
+    async def fake_completion(payload, budget, timeout=None):
+        return {
+            "choices": [{"message": {"content": "I'm here with you."}}],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 8},
+            "key_index": 1,
+        }
+
+    original = telegram_bot.usage_accounting, telegram_bot.api_ready
+    telegram_bot.usage_accounting = usage
+    telegram_bot.groq_client.chat_completion = fake_completion
+    telegram_bot.api_ready = True
+    try:
+        reply = asyncio.run(telegram_bot.generate_ai_response("I can't sleep", 77, state))
+        assert reply == "I'm here with you."
+        snapshot = usage.snapshot(top=10)
+        assert snapshot["by_key"]["#2"]["prompt_tokens"] == 120
+        assert snapshot["by_prompt_version"][state.prompt_version]["completion_tokens"] == 8
+        assert snapshot["top_users"][0]["bot"] == "usage-test" and snapshot["top_users"][0]["user"] == 77
+        assert "top_users" not in telegram_bot.collect_metrics()["usage"]  # /metrics is public
+
+        admin = FakeUpdate(-200)
+        asyncio.run(telegram_bot.usage_command(admin, FakeContext(state)))
+        assert "120 in / 8 out tokens" in admin.message.replies[0]
+        assert "Top users of usage-test" in admin.message.replies[0]
+
+        stranger = FakeUpdate(12345)
+        asyncio.run(telegram_bot.usage_command(stranger, FakeContext(state)))
+        assert stranger.message.replies == []
+    finally:
+        telegram_bot.usage_accounting, telegram_bot.api_ready = original
+        del telegram_bot.groq_client.chat_completion  # Back to the real method
+
+
+if __name__ == "__main__":
+    tests = [
+        test_totals_by_dimension,
+        test_rollups_on_disk,
+        test_bot_turns_are_accounted,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
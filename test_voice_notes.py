@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script for voice-note support
+Tests chunk splitting and that transcripts take the text message path
+"""
+
+import asyncio
+import sys
+
+import numpy as np
+
+import telegram_bot
+from speech_to_text import SAMPLE_RATE, split_on_silence
+
+
+class FakeFile:
+    async def download_as_bytearray(self):
+        return bytearray(b"OggS")
+
+
+class FakeVoice:
+    duration = 4
+
+    async def get_file(self):
+        return FakeFile()
+
+
+class FakeChat:
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self):
+        self.voice = FakeVoice()
+        self.audio = None
+        self.chat = FakeChat()
+        self.replies = []
+
+    async def reply_chat_action(self, action):
+        pass
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUser:
+    id = 77
+    username = "voice_user"
+    first_name = "Voice"
+
+
+class FakeUpdate:
+    def __init__(self):
+        self.message = FakeMessage()
+        self.effective_user = FakeUser()
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+    bot_data = {}
+
+
+class FakeSpeechToText:
+    available = True
+
+    def __init__(self, transcript):
+        self.transcript = transcript
+
+    async def transcribe(self, data):
+        return self.transcript
+
+
+def run_voice(speech):
+    update = FakeUpdate()
+    original = telegram_bot.speech_to_text, telegram_bot.MESSAGE_WAIT_TIME
+    telegram_bot.speech_to_text, telegram_bot.MESSAGE_WAIT_TIME = speech, 0
+    try:
+        asyncio.run(telegram_bot.handle_voice(update, FakeContext()))
+    finally:
+        telegram_bot.speech_to_text, telegram_bot.MESSAGE_WAIT_TIME = original
+    return update.message.replies
+
+
+def test_split_cuts_at_pauses():
+    """Long clips are split near the boundary at the quietest point"""
+    print("🧪 Testing chunk splitting")
+    rng = np.random.default_rng(0)
+    samples = (rng.random(SAMPLE_RATE * 70) - 0.5).astype(np.float32)
+    pause = SAMPLE_RATE * 29
+    samples[pause:pause + 1600] = 0
+    chunks = split_on_silence(samples, chunk_seconds=30)
+    assert sum(len(c) for c in chunks) == len(samples)
+    assert all(len(c) <= SAMPLE_RATE * 30 for c in chunks)
+    assert pause <= len(chunks[0]) <= pause + 1600
+
+
+def test_transcript_takes_text_path():
+    """A crisis transcript gets the crisis response, like a typed message"""
+    print("🧪 Testing voice transcript handling")
+    replies = run_voice(FakeSpeechToText("I don't want to live anymore"))
+    assert replies == [telegram_bot.get_crisis_response()]
+
+
+def test_unavailable_engine_asks_to_type():
+    """Without a speech engine the user is still answered"""
+    print("🧪 Testing missing speech engine")
+    speech = FakeSpeechToText("")
+    speech.available = False
+    replies = run_voice(speech)
+    assert len(replies) == 1 and "type" in replies[0]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_split_cuts_at_pauses,
+        test_transcript_takes_text_path,
+        test_unavailable_engine_asks_to_type,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
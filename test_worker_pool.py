@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-worker sharding
+Tests consistent hashing balance, how many users move on rebalance, send rate shares, worker startup, mid-turn exports and the dispatcher endpoints
+"""
+
+import asyncio
+import os
+import queue
+import sys
+
+from worker_pool import ConsistentHashRing, WorkerDispatcher, _worker_main, extract_user_id
+
+
+def test_ring_is_balanced():
+    """Users spread roughly evenly over workers"""
+    print("🧪 Testing ring balance")
+    ring = ConsistentHashRing([f"worker-{i}" for i in range(4)])
+    counts = {}
+    for user_id in range(20000):
+        node = ring.node_for(user_id)
+        counts[node] = counts.get(node, 0) + 1
+    print(f"  Distribution: {counts}")
+    assert len(counts) == 4
+    assert min(counts.values()) > 20000 / 4 * 0.7
+
+
+def test_adding_worker_moves_few_users():
+    """Adding a fifth worker moves only about a fifth of the users"""
+    print("🧪 Testing rebalance on scale-up")
+    ring = ConsistentHashRing([f"worker-{i}" for i in range(4)])
+    before = {user_id: ring.node_for(user_id) for user_id in range(20000)}
+    ring.add_node("worker-4")
+    moved = [u for u, node in before.items() if ring.node_for(u) != node]
+    print(f"  Moved {len(moved)} of {len(before)} users")
+    assert all(ring.node_for(u) == "worker-4" for u in moved)
+    assert len(moved) < 20000 * 0.3
+
+
+def test_removing_worker_only_moves_its_users():
+    """Removing a worker only moves the users it owned"""
+    print("🧪 Testing rebalance on scale-down")
+    ring = ConsistentHashRing([f"worker-{i}" for i in range(4)])
+    before = {user_id: ring.node_for(user_id) for user_id in range(5000)}
+    ring.remove_node("worker-2")
+    for user_id, node in before.items():
+        if node != "worker-2":
+            assert ring.node_for(user_id) == node
+    assert "worker-2" not in ring.nodes
+
+
+def test_extract_user_id():
+    """The sender is found in messages and callback queries"""
+    print("🧪 Testing user id extraction")
+    assert extract_user_id({"update_id": 1, "message": {"from": {"id": 42}, "chat": {"id": 7}}}) == 42
+    assert extract_user_id({"update_id": 2, "callback_query": {"from": {"id": 9}}}) == 9
+    assert extract_user_id({"update_id": 3}) is None
+
+
+def test_dispatcher_tracks_recent_users_only():
+    """The user -> worker map keeps only the most recently active users (never user-less updates), and only they migrate"""
+    print("🧪 Testing tracked users")
+    dispatcher = WorkerDispatcher(max_tracked_users=10)
+    for name in ("worker-0", "worker-1"):
+        dispatcher.ring.add_node(name)
+        dispatcher.workers[name] = (None, queue.Queue())
+    for user_id in range(50):
+        dispatcher.dispatch({"update_id": user_id, "message": {"from": {"id": user_id}}})
+    dispatcher.dispatch({"update_id": 50, "message": {"from": {"id": 3}}})
+    for update_id in range(51, 61):
+        dispatcher.dispatch({"update_id": update_id, "poll": {"id": "p1"}})  # No user: routed, not tracked
+    assert list(dispatcher.user_owner) == list(range(41, 50)) + [3]
+    assert sum(inbox.qsize() for _, inbox in dispatcher.workers.values()) == 61
+
+    dispatcher.ring.add_node("worker-2")
+    dispatcher.workers["worker-2"] = (None, queue.Queue())
+    dispatcher._rebalance()
+    moved = {user_id for user_id in dispatcher.user_owner if dispatcher.ring.node_for(user_id) == "worker-2"}
+    assert moved and set(dispatcher.migrating) == moved
+
+
+class FakeProcess:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+def drain(inbox):
+    messages = []
+    while not inbox.empty():
+        messages.append(inbox.get_nowait())
+    return messages
+
+
+def test_workers_split_the_send_rate():
+    """Workers share the token's send rate; resizing updates every worker's share"""
+    print("🧪 Testing the per-worker send rate")
+    dispatcher = WorkerDispatcher(send_rate=30.0)
+
+    def spawn(name=None):
+        name = name or f"worker-{len(dispatcher.workers) + len(dispatcher.retiring)}"
+        inbox = queue.Queue()
+        inbox.put(("rate", dispatcher.worker_send_rate()))  # Stands in for the spawn argument
+        dispatcher.workers[name] = (FakeProcess(), inbox)
+        return name
+
+    dispatcher._spawn = spawn
+    dispatcher.num_workers = 2
+    for _ in range(2):
+        dispatcher.ring.add_node(spawn())
+    assert [drain(inbox) for _, inbox in dispatcher.workers.values()] == [[("rate", 15.0)]] * 2
+
+    dispatcher.scale_to(3)
+    assert [drain(inbox) for _, inbox in dispatcher.workers.values()] == [[("rate", 10.0)]] * 3
+
+    dispatcher.scale_to(2)
+    (retiring,) = dispatcher.retiring
+    dispatcher._replace_dead_workers()
+    assert all(inbox.empty() for _, inbox in dispatcher.workers.values())  # Not while it may still send
+    retiring.alive = False
+    dispatcher._replace_dead_workers()
+    assert [drain(inbox) for _, inbox in dispatcher.workers.values()] == [[("rate", 15.0)]] * 2
+    assert not dispatcher.retiring
+
+
+class FakeState:
+    def __init__(self):
+        self.events = []
+
+    async def start(self, bot):
+        self.events.append(("start", bot))
+
+    async def stop(self):
+        self.events.append(("stop",))
+
+
+class FakeApplication:
+    """Just enough of a PTB Application for the worker loop"""
+
+    def __init__(self, state):
+        self.bot = "fake-bot"
+        self.bot_data = {"state": state}
+        self.running = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def start(self):
+        self.running = True
+
+    async def stop(self):
+        self.running = False
+
+
+def test_worker_starts_and_stops_bot_state():
+    """A worker starts its bot's background services and stops them on exit"""
+    print("🧪 Testing worker startup and shutdown")
+    import telegram_bot
+
+    state = FakeState()
+    application = FakeApplication(state)
+    inbox = queue.Queue()
+    inbox.put(("export", 42))
+    inbox.put(("rate", 7.5))
+    inbox.put(("stop",))
+    outbox = queue.Queue()
+    limiter = telegram_bot.default_bot.outbound_limiter
+    rates = []
+
+    original = telegram_bot.build_application, telegram_bot.api_ready, os.environ.get("BOT_WORKER_NAME"), limiter.overall_rate
+    telegram_bot.build_application = lambda: application
+    limiter.set_overall_rate = lambda rate: rates.append(rate)
+    try:
+        asyncio.run(_worker_main("worker-test", inbox, outbox, send_rate=15.0))
+    finally:
+        del limiter.set_overall_rate
+        telegram_bot.build_application, telegram_bot.api_ready = original[:2]
+        if original[2] is None:
+            os.environ.pop("BOT_WORKER_NAME", None)
+        else:
+            os.environ["BOT_WORKER_NAME"] = original[2]
+
+    assert rates == [15.0, 7.5]
+    assert state.events == [("start", "fake-bot"), ("stop",)]
+    assert not application.running
+    assert outbox.get_nowait()[:2] == ("state", 42)
+
+
+class FakeChat:
+    async def send_action(self, action):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, replies):
+        self.chat = FakeChat()
+        self.replies = replies
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUser:
+    id = 93
+    username = "moving_user"
+    first_name = "Moving"
+
+
+class FakeUpdate:
+    def __init__(self, replies):
+        self.message = FakeMessage(replies)
+        self.effective_user = FakeUser()
+
+
+class FakeBot:
+    async def get_chat(self, chat_id):
+        raise RuntimeError("offline")
+
+
+class FakeContext:
+    bot = FakeBot()
+    bot_data = {}
+
+
+def test_export_hands_over_pending_turn():
+    """A user exported mid-turn is answered before the export, or their buffered text moves with them"""
+    print("🧪 Testing export of a user mid-turn")
+    import telegram_bot
+
+    replies = []
+    bot = telegram_bot.default_bot
+
+    async def fake_generate(user_message, user_id, state):
+        state.conversation_memory[user_id].append({"role": "user", "content": user_message})
+        state.conversation_memory[user_id].append({"role": "assistant", "content": "reply"})
+        return "reply"
+
+    async def say(text):
+        await telegram_bot.process_user_text(FakeUpdate(replies), FakeContext(), text)
+
+    async def scenario():
+        turn = asyncio.create_task(say("I feel anxious about work"))
+        await asyncio.sleep(0.05)  # Buffered, waiting for more messages
+        exported = await telegram_bot.export_user_state(FakeUser.id)
+        assert turn.done() and replies == ["reply"]
+
+        turn = asyncio.create_task(say("and my exams"))
+        await asyncio.sleep(0.05)
+        late = await telegram_bot.export_user_state(FakeUser.id, timeout=0)
+        await turn
+        return exported, late
+
+    original = telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.generate_ai_response
+    telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.generate_ai_response = 0.2, fake_generate
+    try:
+        exported, late = asyncio.run(scenario())
+    finally:
+        telegram_bot.MESSAGE_WAIT_TIME, telegram_bot.generate_ai_response = original
+
+    assert [m["content"] for m in exported["conversation_memory"]] == ["I feel anxious about work", "reply"]
+    # Timed out: the old worker does not answer, the new owner gets the text
+    assert late["buffered_messages"] == ["and my exams"] and replies == ["reply"]
+    bot.import_user(FakeUser.id, late)
+    assert bot.user_message_buffer.pop(FakeUser.id) == ["and my exams"]
+    assert not bot.active_turns
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.updates = []
+        self.ring = ConsistentHashRing(["worker-0"])
+        self.user_owner = {}
+
+    def dispatch(self, update):
+        self.updates.append(update)
+
+    def queue_depths(self):
+        return {"worker-0": 0}
+
+
+def test_webhook_and_admin_tokens_are_separate():
+    """The webhook secret delivers updates but cannot manage workers; that needs the admin token"""
+    print("🧪 Testing dispatcher endpoint secrets")
+    import telegram_bot
+
+    dispatcher = FakeDispatcher()
+    original = telegram_bot.WEBHOOK_SECRET, telegram_bot.WORKERS_ADMIN_TOKEN
+    telegram_bot.WEBHOOK_SECRET, telegram_bot.WORKERS_ADMIN_TOKEN = "webhook-secret", "admin-token"
+    try:
+        client = telegram_bot.create_web_app(dispatcher).test_client()
+        webhook = {"X-Telegram-Bot-Api-Secret-Token": "webhook-secret"}
+        assert client.post("/telegram", json={"update_id": 1}).status_code == 403
+        assert client.post("/telegram", json={"update_id": 1}, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}).status_code == 403
+        assert client.post("/telegram", json={"update_id": 2}, headers=webhook).status_code == 200
+        assert dispatcher.updates == [{"update_id": 2}]
+
+        assert client.get("/admin/workers", headers=webhook).status_code == 403
+        assert client.get("/admin/workers", headers={"X-Admin-Token": "webhook-secret"}).status_code == 403
+        response = client.get("/admin/workers", headers={"X-Admin-Token": "admin-token"})
+        assert response.status_code == 200 and response.get_json()["workers"] == ["worker-0"]
+
+        telegram_bot.WORKERS_ADMIN_TOKEN = None  # No token: no admin endpoint at all
+        client = telegram_bot.create_web_app(dispatcher).test_client()
+        assert client.get("/admin/workers", headers={"X-Admin-Token": ""}).status_code == 404
+    finally:
+        telegram_bot.WEBHOOK_SECRET, telegram_bot.WORKERS_ADMIN_TOKEN = original
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ring_is_balanced,
+        test_adding_worker_moves_few_users,
+        test_removing_worker_only_moves_its_users,
+        test_extract_user_id,
+        test_dispatcher_tracks_recent_users_only,
+        test_workers_split_the_send_rate,
+        test_worker_starts_and_stops_bot_state,
+        test_export_hands_over_pending_turn,
+        test_webhook_and_admin_tokens_are_separate,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print("  ✓ PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ✗ FAIL: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Hashed n-gram text features for MiraiBot's lightweight classifiers
+Word unigrams and bigrams are hashed with CRC32 into a fixed number of
+buckets, so features are stable across processes and need no vocabulary
+"""
+
+import re
+import zlib
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+# 2^18 buckets keeps collisions rare for chat-sized vocabularies (1 MB of float32 weights)
+DEFAULT_N_FEATURES = 2 ** 18
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def hash_ngrams(text: str, n_features: int = DEFAULT_N_FEATURES) -> np.ndarray:
+    """
+    Bucket indices of a message's unigrams and bigrams
+
+    Args:
+        text: Message text
+        n_features: Number of hash buckets (a power of two)
+
+    Returns:
+        Unique bucket indices (int32)
+    """
+    tokens = tokenize(text)
+    mask = n_features - 1
+    buckets = {zlib.crc32(token.encode("utf-8")) & mask for token in tokens}
+    for first, second in zip(tokens, tokens[1:]):
+        buckets.add(zlib.crc32(f"{first} {second}".encode("utf-8")) & mask)
+    return np.fromiter(buckets, dtype=np.int32, count=len(buckets))
+
+
+def vectorize(texts: Iterable[str], n_features: int = DEFAULT_N_FEATURES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sparse (CSR) feature matrix for a batch of messages
+
+    Rows are L2-normalized binary vectors, so long and short messages
+    produce scores on the same scale.
+
+    Returns:
+        (indptr, indices, values) - row i spans indices[indptr[i]:indptr[i + 1]]
+    """
+    rows = [hash_ngrams(text, n_features) for text in texts]
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    scale = 1.0 / np.sqrt(np.maximum(lengths, 1))
+    values = np.repeat(scale, lengths).astype(np.float32)
+    return indptr, indices, values
+
+
+def sparse_dot(indptr: np.ndarray, indices: np.ndarray, values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Row-wise dot product of a CSR batch with a dense weight vector"""
+    products = weights[indices] * values
+    totals = np.zeros(len(indptr) - 1, dtype=np.float64)
+    nonempty = indptr[1:] > indptr[:-1]
+    if products.size:
+        totals[nonempty] = np.add.reduceat(products, indptr[:-1][nonempty])
+    return totals
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Tiered conversation memory for MiraiBot
+Histories of active users stay as Python lists (hot); idle ones are demoted
+to compressed blobs in memory (warm) and then to SQLite on disk (cold).
+Any access promotes a history back to hot, so callers use it like the
+defaultdict(list) it replaces.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, MutableMapping, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+History = List[Dict[str, str]]
+
+_MISSING = object()
+
+
+def _deep_size(history: History) -> int:
+    """Approximate bytes held by one history list"""
+    size = sys.getsizeof(history)
+    for message in history:
+        size += sys.getsizeof(message)
+        for key, value in message.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class TieredMemory(MutableMapping):
+    """
+    user_id -> list of chat messages, with idle users demoted to cheaper tiers
+
+    Args:
+        hot_idle: Seconds without access before a history is compressed
+        warm_idle: Seconds without access before a compressed history moves to disk
+        max_hot: Most histories kept uncompressed (least recently used are demoted first)
+        cold_path: SQLite file for the cold tier (None keeps idle histories warm)
+        sweep_interval: Seconds between demotion sweeps (run on access; their
+            disk writes go to a background writer thread)
+    """
+
+    def __init__(
+        self,
+        hot_idle: float = 600.0,
+        warm_idle: float = 6 * 3600.0,
+        max_hot: int = 5000,
+        cold_path: Optional[str] = None,
+        sweep_interval: float = 30.0,
+    ):
+        self.hot_idle = hot_idle
+        self.warm_idle = warm_idle
+        self.max_hot = max_hot
+        self.sweep_interval = sweep_interval
+        self.codec = "zstd" if zstandard else "zlib"
+        self._compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+        # Least recently used first
+        self._hot: "OrderedDict[int, History]" = OrderedDict()
+        self._warm: "OrderedDict[int, bytes]" = OrderedDict()
+        self._touched: Dict[int, float] = {}
+        self._warm_bytes = 0
+        self._last_sweep = time.monotonic()
+        self.stats = {"promoted_warm": 0, "promoted_cold": 0, "demoted_warm": 0, "demoted_cold": 0}
+
+        # Opened on the first demotion to disk
+        self._cold: Optional[sqlite3.Connection] = None
+        self.cold_path = cold_path
+        # Histories on their way to disk (still served from here); the lock covers them and the connection
+        self._flushing: Dict[int, bytes] = {}
+        self._cold_lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _open_cold(self) -> sqlite3.Connection:
+        if self._cold is None:
+            self._cold = sqlite3.connect(self.cold_path, check_same_thread=False, isolation_level=None)
+            self._cold.execute("PRAGMA journal_mode=WAL")
+            # WAL stays consistent without a sync per commit; a crash only loses the newest demotions
+            self._cold.execute("PRAGMA synchronous=NORMAL")
+            self._cold.execute("CREATE TABLE IF NOT EXISTS memory (user_id INTEGER PRIMARY KEY, blob BLOB)")
+            # Memory has always been per process lifetime; don't resurrect old histories
+            self._cold.execute("DELETE FROM memory")
+        return self._cold
+
+    # Serialization
+
+    def _pack(self, history: History) -> bytes:
+        data = json.dumps(history, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if self._compressor is not None:
+            return self._compressor.compress(data)
+        return zlib.compress(data, 6)
+
+    def _unpack(self, blob: bytes) -> History:
+        data = self._decompressor.decompress(blob) if self._decompressor is not None else zlib.decompress(blob)
+        return json.loads(data)
+
+    # Tier movement
+
+    def _take(self, user_id) -> object:
+        """Remove a history from the warm/cold tiers and return it, or _MISSING"""
+        blob = self._warm.pop(user_id, None)
+        if blob is not None:
+            self._warm_bytes -= len(blob)
+            self.stats["promoted_warm"] += 1
+            return self._unpack(blob)
+        if not self._flushing and self._cold is None:
+            return _MISSING
+        with self._cold_lock:
+            blob = self._flushing.pop(user_id, None)
+            if blob is not None:
+                # Not written yet, and now never will be
+                self.stats["promoted_warm"] += 1
+                return self._unpack(blob)
+            if self._cold is not None:
+                row = self._cold.execute("SELECT blob FROM memory WHERE user_id = ?", (user_id,)).fetchone()
+                if row is not None:
+                    self._cold.execute("DELETE FROM memory WHERE user_id = ?", (user_id,))
+                    self.stats["promoted_cold"] += 1
+                    return self._unpack(row[0])
+        return _MISSING
+
+    def _promote(self, user_id, now: float):
+        """Return the hot history for a user (promoting it if needed), or _MISSING"""
+        history = self._hot.get(user_id, _MISSING)
+        if history is _MISSING:
+            history = self._take(user_id)
+            if history is _MISSING:
+                return _MISSING
+            self._hot[user_id] = history
+        else:
+            self._hot.move_to_end(user_id)
+        self._touched[user_id] = now
+        return history
+
+    def _demote_hot(self, user_id):
+        history = self._hot.pop(user_id)
+        blob = self._pack(history)
+        self._warm[user_id] = blob
+        self._warm_bytes += len(blob)
+        self.stats["demoted_warm"] += 1
+
+    def _demote_warm(self, user_id):
+        blob = self._warm.pop(user_id)
+        self._warm_bytes -= len(blob)
+        self._touched.pop(user_id, None)
+        self._flushing[user_id] = blob
+
+    def _write_cold(self):
+        """Store the histories waiting for disk in one transaction"""
+        with self._cold_lock:
+            rows = list(self._flushing.items())
+            if not rows:
+                return
+            cold = self._open_cold()
+            try:
+                cold.execute("BEGIN")
+                cold.executemany("INSERT OR REPLACE INTO memory (user_id, blob) VALUES (?, ?)", rows)
+                cold.execute("COMMIT")
+            except sqlite3.Error as e:
+                if cold.in_transaction:
+                    cold.execute("ROLLBACK")
+                # Still served from memory; retried with the next demotion
+                logger.error(f"❌ Failed to move {len(rows)} histories to disk: {e}")
+                return
+            for user_id, _ in rows:
+                del self._flushing[user_id]
+            self.stats["demoted_cold"] += len(rows)
+
+    def sweep(self, now: Optional[float] = None, background: bool = False):
+        """
+        Demote idle histories; cost is proportional to what gets demoted
+
+        Args:
+            now: Current monotonic time (default: now)
+            background: Hand the disk writes to the writer thread instead of waiting for them
+        """
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        while self._hot:
+            user_id = next(iter(self._hot))
+            if len(self._hot) <= self.max_hot and now - self._touched[user_id] < self.hot_idle:
+                break
+            self._demote_hot(user_id)
+        if not self.cold_path:
+            return
+        demoted = 0
+        while self._warm:
+            user_id = next(iter(self._warm))
+            if now - self._touched[user_id] < self.warm_idle:
+                break
+            self._demote_warm(user_id)
+            demoted += 1
+        if not demoted:
+            return
+        if background:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiered-memory")
+            self._writer.submit(self._write_cold)
+        else:
+            self._write_cold()
+
+    def _maybe_sweep(self, now: float):
+        if now - self._last_sweep >= self.sweep_interval or len(self._hot) > self.max_hot:
+            # Runs on the caller's (event loop) thread, so SQLite is left to the writer
+            self.sweep(now, background=True)
+
+    # Mapping interface
+
+    def __getitem__(self, user_id) -> History:
+        """Missing users get a new empty history, like defaultdict(list)"""
+        now = time.monotonic()
+        self._maybe_sweep(now)
+        history = self._promote(user_id, now)
+        if history is _MISSING:
+            history = self._hot[user_id] = []
+            self._touched[user_id] = now
+        return history
+
+    def __setitem__(self, user_id, history: History):
+        now = time.monotonic()
+        self._maybe_sweep(now)
+        self._take(user_id)
+        self._hot[user_id] = history
+        self._hot.move_to_end(user_id)
+        self._touched[user_id] = now
+
+    def __delitem__(self, user_id):
+        if self._hot.pop(user_id, _MISSING) is _MISSING and self._take(user_id) is _MISSING:
+            raise KeyError(user_id)
+        self._touched.pop(user_id, None)
+
+    def __contains__(self, user_id) -> bool:
+        if user_id in self._hot or user_id in self._warm:
+            return True
+        with self._cold_lock:
+            if user_id in self._flushing:
+                return True
+            if self._cold is None:
+                return False
+            return self._cold.execute("SELECT 1 FROM memory WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def get(self, user_id, default=None):
+        """Like dict.get: does not create a history for unknown users"""
+        history = self._promote(user_id, time.monotonic())
+        return default if history is _MISSING else history
+
+    def pop(self, user_id, default=_MISSING):
+        history = self._promote(user_id, time.monotonic())
+        if history is _MISSING:
+            if default is _MISSING:
+                raise KeyError(user_id)
+            return default
+        del self._hot[user_id]
+        self._touched.pop(user_id, None)
+        return history
+
+    def __iter__(self) -> Iterator:
+        yield from list(self._hot)
+        yield from list(self._warm)
+        with self._cold_lock:
+            rest = list(self._flushing)
+            if self._cold is not None:
+                rest += [row[0] for row in self._cold.execute("SELECT user_id FROM memory")]
+        yield from rest
+
+    def __len__(self) -> int:
+        with self._cold_lock:
+            cold = self._cold.execute("SELECT COUNT(*) FROM memory").fetchone()[0] if self._cold is not None else 0
+            return len(self._hot) + len(self._warm) + len(self._flushing) + cold
+
+    # Reporting
+
+    def snapshot(self) -> dict:
+        """Users and resident bytes per tier (hot is an estimate of Python object sizes)"""
+        cold_users = cold_bytes = 0
+        with self._cold_lock:
+            flushing = len(self._flushing)
+            if self._cold is not None:
+                cold_users = self._cold.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+                cold_bytes = os.path.getsize(self.cold_path) if os.path.exists(self.cold_path) else 0
+        return dict(
+            self.stats,
+            codec=self.codec,
+            hot_users=len(self._hot),
+            hot_bytes=sum(_deep_size(history) for history in self._hot.values()),
+            warm_users=len(self._warm),
+            warm_bytes=self._warm_bytes,
+            flushing_users=flushing,
+            cold_users=cold_users,
+            cold_disk_bytes=cold_bytes,
+        )
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self._cold is not None:
+            self._cold.close()
+            self._cold = None
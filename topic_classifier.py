@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Learned topic filter for MiraiBot
+A logistic regression over hashed n-grams that scores how likely a message
+is about mental health / emotional support. Trained offline, loaded by the
+bot from TOPIC_MODEL_PATH and used alongside the keyword rules.
+
+Usage:
+    python topic_classifier.py train --data labeled.jsonl [--emotion-datasets] \
+        [--out models/topic_classifier.npz]
+    python topic_classifier.py score --model models/topic_classifier.npz "message" ...
+
+Labeled files are JSONL ({"text": ..., "label": 1|0}) or CSV with text and
+label columns; label 1 (or "on_topic") means mental health related.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from text_features import DEFAULT_N_FEATURES, hash_ngrams, sparse_dot, vectorize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join("models", "topic_classifier.npz")
+
+ON_TOPIC_LABELS = {"1", "on_topic", "true", "yes", "mental_health"}
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+
+def _scalar_sigmoid(x: float) -> float:
+    # NumPy scalar math costs microseconds; the single-message path stays in plain floats
+    return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, x))))
+
+
+class TopicClassifier:
+    """Binary on-topic classifier; score() returns P(mental health related)"""
+
+    def __init__(self, weights: np.ndarray, bias: float, threshold: float = 0.5):
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.threshold = threshold
+        self.n_features = len(weights)
+
+    def score(self, text: str) -> float:
+        """Probability that one message is on topic"""
+        indices = hash_ngrams(text, self.n_features)
+        if not len(indices):
+            return _scalar_sigmoid(self.bias)
+        return _scalar_sigmoid(self.bias + float(self.weights[indices].sum()) / math.sqrt(len(indices)))
+
+    def score_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Probabilities for many messages at once"""
+        indptr, indices, values = vectorize(texts, self.n_features)
+        return _sigmoid(self.bias + sparse_dot(indptr, indices, values, self.weights))
+
+    def is_on_topic(self, text: str) -> bool:
+        return self.score(text) >= self.threshold
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path: str) -> "TopicClassifier":
+        data = np.load(path)
+        return cls(data["weights"], float(data["bias"]), float(data["threshold"]))
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[int],
+        n_features: int = DEFAULT_N_FEATURES,
+        epochs: int = 10,
+        learning_rate: float = 1.0,
+        l2: float = 1e-6,
+        batch_size: int = 256,
+        threshold: float = 0.5,
+        seed: int = 0,
+    ) -> "TopicClassifier":
+        """
+        Fit with mini-batch gradient descent; classes are weighted to balance
+
+        Args:
+            texts: Training messages
+            labels: 1 for on-topic, 0 for off-topic
+            n_features: Hash buckets (power of two)
+            epochs: Passes over the data
+            learning_rate: Step size
+            l2: Weight decay
+            batch_size: Messages per gradient step
+            threshold: Decision threshold stored with the model
+        """
+        labels = np.asarray(labels, dtype=np.float64)
+        indptr, indices, values = vectorize(texts, n_features)
+        positives = max(1.0, labels.sum())
+        negatives = max(1.0, len(labels) - labels.sum())
+        sample_weight = np.where(labels == 1, len(labels) / (2 * positives), len(labels) / (2 * negatives))
+
+        weights = np.zeros(n_features, dtype=np.float64)
+        bias = 0.0
+        rng = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            order = rng.permutation(len(labels))
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                starts, ends = indptr[rows], indptr[rows + 1]
+                lengths = ends - starts
+                # Gather the batch's non-zeros into one flat CSR slice
+                flat = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)]) if lengths.sum() else np.zeros(0, dtype=np.int64)
+                batch_indptr = np.concatenate([[0], np.cumsum(lengths)])
+                batch_indices, batch_values = indices[flat], values[flat]
+
+                logits = bias + sparse_dot(batch_indptr, batch_indices, batch_values, weights)
+                error = (_sigmoid(logits) - labels[rows]) * sample_weight[rows] / len(rows)
+                gradient = np.zeros(n_features, dtype=np.float64)
+                np.add.at(gradient, batch_indices, np.repeat(error, lengths) * batch_values)
+                weights -= learning_rate * (gradient + l2 * weights)
+                bias -= learning_rate * error.sum()
+            loss = _log_loss(cls(weights, bias).score_batch(texts), labels)
+            logger.info(f"📉 Epoch {epoch + 1}/{epochs}: loss {loss:.4f}")
+        return cls(weights, bias, threshold)
+
+
+def _log_loss(probabilities: np.ndarray, labels: np.ndarray) -> float:
+    p = np.clip(probabilities, 1e-7, 1 - 1e-7)
+    return float(-np.mean(labels * np.log(p) + (1 - labels) * np.log(1 - p)))
+
+
+def read_labeled(path: str) -> Tuple[List[str], List[int]]:
+    """Read (texts, labels) from a JSONL or CSV file"""
+    texts, labels = [], []
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f) if path.endswith(".csv") else (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            texts.append(row["text"])
+            labels.append(1 if str(row["label"]).strip().lower() in ON_TOPIC_LABELS else 0)
+    return texts, labels
+
+
+def load_emotion_texts(limit: Optional[int] = None) -> List[str]:
+    """
+    Emotional messages from the datasets miraiai.ipynb trains on, used as on-topic examples
+
+    Requires: pip install datasets
+    """
+    from datasets import load_dataset
+
+    texts = []
+    for name, config in (("dair-ai/emotion", None), ("google-research-datasets/go_emotions", "simplified")):
+        dataset = load_dataset(name, config, split="train")
+        texts.extend(dataset["text"][:limit] if limit else dataset["text"])
+        logger.info(f"✅ Loaded {name}: {len(dataset)} samples")
+    return texts
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Train or run the MiraiBot topic classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="Train a model from labeled messages")
+    train_parser.add_argument("--data", action="append", default=[], help="Labeled JSONL/CSV file (repeatable)")
+    train_parser.add_argument("--emotion-datasets", action="store_true", help="Add emotion datasets as on-topic examples")
+    train_parser.add_argument("--emotion-limit", type=int, default=20000, help="Samples per emotion dataset")
+    train_parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    train_parser.add_argument("--epochs", type=int, default=10)
+    train_parser.add_argument("--threshold", type=float, default=0.5)
+
+    score_parser = commands.add_parser("score", help="Score messages with a trained model")
+    score_parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    score_parser.add_argument("messages", nargs="+")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    if args.command == "train":
+        texts, labels = [], []
+        for path in args.data:
+            file_texts, file_labels = read_labeled(path)
+            texts += file_texts
+            labels += file_labels
+        if args.emotion_datasets:
+            emotion_texts = load_emotion_texts(args.emotion_limit)
+            texts += emotion_texts
+            labels += [1] * len(emotion_texts)
+        if not texts or len(set(labels)) < 2:
+            parser.error("Training needs both on-topic and off-topic examples (see --data)")
+
+        model = TopicClassifier.train(texts, labels, epochs=args.epochs, threshold=args.threshold)
+        predictions = model.score_batch(texts) >= model.threshold
+        accuracy = float(np.mean(predictions == np.asarray(labels, dtype=bool)))
+        model.save(args.out)
+        logger.info(f"✅ Saved model to {args.out} ({len(texts)} examples, training accuracy {accuracy:.3f})")
+    else:
+        model = TopicClassifier.load(args.model)
+        for message, probability in zip(args.messages, model.score_batch(args.messages)):
+            print(f"{probability:.3f}  {'on-topic ' if probability >= model.threshold else 'off-topic'}  {message}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
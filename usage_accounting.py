@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Token and cost accounting for MiraiBot
+Adds up the `usage` block of every Groq response (prompt and completion
+tokens) and the request latency, keyed by bot, user, API key, model and
+prompt version. Totals since startup are kept in memory for /metrics and the
+admin /usage command; per-interval rollups are appended to daily JSONL files
+so quota use can be traced after a restart.
+
+Usage (summarize rollups on disk):
+    python usage_accounting.py usage_rollups/ --by user --since 2026-01-01
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# USD per million (prompt, completion) tokens; models not listed cost 0
+DEFAULT_PRICES = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+}
+
+# Rollup rows are keyed by these fields
+DIMENSIONS = ("bot", "user", "key", "model", "prompt_version")
+
+
+def prompt_version(prompt: str) -> str:
+    """Short stable id of a prompt's text, so edits show up as a new version"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+
+
+class UsageTotals:
+    """Counters for one group of requests"""
+
+    __slots__ = ("requests", "errors", "prompt_tokens", "completion_tokens", "latency", "max_latency", "cost")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.cost = 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, latency: float, cost: float, error: bool):
+        self.requests += 1
+        self.errors += error
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.cost += cost
+
+    def merge(self, other: "UsageTotals"):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.latency += other.latency
+        self.max_latency = max(self.max_latency, other.max_latency)
+        self.cost += other.cost
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "avg_latency": round(self.latency / self.requests, 3) if self.requests else None,
+            "max_latency": round(self.max_latency, 3),
+            "cost_usd": round(self.cost, 6),
+        }
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "UsageTotals":
+        totals = cls()
+        totals.requests = row.get("requests", 0)
+        totals.errors = row.get("errors", 0)
+        totals.prompt_tokens = row.get("prompt_tokens", 0)
+        totals.completion_tokens = row.get("completion_tokens", 0)
+        totals.latency = (row.get("avg_latency") or 0.0) * totals.requests
+        totals.max_latency = row.get("max_latency", 0.0)
+        totals.cost = row.get("cost_usd", 0.0)
+        return totals
+
+
+class UsageAccounting:
+    """
+    In-memory usage totals with periodic rollups to disk
+
+    Args:
+        rollup_dir: Directory for daily usage-YYYY-MM-DD.jsonl rollups (None: memory only)
+        flush_interval: Seconds covered by one rollup
+        max_users: Users kept in the per-user totals (least recently active are dropped)
+        prices: Model -> (USD per million prompt tokens, USD per million completion tokens)
+    """
+
+    def __init__(
+        self,
+        rollup_dir: Optional[str] = None,
+        flush_interval: float = 300.0,
+        max_users: int = 10000,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        self.rollup_dir = rollup_dir
+        self.flush_interval = flush_interval
+        self.max_users = max_users
+        self.prices = dict(DEFAULT_PRICES if prices is None else prices)
+        self.started_at = time.time()
+        self.total = UsageTotals()
+        # Totals since startup per dimension (small, except users which are bounded)
+        self.by_bot: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+        self.by_key: Dict[int, UsageTotals] = defaultdict(UsageTotals)
+        self.by_model: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+        self.by_prompt: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+        self.by_user: "OrderedDict[Tuple[str, int], UsageTotals]" = OrderedDict()
+        # Current rollup window, keyed by all dimensions at once
+        self._window: Dict[tuple, UsageTotals] = defaultdict(UsageTotals)
+        self._window_start = time.time()
+        self._lock = threading.Lock()
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    def record(
+        self,
+        bot: str,
+        user_id: int,
+        key_index: Optional[int],
+        model: str,
+        prompt_version: str,
+        usage: Optional[dict],
+        latency: float,
+        error: bool = False,
+        now: Optional[float] = None,
+    ):
+        """
+        Count one Groq request
+
+        Args:
+            bot: Bot name
+            user_id: Telegram user the request was made for
+            key_index: API key that answered (None if no key did)
+            model: Model name
+            prompt_version: Version of the prompt used (see prompt_version())
+            usage: The response's usage block (None for failed requests)
+            latency: Seconds the turn waited for the response, retries included
+            error: Whether the request failed
+            now: Current time (for tests)
+        """
+        usage = usage or {}
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+        key = -1 if key_index is None else key_index
+        values = (prompt_tokens, completion_tokens, latency, cost, error)
+        now = time.time() if now is None else now
+
+        with self._lock:
+            self.total.add(*values)
+            self.by_bot[bot].add(*values)
+            self.by_key[key].add(*values)
+            self.by_model[model].add(*values)
+            self.by_prompt[prompt_version].add(*values)
+            user = self.by_user.get((bot, user_id))
+            if user is None:
+                user = self.by_user[(bot, user_id)] = UsageTotals()
+                if len(self.by_user) > self.max_users:
+                    self.by_user.popitem(last=False)
+            else:
+                self.by_user.move_to_end((bot, user_id))
+            user.add(*values)
+            self._window[(bot, user_id, key, model, prompt_version)].add(*values)
+            due = now - self._window_start >= self.flush_interval
+        if due:
+            self.flush(now)
+
+    def flush(self, now: Optional[float] = None):
+        """Append the current window's rollup to disk and start a new window"""
+        now = time.time() if now is None else now
+        with self._lock:
+            window, self._window = self._window, defaultdict(UsageTotals)
+            start, self._window_start = self._window_start, now
+        if not window or not self.rollup_dir:
+            return
+        day = datetime.fromtimestamp(start).strftime("%Y-%m-%d")
+        path = os.path.join(self.rollup_dir, f"usage-{day}.jsonl")
+        lines = []
+        for dimensions, totals in window.items():
+            row = {"start": round(start, 3), "end": round(now, 3), **dict(zip(DIMENSIONS, dimensions))}
+            row.update(totals.as_dict())
+            lines.append(json.dumps(row, ensure_ascii=False))
+        try:
+            os.makedirs(self.rollup_dir, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.error(f"❌ Could not write usage rollup {path}: {e}")
+
+    def top_users(self, n: int = 10, bot: Optional[str] = None) -> List[Tuple[Tuple[str, int], UsageTotals]]:
+        """Users with the most tokens since startup"""
+        with self._lock:
+            users = [(user, totals) for user, totals in self.by_user.items() if bot is None or user[0] == bot]
+        users.sort(key=lambda item: item[1].prompt_tokens + item[1].completion_tokens, reverse=True)
+        return users[:n]
+
+    def snapshot(self, top: int = 0) -> dict:
+        """Totals for the /metrics endpoint; top > 0 adds per-user totals, which only admins may see"""
+        with self._lock:
+            result = {
+                "since": round(self.started_at, 3),
+                "total": self.total.as_dict(),
+                "by_bot": {bot: totals.as_dict() for bot, totals in self.by_bot.items()},
+                "by_key": {f"#{key + 1}" if key >= 0 else "none": totals.as_dict() for key, totals in self.by_key.items()},
+                "by_model": {model: totals.as_dict() for model, totals in self.by_model.items()},
+                "by_prompt_version": {version: totals.as_dict() for version, totals in self.by_prompt.items()},
+                "users_tracked": len(self.by_user),
+            }
+        if top:
+            result["top_users"] = [
+                dict(totals.as_dict(), bot=bot, user=user_id) for (bot, user_id), totals in self.top_users(top)
+            ]
+        return result
+
+
+def iter_rollups(rollup_dir: str, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[dict]:
+    """Rollup rows on disk, oldest file first"""
+    for path in sorted(glob.glob(os.path.join(rollup_dir, "usage-*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if since is not None and row["end"] < since:
+                    continue
+                if until is not None and row["start"] >= until:
+                    continue
+                yield row
+
+
+def summarize_rollups(rows, by: str) -> Dict[str, UsageTotals]:
+    """Add up rollup rows grouped by one dimension"""
+    groups: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+    for row in rows:
+        groups[str(row.get(by))].merge(UsageTotals.from_dict(row))
+    return groups
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Summarize MiraiBot usage rollups")
+    parser.add_argument("rollup_dir", help="Directory with usage-*.jsonl rollups")
+    parser.add_argument("--by", choices=DIMENSIONS, default="model")
+    parser.add_argument("--since", help="ISO date/time")
+    parser.add_argument("--until", help="ISO date/time")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    until = datetime.fromisoformat(args.until).timestamp() if args.until else None
+    groups = summarize_rollups(iter_rollups(args.rollup_dir, since, until), args.by)
+    ordered = sorted(groups.items(), key=lambda item: item[1].prompt_tokens + item[1].completion_tokens, reverse=True)
+
+    print(f"{args.by:<44} {'requests':>9} {'errors':>7} {'prompt':>11} {'completion':>11} {'avg s':>7} {'USD':>10}")
+    for name, totals in ordered[:args.top]:
+        row = totals.as_dict()
+        print(
+            f"{name[:44]:<44} {row['requests']:>9,} {row['errors']:>7,} {row['prompt_tokens']:>11,} "
+            f"{row['completion_tokens']:>11,} {row['avg_latency'] or 0:>7.2f} {row['cost_usd']:>10.4f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Multi-worker mode for MiraiBot
+A front dispatcher receives webhook updates and routes each user to one
+worker process by consistent hashing, so conversations stay on one worker
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ConsistentHashRing:
+    """Hash ring with virtual nodes; adding/removing a node moves ~1/N of the keys"""
+
+    def __init__(self, nodes: Optional[List[str]] = None, replicas: int = 100):
+        self.replicas = replicas
+        self._hashes: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for node in nodes or []:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(set(self._owners.values()))
+
+    def add_node(self, node: str):
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            if point in self._owners:
+                continue
+            bisect.insort(self._hashes, point)
+            self._owners[point] = node
+
+    def remove_node(self, node: str):
+        points = [point for point, owner in self._owners.items() if owner == node]
+        for point in points:
+            del self._owners[point]
+            self._hashes.pop(bisect.bisect_left(self._hashes, point))
+
+    def node_for(self, key) -> Optional[str]:
+        """Return the node owning a key, or None if the ring is empty"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(str(key))) % len(self._hashes)
+        return self._owners[self._hashes[index]]
+
+
+def extract_user_id(update: dict) -> Optional[int]:
+    """Find the sending user's id in a raw Telegram update"""
+    for value in update.values():
+        if isinstance(value, dict):
+            sender = value.get("from") or value.get("user")
+            if isinstance(sender, dict) and "id" in sender:
+                return sender["id"]
+            chat = value.get("chat")
+            if isinstance(chat, dict) and "id" in chat:
+                return chat["id"]
+    return None
+
+
+def run_worker(name: str, inbox, outbox, send_rate: Optional[float] = None):
+    """Worker process entry point: runs one bot Application fed from the inbox"""
+    asyncio.run(_worker_main(name, inbox, outbox, send_rate))
+
+
+async def _worker_main(name: str, inbox, outbox, send_rate: Optional[float] = None):
+    # Imported here so each spawned process builds its own per-user state
+    os.environ["BOT_WORKER_NAME"] = name
+    import telegram_bot
+    from telegram import Update
+
+    if send_rate is not None:
+        telegram_bot.set_send_rate(send_rate)
+    telegram_bot.check_api()
+    application = telegram_bot.build_application()
+    loop = asyncio.get_running_loop()
+
+    async def export(user_id: int):
+        # Waits for the user's pending turn, so the new owner gets the full conversation
+        outbox.put(("state", user_id, await telegram_bot.export_user_state(user_id)))
+
+    exports = set()
+    async with application:
+        await application.start()
+        try:
+            # post_init/post_shutdown only run under run_polling/run_webhook, so call them here
+            await telegram_bot.on_startup(application)
+            logger.info(f"👷 Worker {name} ready")
+            while True:
+                message = await loop.run_in_executor(None, inbox.get)
+                kind = message[0]
+                if kind == "update":
+                    await application.update_queue.put(Update.de_json(message[1], application.bot))
+                elif kind == "export":
+                    task = asyncio.create_task(export(message[1]))
+                    exports.add(task)
+                    task.add_done_callback(exports.discard)
+                elif kind == "import":
+                    telegram_bot.import_user_state(message[1], message[2])
+                elif kind == "rate":
+                    telegram_bot.set_send_rate(message[1])
+                elif kind == "stop":
+                    break
+            await asyncio.gather(*exports)
+        finally:
+            await application.stop()
+            await telegram_bot.on_shutdown(application)
+    logger.info(f"👷 Worker {name} stopped")
+
+
+class WorkerDispatcher:
+    """
+    Routes updates to worker processes and migrates users when the pool changes
+
+    Args:
+        max_tracked_users: Users whose worker is remembered for migration on a
+            resize (least recently active are forgotten first; their routing
+            still follows the ring, only their state is not moved)
+        send_rate: Telegram requests/s allowed for the bot token, split evenly
+            between the workers
+    """
+
+    def __init__(self, max_tracked_users: int = 100_000, send_rate: float = 30.0):
+        self._ctx = multiprocessing.get_context("spawn")
+        self.outbox = self._ctx.Queue()
+        self.workers: Dict[str, tuple] = {}  # name -> (process, inbox)
+        self.ring = ConsistentHashRing()
+        self.max_tracked_users = max_tracked_users
+        self.send_rate = send_rate
+        self.num_workers = 0
+        self.retiring: List = []  # Removed worker processes that may still be sending
+        self.user_owner: "OrderedDict[int, str]" = OrderedDict()
+        # user_id -> (new owner, updates held until the user's state arrives, old owner)
+        self.migrating: Dict[int, tuple] = {}
+        self.lock = threading.Lock()
+        self._next_id = 0
+        self._running = False
+        self._collector = None
+
+    def start(self, num_workers: int):
+        self._running = True
+        with self.lock:
+            self.num_workers = num_workers
+            for _ in range(num_workers):
+                self.ring.add_node(self._spawn())
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        logger.info(f"✅ Started {num_workers} bot workers")
+
+    def _spawn(self, name: Optional[str] = None) -> str:
+        if name is None:
+            name = f"worker-{self._next_id}"
+            self._next_id += 1
+        inbox = self._ctx.Queue()
+        args = (name, inbox, self.outbox, self.worker_send_rate())
+        process = self._ctx.Process(target=run_worker, args=args, name=name, daemon=True)
+        process.start()
+        self.workers[name] = (process, inbox)
+        return name
+
+    def dispatch(self, update: dict):
+        """Send a raw update to the worker that owns its user"""
+        user_id = extract_user_id(update)
+        with self.lock:
+            if user_id is None:
+                # No user state to keep together: spread by update id, never tracked for migration
+                name = self.ring.node_for(update.get("update_id", 0))
+            elif user_id in self.migrating:
+                self.migrating[user_id][1].append(update)
+                return
+            else:
+                name = self.ring.node_for(user_id)
+                self._set_owner(user_id, name)
+            self.workers[name][1].put(("update", update))
+
+    def _set_owner(self, user_id: int, name: str):
+        self.user_owner[user_id] = name
+        self.user_owner.move_to_end(user_id)
+        while len(self.user_owner) > self.max_tracked_users:
+            self.user_owner.popitem(last=False)
+
+    def worker_send_rate(self) -> float:
+        """Each worker's share of the token's send rate"""
+        return self.send_rate / max(1, self.num_workers)
+
+    def queue_depths(self) -> Dict[str, int]:
+        depths = {}
+        for name, (_, inbox) in self.workers.items():
+            try:
+                depths[name] = inbox.qsize()
+            except NotImplementedError:
+                depths[name] = -1
+        return depths
+
+    def scale_to(self, num_workers: int):
+        """Add or remove workers, then move the affected users' state"""
+        if num_workers < 1:
+            raise ValueError("At least one worker is required")
+        with self.lock:
+            growing = num_workers > self.num_workers
+            self.num_workers = num_workers
+            if growing:
+                # Current workers slow down before new ones start sending
+                self._send_rates()
+            removed = []
+            while len(self.ring.nodes) < num_workers:
+                self.ring.add_node(self._spawn())
+            while len(self.ring.nodes) > num_workers:
+                name = self.ring.nodes[-1]
+                self.ring.remove_node(name)
+                removed.append(name)
+            self._rebalance()
+            # Stop messages queue behind the exports, so state leaves before the worker does
+            for name in removed:
+                process, inbox = self.workers.pop(name)
+                inbox.put(("stop",))
+                # The rest speed up once it has exited (it may still answer pending turns)
+                self.retiring.append(process)
+        logger.info(f"🔀 Worker pool resized to {num_workers}")
+
+    def _send_rates(self):
+        for name in self.ring.nodes:
+            self.workers[name][1].put(("rate", self.worker_send_rate()))
+
+    def _rebalance(self):
+        moved = 0
+        for user_id, owner in list(self.user_owner.items()):
+            new_owner = self.ring.node_for(user_id)
+            if new_owner == owner or user_id in self.migrating:
+                continue
+            self.migrating[user_id] = (new_owner, [], owner)
+            self.workers[owner][1].put(("export", user_id))
+            moved += 1
+        logger.info(f"🔀 Rebalancing {moved} of {len(self.user_owner)} users")
+
+    def _collect(self):
+        """Forward exported state to new owners and replace crashed workers"""
+        while self._running:
+            try:
+                kind, user_id, state = self.outbox.get(timeout=1.0)
+            except queue.Empty:
+                self._replace_dead_workers()
+                continue
+            if kind != "state":
+                continue
+            with self.lock:
+                self._finish_migration(user_id, state)
+
+    def _finish_migration(self, user_id: int, state: Optional[dict]):
+        new_owner, held, _ = self.migrating.pop(user_id, (self.ring.node_for(user_id), [], None))
+        inbox = self.workers[new_owner][1]
+        if state:
+            inbox.put(("import", user_id, state))
+        for update in held:
+            inbox.put(("update", update))
+        self._set_owner(user_id, new_owner)
+
+    def _replace_dead_workers(self):
+        with self.lock:
+            if self.retiring and not any(process.is_alive() for process in self.retiring):
+                self.retiring.clear()
+                self._send_rates()
+            for name, (process, _) in list(self.workers.items()):
+                if self._running and not process.is_alive():
+                    logger.error(f"❌ {name} exited with code {process.exitcode}, restarting it")
+                    self._spawn(name)
+                    # Its users' state is gone; release anything waiting on an export from it
+                    for user_id, (_, _, old_owner) in list(self.migrating.items()):
+                        if old_owner == name:
+                            self._finish_migration(user_id, None)
+
+    def stop(self):
+        self._running = False
+        with self.lock:
+            for process, inbox in self.workers.values():
+                inbox.put(("stop",))
+            for process, _ in self.workers.values():
+                process.join(timeout=10)